@@ -6,6 +6,7 @@ import { FirebaseService } from './infrastructure/services/FirebaseService';
 import { UsersServiceClient } from './infrastructure/http/UsersServiceClient';
 import { SendNotificationToUserUseCase } from './application/use-cases/SendNotificationToUserUseCase';
 import { SendNotificationToMultipleUsersUseCase } from './application/use-cases/SendNotificationToMultipleUsersUseCase';
+import { SendNotificationBatchUseCase } from './application/use-cases/SendNotificationBatchUseCase';
 import { BroadcastNotificationUseCase } from './application/use-cases/BroadcastNotificationUseCase';
 import { NotificationController } from './presentation/controllers/NotificationController';
 import { NotificationRoutes } from './presentation/routes/NotificationRoutes';
@@ -65,11 +66,17 @@ class NotificationsApp {
       this.usersServiceClient
     );
 
+    const sendNotificationBatchUseCase = new SendNotificationBatchUseCase(
+      this.firebaseService,
+      this.usersServiceClient
+    );
+
     // Crear controlador
     const notificationController = new NotificationController(
       sendNotificationToUserUseCase,
       sendNotificationToMultipleUsersUseCase,
-      broadcastNotificationUseCase
+      broadcastNotificationUseCase,
+      sendNotificationBatchUseCase
     );
 
     // Registrar rutas
@@ -86,6 +93,7 @@ class NotificationsApp {
           health: 'GET /notify/health',
           sendToUser: 'POST /notify/user/:id',
           sendToMultipleUsers: 'POST /notify/users',
+          sendBatch: 'POST /notify/users/batch',
           broadcast: 'POST /notify/broadcast',
         },
       });
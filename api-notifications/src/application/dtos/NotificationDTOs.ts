@@ -14,6 +14,10 @@ export interface SendNotificationToUsersDTO {
   imageUrl?: string;
 }
 
+export interface SendNotificationBatchDTO {
+  notifications: SendNotificationToUsersDTO[];
+}
+
 export interface BroadcastNotificationDTO {
   title: string;
   body: string;
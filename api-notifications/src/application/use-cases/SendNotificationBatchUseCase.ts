@@ -0,0 +1,78 @@
+import { FirebaseService } from '../../infrastructure/services/FirebaseService';
+import { UsersServiceClient } from '../../infrastructure/http/UsersServiceClient';
+import { SendNotificationBatchDTO, NotificationResponseDTO } from '../dtos/NotificationDTOs';
+import { logger } from '../../infrastructure/services/LoggerService';
+
+export class SendNotificationBatchUseCase {
+  constructor(
+    private firebaseService: FirebaseService,
+    private usersServiceClient: UsersServiceClient
+  ) {}
+
+  async execute(dto: SendNotificationBatchDTO): Promise<NotificationResponseDTO> {
+    const totalRecipients = dto.notifications.reduce((total, n) => total + n.userIds.length, 0);
+
+    try {
+      // 1. Obtener una sola vez todos los usuarios del batch
+      const userIds = Array.from(new Set(dto.notifications.flatMap((n) => n.userIds)));
+      const users = await this.usersServiceClient.getUsersByIds(userIds);
+      const usersById = new Map(users.map((user) => [user.id, user]));
+
+      let successCount = 0;
+      let failureCount = 0;
+      const details: NonNullable<NotificationResponseDTO['details']> = [];
+
+      // 2. Un envío por mensaje a los usuarios con tokenFCM
+      for (const notification of dto.notifications) {
+        const usersWithToken = notification.userIds
+          .map((id) => usersById.get(id))
+          .filter((user) => user?.tokenFCM);
+        failureCount += notification.userIds.length - usersWithToken.length;
+
+        if (usersWithToken.length === 0) {
+          continue;
+        }
+
+        const result = await this.firebaseService.sendToMultipleDevices(
+          usersWithToken.map((user) => user!.tokenFCM!),
+          {
+            title: notification.title,
+            body: notification.body,
+            data: notification.data,
+            imageUrl: notification.imageUrl,
+          }
+        );
+
+        successCount += result.successCount;
+        failureCount += result.failureCount;
+        usersWithToken.forEach((user, index) => {
+          details.push({
+            userId: user!.id,
+            sent: result.results[index]?.success || false,
+            error: result.results[index]?.error,
+          });
+        });
+      }
+
+      logger.info(
+        `Batch de ${dto.notifications.length} notificaciones: ${successCount} exitosas, ${failureCount} fallidas`
+      );
+
+      return {
+        success: successCount > 0,
+        message: `Se enviaron ${successCount} notificaciones de ${totalRecipients} destinatarios`,
+        successCount,
+        failureCount,
+        details,
+      };
+    } catch (error: any) {
+      logger.error('Error en SendNotificationBatchUseCase', error);
+      return {
+        success: false,
+        message: error.message || 'Error desconocido al enviar notificaciones',
+        successCount: 0,
+        failureCount: totalRecipients,
+      };
+    }
+  }
+}
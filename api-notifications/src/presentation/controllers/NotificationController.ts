@@ -1,6 +1,7 @@
 import { Request, Response } from 'express';
 import { SendNotificationToUserUseCase } from '../../application/use-cases/SendNotificationToUserUseCase';
 import { SendNotificationToMultipleUsersUseCase } from '../../application/use-cases/SendNotificationToMultipleUsersUseCase';
+import { SendNotificationBatchUseCase } from '../../application/use-cases/SendNotificationBatchUseCase';
 import { BroadcastNotificationUseCase } from '../../application/use-cases/BroadcastNotificationUseCase';
 import { logger } from '../../infrastructure/services/LoggerService';
 
@@ -8,7 +9,8 @@ export class NotificationController {
   constructor(
     private sendNotificationToUserUseCase: SendNotificationToUserUseCase,
     private sendNotificationToMultipleUsersUseCase: SendNotificationToMultipleUsersUseCase,
-    private broadcastNotificationUseCase: BroadcastNotificationUseCase
+    private broadcastNotificationUseCase: BroadcastNotificationUseCase,
+    private sendNotificationBatchUseCase: SendNotificationBatchUseCase
   ) {}
 
   /**
@@ -98,6 +100,50 @@ export class NotificationController {
     }
   }
 
+  /**
+   * POST /notify/users/batch
+   * Envía varias notificaciones distintas (cada una a sus usuarios) en un solo request
+   */
+  async sendBatch(req: Request, res: Response): Promise<void> {
+    try {
+      const { notifications } = req.body;
+
+      // Validaciones
+      if (!notifications || !Array.isArray(notifications) || notifications.length === 0) {
+        res.status(400).json({
+          success: false,
+          message: 'El campo notifications debe ser un array con al menos una notificación',
+        });
+        return;
+      }
+
+      const invalid = notifications.some(
+        (n: any) => !n || !Array.isArray(n.userIds) || n.userIds.length === 0 || !n.title || !n.body
+      );
+      if (invalid) {
+        res.status(400).json({
+          success: false,
+          message: 'Cada notificación debe tener userIds (array no vacío), title y body',
+        });
+        return;
+      }
+
+      // Ejecutar caso de uso
+      const result = await this.sendNotificationBatchUseCase.execute({ notifications });
+
+      // Responder según el resultado
+      const statusCode = result.success ? 200 : 400;
+      res.status(statusCode).json(result);
+    } catch (error: any) {
+      logger.error('Error en NotificationController.sendBatch', error);
+      res.status(500).json({
+        success: false,
+        message: 'Error interno del servidor',
+        error: error.message,
+      });
+    }
+  }
+
   /**
    * POST /notify/broadcast
    * Envía una notificación a TODOS los usuarios con tokenFCM
@@ -14,6 +14,9 @@ export class NotificationRoutes {
     // Enviar notificaciones a múltiples usuarios
     router.post('/users', (req, res) => notificationController.sendToMultipleUsers(req, res));
 
+    // Enviar varias notificaciones distintas en un solo request
+    router.post('/users/batch', (req, res) => notificationController.sendBatch(req, res));
+
     // Broadcast a todos los usuarios
     router.post('/broadcast', (req, res) => notificationController.broadcast(req, res));
 
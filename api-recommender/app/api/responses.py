@@ -0,0 +1,64 @@
+"""Serialización rápida de respuestas de recomendaciones (opt-in con FAST_JSON_RESPONSES).
+
+Justificación técnica:
+- Con response_model, FastAPI valida cada OrchardRecommendation con Pydantic y
+  luego codifica con json.dumps; para limit=50 o batches es CPU visible.
+- Las recomendaciones son datos internos de confianza: rank_for_user ya fija los
+  tipos de cada campo (str/int/float) y el orden de claves de los schemas, así
+  que se pueden serializar directamente con orjson sin validar.
+- orjson y repr() difieren en floats con |x| < 1e-4 o >= 1e16 ("0.00001" vs
+  "1e-05", "1e16" vs "1e+16"). Los floats de la respuesta se revisan
+  vectorizados (NumPy) y, si aparece alguno, esa respuesta se escribe con
+  json.dumps: los bytes son siempre idénticos a los del camino con
+  response_model (tests/test_responses.py).
+"""
+import json
+from datetime import datetime
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict
+
+import numpy as np
+import orjson
+from fastapi.responses import Response
+
+# Campos float de OrchardRecommendation
+_RECOMMENDATION_FLOATS = itemgetter("estimatedWeeklyWater", "fitness", "score")
+
+
+def orjson_matches_repr(content: Dict[str, Any]) -> bool:
+    """True si orjson escribe todos los floats de la respuesta igual que repr().
+
+    NaN/inf cuentan como iguales: ambos caminos los escriben como null.
+    """
+    responses = content.get("results", [content])
+    values = np.fromiter(
+        chain.from_iterable(
+            _RECOMMENDATION_FLOATS(recommendation)
+            for response in responses
+            for recommendation in response["recommendations"]
+        ),
+        dtype=np.float64
+    )
+    magnitude = np.abs(values)
+    exact = (magnitude == 0) | ((magnitude >= 1e-4) & (magnitude < 1e16)) | ~np.isfinite(magnitude)
+    return bool(exact.all())
+
+
+def _isoformat(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RecommendationsJSONResponse(Response):
+    """JSON de RecommendationsResponse / BatchRecommendationsResponse sin validación Pydantic."""
+
+    media_type = "application/json"
+
+    def render(self, content: Dict[str, Any]) -> bytes:
+        if orjson_matches_repr(content):
+            return orjson.dumps(content)
+        return json.dumps(
+            content, default=_isoformat, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
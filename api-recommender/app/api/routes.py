@@ -1,16 +1,30 @@
 """Rutas de la API FastAPI."""
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
 
 from app.api import schemas
 from app.api.deps import get_db, get_current_user
-from app.services import training_service, recommendation_service
+from app.api.responses import RecommendationsJSONResponse
+from app.core.config import settings
+from app.core.metrics import render_metrics
+from app.services import export_service, training_service, recommendation_service
+from app.services.model_registry import model_registry
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _recommendations_response(content: Dict[str, Any]):
+    """Con FAST_JSON_RESPONSES se serializa con orjson sin validar contra response_model."""
+    if settings.FAST_JSON_RESPONSES:
+        return RecommendationsJSONResponse(content)
+    return content
+
 
 @router.post("/train", response_model=schemas.TrainingResponse, tags=["Training"])
 async def train_model(
@@ -37,11 +51,53 @@ async def get_training_status(db=Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/clusters", response_model=schemas.ClustersInfo, tags=["Clusters"])
-async def get_clusters(db=Depends(get_db)):
+@router.get("/models", response_model=schemas.ModelVersions, tags=["Training"])
+async def list_model_versions(current_user: Optional[dict] = Depends(get_current_user)):
+    """Versiones del registro de modelos y cuál está activa (admin only)."""
+    return model_registry.describe()
+
+
+@router.post("/models/rollback", response_model=schemas.ModelVersions, tags=["Training"])
+async def rollback_model(db=Depends(get_db), current_user: Optional[dict] = Depends(get_current_user)):
+    """Reactiva la versión anterior a la activa y reasigna usuarios con ella (admin only)."""
+    try:
+        await training_service.activate_model_version(db)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_registry.describe()
+
+
+@router.post("/models/{version}/promote", response_model=schemas.ModelVersions, tags=["Training"])
+async def promote_model(version: str, db=Depends(get_db), current_user: Optional[dict] = Depends(get_current_user)):
+    """Activa una versión concreta del registro y reasigna usuarios con ella (admin only)."""
+    try:
+        await training_service.activate_model_version(db, version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return model_registry.describe()
+
+
+@router.get(
+    "/clusters",
+    response_model=schemas.ClustersInfo,
+    response_model_exclude_none=True,
+    tags=["Clusters"]
+)
+async def get_clusters(
+    include: Optional[str] = Query(
+        None,
+        description="Secciones opcionales separadas por coma: centroids, scaled, profiles o all"
+    ),
+    db=Depends(get_db)
+):
     """Lista todos los clusters con metadata."""
     try:
-        clusters_info = await training_service.get_clusters_info(db)
+        sections = training_service.parse_cluster_include(include)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        clusters_info = await training_service.get_clusters_info(db, include=sections)
         return clusters_info
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -62,12 +118,79 @@ async def get_user_recommendations(
         recommendations = await recommendation_service.get_recommendations_for_user(
             db, user_id, limit=limit
         )
-        return recommendations
+        return _recommendations_response(recommendations)
     except Exception as e:
         logger.error(f"Failed to get recommendations for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post(
+    "/recommendations/batch",
+    response_model=schemas.BatchRecommendationsResponse,
+    tags=["Recommendations"]
+)
+async def get_batch_recommendations(
+    payload: schemas.BatchRecommendationsRequest,
+    db=Depends(get_db)
+):
+    """Obtiene recomendaciones para varios usuarios (máx. 100 por request)."""
+    try:
+        results = await recommendation_service.get_recommendations_for_users(
+            db, payload.userIds, limit=payload.limit
+        )
+        return _recommendations_response(results)
+    except Exception as e:
+        logger.error(f"Failed to get batch recommendations: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _resolve_export(db, cursor: Optional[str]):
+    """Valida entrenamiento y cursor antes de empezar el stream (después ya no hay status)."""
+    try:
+        return await export_service.resolve_export(db, cursor)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except export_service.StaleCursorError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/exports/assignments", tags=["Exports"])
+async def export_assignments(
+    cluster_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, description="Máximo de usuarios en esta respuesta"),
+    db=Depends(get_db),
+    current_user: Optional[dict] = Depends(get_current_user)
+):
+    """Mapeo usuario→cluster en NDJSON (reanudable con la última línea `cursor`)."""
+    trained_at, after = await _resolve_export(db, cursor)
+    return StreamingResponse(
+        export_service.stream_assignments(db, trained_at, after, cluster_id=cluster_id, limit=limit),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+@router.get("/exports/recommendations", tags=["Exports"])
+async def export_recommendations(
+    cluster_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, description="Máximo de usuarios en esta respuesta"),
+    top_n: int = Query(10, ge=1, le=100),
+    db=Depends(get_db),
+    current_user: Optional[dict] = Depends(get_current_user)
+):
+    """Top-N por usuario en NDJSON (reanudable con la última línea `cursor`)."""
+    trained_at, after = await _resolve_export(db, cursor)
+    return StreamingResponse(
+        export_service.stream_recommendations(
+            db, trained_at, after, cluster_id=cluster_id, limit=limit, top_n=top_n
+        ),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
 @router.post("/webhook/user-registered", tags=["Webhooks"])
 async def user_registered_webhook(
     payload: schemas.UserRegisteredWebhook,
@@ -75,7 +198,9 @@ async def user_registered_webhook(
 ):
     """Webhook para usuario recién registrado - genera recomendación y notifica."""
     try:
-        await recommendation_service.handle_user_registered(db, payload.userId)
+        await recommendation_service.submit_user_registered(
+            db, payload.userId, payload.experienceLevel, payload.latitude, payload.longitude
+        )
         return {"success": True, "message": "User processed"}
     except Exception as e:
         logger.error(f"Webhook failed for user {payload.userId}: {e}")
@@ -94,3 +219,10 @@ async def notify_cluster(
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/metrics", tags=["Observability"], include_in_schema=False)
+async def metrics():
+    """Métricas en formato Prometheus (agregadas entre workers)."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
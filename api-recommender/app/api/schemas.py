@@ -20,17 +20,34 @@ class TrainingStatus(BaseModel):
     metrics: Optional[Dict[str, float]]
 
 
+class ModelVersionInfo(BaseModel):
+    version: str
+    active: bool
+    parent: Optional[str] = None  # versión entrenada de un checkpoint de centroides online
+
+
+class ModelVersions(BaseModel):
+    active: Optional[str]
+    versions: List[ModelVersionInfo]
+
+
 class ClusterInfo(BaseModel):
     cluster_id: int
     size: int
-    centroid_numeric: List[float]
-    centroid_categorical: List[int]
+    partition: Optional[str] = None  # valor(es) de TRAINING_PARTITION_KEY en modelos particionados
+    centroid_numeric: Optional[List[float]] = None
+    centroid_categorical: Optional[List[int]] = None
+    centroid_numeric_scaled: Optional[List[float]] = None
+    feature_means: Optional[List[float]] = None
+    feature_stds: Optional[List[float]] = None
 
 
 class ClustersInfo(BaseModel):
     n_clusters: int
     clusters: List[ClusterInfo]
     total_users: int
+    feature_names_numeric: Optional[List[str]] = None
+    feature_names_categorical: Optional[List[str]] = None
 
 
 class OrchardRecommendation(BaseModel):
@@ -45,10 +62,24 @@ class OrchardRecommendation(BaseModel):
 
 class RecommendationsResponse(BaseModel):
     userId: str
-    clusterIdAssigned: int
+    clusterIdAssigned: Optional[int] = None  # None: usuario sin cluster (índice cold-start)
     recommendations: List[OrchardRecommendation]
     generatedAt: datetime
 
 
+class BatchRecommendationsRequest(BaseModel):
+    userIds: List[str] = Field(..., min_length=1, max_length=100)
+    limit: int = 10
+
+
+class BatchRecommendationsResponse(BaseModel):
+    results: List[RecommendationsResponse]
+    notFound: List[str]
+
+
 class UserRegisteredWebhook(BaseModel):
     userId: str
+    # Señales opcionales del registro; con experienceLevel no se consulta la BD
+    experienceLevel: Optional[int] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
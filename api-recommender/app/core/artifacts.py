@@ -0,0 +1,283 @@
+"""Formato de artefactos de modelo: manifest JSON + arrays `.npy`.
+
+Justificación técnica:
+- joblib/pickle serializa objetos completos (KPrototypes, StandardScaler): carga
+  lenta, atada a las versiones exactas de las librerías y sin memory-mapping.
+- Un artefacto es un directorio con `manifest.json` (formato, metadata JSON y
+  por cada array: archivo, dtype, shape y sha256) y un `.npy` por array. Los
+  `.npy` se abren con mmap_mode='r': cargar es leer el manifest y mapear
+  archivos, y varios workers comparten las mismas páginas.
+- Se escribe en un directorio temporal y se renombra al final, así un lector
+  nunca ve un artefacto a medias.
+- Sólo arrays numéricos o de strings (allow_pickle=False).
+- Los checksums se verifican en la primera carga de cada manifest (mismo
+  dispositivo, inode y mtime) dentro del proceso; las recargas del mismo
+  artefacto sólo mapean. Un artefacto publicado no se modifica: reemplazarlo
+  crea un manifest nuevo, que se vuelve a verificar.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Any, Generic, Optional, Set, Tuple, TypeVar
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = "recommender-artifact"
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+HASH_CHUNK_BYTES = 1 << 20
+
+T = TypeVar("T")
+
+# Manifests ya verificados en este proceso: (st_dev, st_ino, st_mtime_ns)
+_verified_manifests: Set[Tuple[int, int, int]] = set()
+
+
+class ArtifactError(ValueError):
+    """Artefacto inválido, incompleto o corrupto."""
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _json_default(value: Any) -> Any:
+    """Escalares NumPy y fechas dentro de la metadata."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def manifest_path(path: Path) -> Path:
+    return Path(path) / MANIFEST_FILE
+
+
+def is_artifact(path: Path) -> bool:
+    return manifest_path(path).is_file()
+
+
+def save_artifact(
+    path: Path,
+    arrays: Dict[str, np.ndarray],
+    metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Escribe un artefacto en `path` (directorio) de forma atómica; retorna el manifest."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp-{uuid.uuid4().hex}")
+    tmp.mkdir()
+
+    try:
+        entries = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            if array.dtype.hasobject:
+                raise ArtifactError(f"Array {name} has object dtype; only numeric/string arrays are supported")
+
+            filename = f"{name}.npy"
+            np.save(tmp / filename, array, allow_pickle=False)
+            entries[name] = {
+                "file": filename,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "sha256": _sha256(tmp / filename),
+            }
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "created_at": datetime.now().isoformat(),
+            "metadata": metadata or {},
+            "arrays": entries,
+        }
+        with open(manifest_path(tmp), "w") as f:
+            json.dump(manifest, f, indent=2, default=_json_default)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if path.exists():
+            old = path.with_name(f".{path.name}.old-{uuid.uuid4().hex}")
+            os.rename(path, old)
+            os.rename(tmp, path)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.rename(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    logger.info(f"Artifact saved to {path} ({len(arrays)} arrays)")
+    return manifest
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    """Lee y valida el manifest de un artefacto."""
+    try:
+        with open(manifest_path(path)) as f:
+            manifest = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ArtifactError(f"Unreadable manifest in {path}: {e}")
+
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ArtifactError(f"{path} is not a {ARTIFACT_FORMAT} artifact")
+    if manifest.get("format_version", 0) > ARTIFACT_FORMAT_VERSION:
+        raise ArtifactError(
+            f"{path} uses format version {manifest['format_version']}, "
+            f"this build reads up to {ARTIFACT_FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def _manifest_stamp(path: Path) -> Tuple[int, int, int]:
+    stat = os.stat(manifest_path(path))
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns
+
+
+def load_artifact(
+    path: Path,
+    mmap: bool = True,
+    verify: Optional[bool] = None
+) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Carga un artefacto: (arrays, metadata).
+
+    Con mmap los arrays se mapean en sólo lectura. verify compara el sha256 de
+    cada archivo con el manifest (lee los archivos completos); sin verificar la
+    carga sólo mapea y toma milisegundos. Con verify=None se verifica sólo la
+    primera carga de cada manifest en el proceso; True y False fuerzan.
+    """
+    path = Path(path)
+    stamp = _manifest_stamp(path)
+    manifest = read_manifest(path)
+    check = verify if verify is not None else stamp not in _verified_manifests
+    arrays = {}
+
+    for name, entry in manifest["arrays"].items():
+        file = path / entry["file"]
+        if check and _sha256(file) != entry["sha256"]:
+            raise ArtifactError(f"Checksum mismatch for {file}")
+
+        array = np.load(file, mmap_mode="r" if mmap else None, allow_pickle=False)
+        if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise ArtifactError(
+                f"{file}: expected {entry['dtype']} {entry['shape']}, "
+                f"found {array.dtype.str} {list(array.shape)}"
+            )
+        arrays[name] = array
+
+    if check:
+        _verified_manifests.add(stamp)
+    return arrays, manifest["metadata"]
+
+
+def legacy_path(path: Path) -> Path:
+    """Archivo joblib del formato anterior para el mismo artefacto (`<path>.joblib`)."""
+    path = Path(path)
+    return path.with_name(f"{path.name}.joblib")
+
+
+def resolve_artifact(path: Path) -> Optional[Path]:
+    """Artefacto en disco para `path`: el directorio nuevo o, si no existe, el joblib legado."""
+    if is_artifact(path):
+        return Path(path)
+    legacy = legacy_path(path)
+    return legacy if legacy.is_file() else None
+
+
+def _version_stamp(path: Path) -> Tuple[int, int]:
+    target = manifest_path(path) if Path(path).is_dir() else path
+    stat = os.stat(target)
+    return stat.st_mtime_ns, stat.st_ino
+
+
+class ArtifactStore(Generic[T]):
+    """Carga perezosa de un artefacto; se recarga cuando cambia en disco.
+
+    Lee el formato nuevo y, para migración, el joblib anterior si aún no se
+    reentrenó. `loader` recibe la ruta resuelta (directorio o archivo .joblib).
+    La primera carga es síncrona; las recargas corren en un thread y mientras
+    tanto get() sigue retornando la versión anterior, así un cambio de modelo
+    no bloquea requests en curso. El reemplazo es una asignación de referencia.
+    """
+
+    def __init__(self, label: str, path_fn: Callable[[], Path], loader: Callable[[Path], T]):
+        self.label = label
+        self.path_fn = path_fn
+        self.loader = loader
+        self._value: Optional[T] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._failed_stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+
+    def get(self) -> Optional[T]:
+        path = resolve_artifact(self.path_fn())
+        if path is None:
+            # Nunca guardado, o reemplazo en curso: se sigue sirviendo lo último cargado
+            return self._value
+
+        try:
+            stamp = _version_stamp(path)
+        except FileNotFoundError:
+            return self._value
+
+        if stamp in (self._stamp, self._failed_stamp):
+            return self._value
+
+        if self._value is None:
+            self._load(path, stamp)
+        else:
+            self._reload_in_background(path, stamp)
+        return self._value
+
+    def _reload_in_background(self, path: Path, stamp: Tuple[int, int]):
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(
+                target=self._load, args=(path, stamp), name=f"reload-{self.label}", daemon=True
+            )
+            self._reload_thread.start()
+
+    def _load(self, path: Path, stamp: Tuple[int, int]):
+        try:
+            value = self.loader(path)
+        except Exception as e:
+            logger.error(f"Failed to load {self.label} from {path}: {e}")
+            self._failed_stamp = stamp
+            return
+
+        self._value = value
+        self._stamp = stamp
+        logger.info(f"{self.label} loaded from {path}")
+
+    def wait_for_reload(self, timeout: Optional[float] = None):
+        """Espera a que termine una recarga en curso (tests y warm-up)."""
+        thread = self._reload_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def set(self, value: T):
+        """Publica un artefacto recién guardado en este proceso."""
+        self._value = value
+        path = resolve_artifact(self.path_fn())
+        try:
+            self._stamp = _version_stamp(path) if path else None
+        except FileNotFoundError:
+            self._stamp = None
@@ -21,6 +21,35 @@ class Settings(BaseSettings):
     MAX_CLUSTERS: int = 15
     OPTIMAL_CLUSTER_METHOD: str = "silhouette"
     RETRAIN_THRESHOLD_PCT: float = 0.15
+    TRAINING_WARM_START: bool = True  # sembrar con los centroides del modelo activo
+    WARM_START_SILHOUETTE_TOLERANCE: float = 0.02  # caída de silhouette aceptada sin barrido de k
+    LOCATION_REGIONS_REUSE: bool = True  # reutilizar las regiones de ubicación del modelo activo
+    LOCATION_DRIFT_THRESHOLD: float = 0.25  # aumento relativo de la distancia² media que fuerza reajuste
+    CLUSTER_METRICS_BLOCK_ROWS: int = 8192  # filas por bloque al calcular silhouette
+    CLUSTER_METRICS_N_JOBS: int = 1  # threads para los bloques de silhouette
+    FEATURE_STORE_ENABLED: bool = True  # ingest desde la colección user_features
+    FEATURE_STORE_SYNC_ON_TRAINING: bool = True  # verificar stamps antes de leer user_features
+    TRAINING_PARTITION_KEY: str = ""  # columna categórica ("cluster_region", "objective"); "" = modelo global
+    TRAINING_PARTITION_WORKERS: int = 0  # procesos para entrenar particiones (0 = CPUs disponibles)
+    TRAINING_PARTITION_MIN_USERS: int = 1000  # valores con menos usuarios se agrupan en una partición común
+    COMPACT_FEATURES: bool = False  # matrices float32 / int8-int16 en entrenamiento y predictor
+    ONLINE_CENTROID_UPDATES: bool = False  # asignar usuarios nuevos y actualizar centroides entre entrenamientos
+    ONLINE_CENTROID_PRIOR_WEIGHT: float = 0.0  # peso extra del centroide entrenado (además del tamaño del cluster)
+    ONLINE_CENTROID_MIN_LEARNING_RATE: float = 0.0005  # tasa mínima por usuario (sigue la deriva)
+    ONLINE_CENTROID_CHECKPOINT_USERS: int = 500  # asignaciones entre checkpoints al registro
+
+    # Recommendations
+    CLUSTER_TOP_N: int = 100
+    NEIGHBOR_INDEX_ENABLED: bool = True
+    NEIGHBOR_K: int = 50
+    NEIGHBOR_INDEX_N_PROBE: int = 16
+    COLD_START_INDEX_ENABLED: bool = True
+    COLD_START_TOP_N: int = 50  # huertos por bucket (región, experiencia)
+    FAST_JSON_RESPONSES: bool = False  # recomendaciones con orjson, sin validar response_model
+    EXPORT_BATCH_SIZE: int = 1000  # usuarios por batch (y por línea cursor) en /exports
+    WEBHOOK_BATCHING: bool = True  # micro-batches de /webhook/user-registered
+    WEBHOOK_BATCH_WINDOW_MS: float = 5.0  # espera máxima para juntar webhooks
+    WEBHOOK_MAX_BATCH: int = 64  # webhooks por batch
 
     # Scheduler
     MONTHLY_RETRAIN_DAY: int = 1
@@ -30,7 +59,18 @@ class Settings(BaseSettings):
 
     # Model Storage
     MODEL_STORAGE_PATH: str = "./models"
-    MODEL_VERSION: str = "v1"
+    MODEL_VERSION: str = "v1"  # prefijo de las versiones del registro
+    MODEL_REGISTRY_KEEP_VERSIONS: int = 5
+    TRAINING_PROFILER: str = ""  # "", "cprofile" o "pyinstrument"
+
+    # Cache
+    TRAINING_CACHE_TTL_SECONDS: float = 30.0
+
+    # Change Streams (requieren replica set)
+    CHANGE_STREAMS_ENABLED: bool = True
+    CHANGE_STREAM_BATCH_WINDOW_MS: int = 200
+    CHANGE_STREAM_MAX_BATCH: int = 500
+    CHANGE_STREAM_LEASE_SECONDS: int = 30
 
     # Security
     JWT_SECRET_KEY: str
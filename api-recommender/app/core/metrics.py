@@ -0,0 +1,109 @@
+"""Métricas Prometheus del recommender.
+
+Justificación técnica:
+- Histogramas de latencia por ruta y por fase interna (lookup de usuario, fetch de
+  candidatos, scoring, envío de notificaciones) y por fase de entrenamiento.
+- Contadores de hits/misses por caché (el ratio se calcula en PromQL), de
+  llamadas coalescidas por singleflight (ratio de deduplicación = shared / total)
+  y de notificaciones enviadas (throughput del fan-out).
+- Con varios workers de uvicorn cada proceso tiene sus propios contadores; si
+  PROMETHEUS_MULTIPROC_DIR está definido (antes de arrancar los workers) los
+  valores se escriben en archivos mmap y /metrics agrega todos los procesos.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROC_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+REQUEST_LATENCY = Histogram(
+    "recommender_http_request_duration_seconds",
+    "Latencia de requests HTTP por ruta",
+    ["method", "route", "status"],
+)
+
+PHASE_LATENCY = Histogram(
+    "recommender_phase_duration_seconds",
+    "Latencia de fases internas del request path",
+    ["phase"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+TRAINING_PHASE_DURATION = Histogram(
+    "recommender_training_phase_duration_seconds",
+    "Duración de fases del entrenamiento",
+    ["phase"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0),
+)
+
+CACHE_REQUESTS = Counter(
+    "recommender_cache_requests_total",
+    "Lecturas de cachés internas por resultado (hit/miss)",
+    ["cache", "result"],
+)
+
+SINGLEFLIGHT_CALLS = Counter(
+    "recommender_singleflight_calls_total",
+    "Llamadas por grupo singleflight: leader ejecuta, shared reutiliza una en vuelo",
+    ["group", "role"],
+)
+
+MICROBATCH_SIZE = Histogram(
+    "recommender_microbatch_size",
+    "Items por batch procesado en cada micro-batcher",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+NOTIFICATIONS_SENT = Counter(
+    "recommender_notifications_total",
+    "Requests al servicio de notificaciones por endpoint y resultado",
+    ["endpoint", "outcome"],
+)
+
+NOTIFICATION_RECIPIENTS = Counter(
+    "recommender_notification_recipients_total",
+    "Destinatarios incluidos en envíos de notificaciones",
+    ["endpoint"],
+)
+
+
+@contextmanager
+def observe_phase(phase: str, histogram: Histogram = PHASE_LATENCY):
+    """Mide la duración de un bloque (sync o con awaits) en el histograma dado."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(phase=phase).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool):
+    """Registra un hit o miss de caché."""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Serializa las métricas; agrega todos los workers en modo multiproceso."""
+    if os.environ.get(MULTIPROC_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Limpia archivos de métricas del worker actual al apagarse."""
+    if os.environ.get(MULTIPROC_ENV):
+        multiprocess.mark_process_dead(os.getpid())
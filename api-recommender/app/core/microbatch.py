@@ -0,0 +1,121 @@
+"""Micro-batching de llamadas concurrentes.
+
+Justificación técnica:
+- En ráfagas (p. ej. campañas de registro) cada request repetía por separado
+  la misma lectura a Mongo, el mismo cálculo y el mismo envío al servicio de
+  notificaciones.
+- submit() encola el item y espera su resultado. Los items que llegan dentro
+  de una ventana corta (o hasta max_batch) forman un batch y el handler los
+  procesa juntos: recibe la lista y retorna un resultado por item, en el mismo
+  orden. Un resultado que es una excepción sólo falla a su llamador; si el
+  handler falla, fallan todos los del batch.
+- Los batches se separan por clave (p. ej. la base de datos del request): el
+  handler recibe la clave junto con sus items.
+- Cancelar un request no cancela el batch: su item se procesa igual y el
+  resultado se descarta.
+- Si el batch se cancela (close() al apagar el servicio) o el handler lanza
+  una BaseException, los futures pendientes se cancelan: submit() nunca queda
+  esperando un resultado que no va a llegar.
+- recommender_microbatch_size{batcher} da el tamaño de los batches procesados.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Set, TypeVar, Union
+
+from app.core.metrics import MICROBATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BatchHandler = Callable[[Any, List[T]], Awaitable[List[Union[R, BaseException]]]]
+
+
+class _Batch:
+    __slots__ = ("key", "items", "futures", "timer")
+
+    def __init__(self, key: Any):
+        self.key = key
+        self.items: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher(Generic[T, R]):
+    """Junta items concurrentes por ventana de tiempo o tamaño y los procesa juntos."""
+
+    def __init__(self, name: str, handler: BatchHandler, window_ms: float, max_batch: int):
+        self.name = name
+        self.handler = handler
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._batches: Dict[int, _Batch] = {}
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Any, item: T) -> R:
+        """Encola item en el batch abierto de `key` y espera su resultado."""
+        loop = asyncio.get_running_loop()
+        batch = self._batches.get(id(key))
+        if batch is None:
+            batch = self._batches[id(key)] = _Batch(key)
+            batch.timer = loop.call_later(self.window, self._flush, batch)
+
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.max_batch:
+            self._flush(batch)
+
+        return await future
+
+    def _flush(self, batch: _Batch):
+        if self._batches.get(id(batch.key)) is not batch:
+            return
+        del self._batches[id(batch.key)]
+        batch.timer.cancel()
+
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: _Batch):
+        MICROBATCH_SIZE.labels(batcher=self.name).observe(len(batch.items))
+        try:
+            try:
+                results = await self.handler(batch.key, batch.items)
+                if len(results) != len(batch.items):
+                    raise RuntimeError(f"handler returned {len(results)} results for {len(batch.items)} items")
+            except Exception as e:
+                logger.error(f"Micro-batch {self.name} of {len(batch.items)} items failed: {e}")
+                results = [e] * len(batch.items)
+
+            for future, result in zip(batch.futures, results):
+                if future.done():
+                    # Llamador cancelado
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            # Batch cancelado (o BaseException del handler): ningún llamador queda esperando
+            for future in batch.futures:
+                if not future.done():
+                    future.cancel()
+
+    async def close(self):
+        """Cancela los batches abiertos y en curso; sus llamadores reciben CancelledError."""
+        for batch in list(self._batches.values()):
+            batch.timer.cancel()
+            for future in batch.futures:
+                future.cancel()
+        self._batches.clear()
+
+        running = list(self._running)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    def pending(self) -> int:
+        return sum(len(batch.items) for batch in self._batches.values())
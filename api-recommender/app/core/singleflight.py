@@ -0,0 +1,72 @@
+"""Coalescencia de llamadas concurrentes idénticas (singleflight).
+
+Justificación técnica:
+- Tras una campaña push muchos usuarios del mismo cluster piden recomendaciones
+  a la vez; cada request repetía las mismas consultas a Mongo.
+- Las llamadas con la misma clave mientras una está en vuelo esperan la misma
+  tarea y reciben su resultado (o su excepción); al terminar la clave se libera,
+  así no hay caché ni datos viejos.
+- Cancelación: cada llamador espera la tarea con asyncio.shield, así cancelar un
+  request no cancela el trabajo de los demás. Si todos los llamadores se
+  cancelan, la tarea se cancela y la clave se libera en el acto, así una
+  llamada nueva arranca otra ejecución en lugar de recibir CancelledError.
+- recommender_singleflight_calls_total{role=leader|shared} por grupo da el ratio
+  de deduplicación.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.core.metrics import SINGLEFLIGHT_CALLS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Grupo de llamadas coalescidas por clave."""
+
+    def __init__(self, group: str):
+        self.group = group
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Ejecuta fn() o se une a la ejecución en vuelo con la misma clave."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+            SINGLEFLIGHT_CALLS.labels(group=self.group, role="leader").inc()
+        else:
+            SINGLEFLIGHT_CALLS.labels(group=self.group, role="shared").inc()
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nadie espera el resultado (todos los llamadores se cancelaron). La clave
+                # se libera antes de cancelar: un llamador nuevo no debe unirse a esta tarea
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled() and call.task.exception() is not None and call.waiters == 0:
+            logger.debug(f"Singleflight {self.group} call {key!r} failed without waiters")
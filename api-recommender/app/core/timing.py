@@ -0,0 +1,98 @@
+"""Spans de tiempo estructurados y captura opcional de perfiles.
+
+Justificación técnica:
+- Cada span es un dict (nombre, segundos y atributos como k) que se puede guardar
+  tal cual en training_history y en las métricas del modelo.
+- Los spans de primer nivel también alimentan el histograma Prometheus de fases
+  de entrenamiento.
+- El profiler (cProfile o pyinstrument) se activa con TRAINING_PROFILER y escribe
+  el perfil junto al archivo del modelo.
+"""
+import cProfile
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from app.core.metrics import TRAINING_PHASE_DURATION
+
+logger = logging.getLogger(__name__)
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+class SpanRecorder:
+    """Registra spans de tiempo como dicts serializables."""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def span(self, name: str, phase: Optional[str] = None, **attrs):
+        """Mide un bloque; el dict del span se entrega para agregar atributos.
+
+        Args:
+            name: Nombre del span
+            phase: Si se indica, también se observa en el histograma de fases
+            **attrs: Atributos adicionales (ej. k=5)
+        """
+        record = {"name": name, **attrs}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 6)
+            self.spans.append(record)
+            if phase:
+                TRAINING_PHASE_DURATION.labels(phase=phase).observe(record["seconds"])
+            logger.debug(f"span {record}")
+
+    def totals(self) -> Dict[str, float]:
+        """Suma de segundos por nombre de span."""
+        totals: Dict[str, float] = {}
+        for record in self.spans:
+            totals[record["name"]] = round(totals.get(record["name"], 0.0) + record["seconds"], 6)
+        return totals
+
+
+@contextmanager
+def capture_profile(profiler: str, output_base: Path):
+    """Perfila el bloque y escribe `<output_base>.prof` (cProfile) o `.html` (pyinstrument).
+
+    Con profiler vacío no hace nada. Si pyinstrument no está instalado usa cProfile.
+    """
+    if not profiler:
+        yield None
+        return
+
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler '{profiler}'. Valid: {PROFILERS}")
+
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument not installed, falling back to cProfile")
+            profiler = "cprofile"
+
+    if profiler == "pyinstrument":
+        output = output_base.with_suffix(".html")
+        instrument = Profiler()
+        instrument.start()
+        try:
+            yield output
+        finally:
+            instrument.stop()
+            output.write_text(instrument.output_html())
+            logger.info(f"Training profile written to {output}")
+    else:
+        output = output_base.with_suffix(".prof")
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield output
+        finally:
+            profile.disable()
+            profile.dump_stats(output)
+            logger.info(f"Training profile written to {output}")
@@ -1,13 +1,20 @@
 """Aplicación principal FastAPI - Recommender Service."""
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.core.config import settings
+from app.core.metrics import REQUEST_LATENCY, mark_process_dead
 from app.api import routes
 from app.services.scheduler import start_scheduler
+from app.services.change_stream_consumer import ChangeStreamConsumer
+from app.services.cluster_predictor import cluster_predictor_store
+from app.services.neighbor_index import neighbor_index_store
+from app.services.recommendation_service import user_registered_batcher
 
 # Configurar logging
 logging.basicConfig(
@@ -19,13 +26,14 @@ logger = logging.getLogger(__name__)
 # Cliente MongoDB global
 mongodb_client: AsyncIOMotorClient = None
 database = None
+change_consumer: ChangeStreamConsumer = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager para startup/shutdown."""
     # Startup
-    global mongodb_client, database
+    global mongodb_client, database, change_consumer
     logger.info("Starting Recommender Service...")
 
     # Conectar a MongoDB
@@ -38,12 +46,27 @@ async def lifespan(app: FastAPI):
     start_scheduler()
     logger.info("Scheduler started")
 
+    # Cargar predictor e índice de la versión activa fuera del event loop
+    await asyncio.gather(
+        asyncio.to_thread(cluster_predictor_store.get),
+        asyncio.to_thread(neighbor_index_store.get),
+    )
+
+    # Mantenimiento incremental vía change streams
+    if settings.CHANGE_STREAMS_ENABLED:
+        change_consumer = ChangeStreamConsumer(database)
+        await change_consumer.start()
+
     yield
 
     # Shutdown
     logger.info("Shutting down...")
+    if change_consumer:
+        await change_consumer.stop()
+    await user_registered_batcher.close()
     if mongodb_client:
         mongodb_client.close()
+    mark_process_dead()
 
 
 # Crear app
@@ -63,6 +86,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Registra la latencia de cada request por plantilla de ruta."""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=str(status_code)
+        ).observe(time.perf_counter() - start)
+
 # Incluir rutas
 app.include_router(routes.router)
 
@@ -0,0 +1,370 @@
+"""Consumidor de change streams para mantener incrementalmente el estado de recomendaciones.
+
+Justificación técnica:
+- Los servicios de orchards y AG crean/modifican huertos constantemente; sin este
+  consumidor el recommender sólo los vería en el siguiente entrenamiento.
+- Se observan `orchards`, `users` y `training_history`. Los eventos se acumulan en
+  una ventana corta (CHANGE_STREAM_BATCH_WINDOW_MS o CHANGE_STREAM_MAX_BATCH eventos)
+  y se coalescen por documento antes de aplicarse, así una ráfaga de cambios sobre
+  el mismo huerto produce una sola escritura por cluster.
+- Los resume tokens se guardan en `change_stream_state` después de aplicar cada
+  batch (entrega at-least-once; las actualizaciones son idempotentes).
+- Con varios workers sólo el dueño de un lease en `change_stream_state` consume,
+  para no multiplicar escrituras.
+- Los mismos eventos refrescan las filas de `user_features` de los usuarios
+  afectados (ver feature_store); los updates de usuario que no tocan campos de
+  features (p. ej. el cluster_id que escribe el entrenamiento) se ignoran.
+- Con ONLINE_CENTROID_UPDATES los usuarios sin cluster_id del batch se asignan
+  con el predictor vigente, que a su vez se actualiza con ellos (ver
+  online_centroids); los checkpoints pendientes se publican al detenerse.
+- Change streams requieren replica set; en un MongoDB standalone el consumidor se
+  desactiva con un warning.
+"""
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.services.cluster_recommendations import score_orchard, top_entries
+from app.services.feature_store import USER_PROJECTION, feature_store
+from app.services.online_centroids import online_centroids
+from app.services.training_cache import training_history_cache
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ("orchards", "users", "training_history")
+STATE_COLLECTION = "change_stream_state"
+LEASE_ID = "lease"
+
+# Códigos de error de MongoDB
+NOT_A_REPLICA_SET = 40573
+CHANGE_STREAM_FATAL = 280
+CHANGE_STREAM_HISTORY_LOST = 286
+
+MAX_RETRY_DELAY_SECONDS = 30.0
+
+ChangeEvent = Tuple[str, Dict[str, Any]]
+
+
+class ChangeStreamConsumer:
+    """Observa colecciones y aplica los cambios en batches al estado de recomendaciones."""
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        batch_window_ms: int = None,
+        max_batch: int = None,
+        lease_seconds: int = None
+    ):
+        self.db = db
+        self.batch_window = (batch_window_ms or settings.CHANGE_STREAM_BATCH_WINDOW_MS) / 1000
+        self.max_batch = max_batch or settings.CHANGE_STREAM_MAX_BATCH
+        self.lease_seconds = lease_seconds or settings.CHANGE_STREAM_LEASE_SECONDS
+        self.owner_id = uuid.uuid4().hex
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._watchers: List[asyncio.Task] = []
+        self._tasks: List[asyncio.Task] = []
+        self._unsupported = False
+
+    async def start(self):
+        """Inicia el loop de lease y el aplicador de batches."""
+        self._tasks = [
+            asyncio.create_task(self._lease_loop()),
+            asyncio.create_task(self._batch_loop()),
+        ]
+        logger.info(f"Change stream consumer started (owner={self.owner_id})")
+
+    async def stop(self):
+        """Detiene watchers y tareas internas."""
+        await self._stop_watchers()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if settings.ONLINE_CENTROID_UPDATES:
+            try:
+                await online_centroids.checkpoint()
+            except Exception as e:
+                logger.error(f"Failed to checkpoint online centroids: {e}")
+        logger.info("Change stream consumer stopped")
+
+    # ===== LEASE =====
+
+    async def _acquire_lease(self) -> bool:
+        """Toma o renueva el lease de consumidor; False si otro worker lo tiene."""
+        now = datetime.utcnow()
+        try:
+            doc = await self.db[STATE_COLLECTION].find_one_and_update(
+                {"_id": LEASE_ID, "$or": [{"owner": self.owner_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner_id, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return doc is not None
+        except DuplicateKeyError:
+            return False
+
+    async def _lease_loop(self):
+        while not self._unsupported:
+            try:
+                if await self._acquire_lease():
+                    if not self._watchers:
+                        logger.info("Change stream lease acquired, starting watchers")
+                        self._watchers = [
+                            asyncio.create_task(self._watch(name)) for name in WATCHED_COLLECTIONS
+                        ]
+                elif self._watchers:
+                    logger.warning("Change stream lease lost, stopping watchers")
+                    await self._stop_watchers()
+            except PyMongoError as e:
+                logger.warning(f"Change stream lease check failed: {e}")
+
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def _stop_watchers(self):
+        for task in self._watchers:
+            task.cancel()
+        await asyncio.gather(*self._watchers, return_exceptions=True)
+        self._watchers = []
+
+    # ===== RESUME TOKENS =====
+
+    async def _load_resume_token(self, collection: str) -> Optional[Dict[str, Any]]:
+        state = await self.db[STATE_COLLECTION].find_one({"_id": collection})
+        return state.get("resume_token") if state else None
+
+    async def _save_resume_token(self, collection: str, token: Dict[str, Any]):
+        await self.db[STATE_COLLECTION].replace_one(
+            {"_id": collection},
+            {"_id": collection, "resume_token": token, "updated_at": datetime.utcnow()},
+            upsert=True
+        )
+
+    # ===== WATCHERS =====
+
+    async def _watch(self, collection: str):
+        """Encola los eventos de una colección, reintentando con backoff."""
+        delay = 1.0
+        while True:
+            token = await self._load_resume_token(collection)
+            try:
+                async with self.db[collection].watch(
+                    full_document="updateLookup",
+                    resume_after=token
+                ) as stream:
+                    delay = 1.0
+                    async for change in stream:
+                        await self._queue.put((collection, change))
+            except OperationFailure as e:
+                if e.code == NOT_A_REPLICA_SET:
+                    logger.warning("Change streams require a replica set; incremental maintenance disabled")
+                    self._unsupported = True
+                    return
+                if e.code in (CHANGE_STREAM_FATAL, CHANGE_STREAM_HISTORY_LOST):
+                    logger.warning(f"Resume token for {collection} no longer valid, restarting from now")
+                    await self.db[STATE_COLLECTION].delete_one({"_id": collection})
+                else:
+                    logger.error(f"Change stream on {collection} failed: {e}")
+            except PyMongoError as e:
+                logger.error(f"Change stream on {collection} interrupted: {e}")
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY_SECONDS)
+
+    def submit(self, collection: str, change: Dict[str, Any]):
+        """Encola un evento (usado por los watchers y por tests sin replica set)."""
+        self._queue.put_nowait((collection, change))
+
+    # ===== BATCHING =====
+
+    async def _next_batch(self) -> List[ChangeEvent]:
+        """Espera un evento y junta los que lleguen dentro de la ventana."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _batch_loop(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.apply_batch(batch)
+            except Exception as e:
+                logger.error(f"Failed to apply change batch of {len(batch)} events: {e}")
+
+    async def apply_batch(self, batch: List[ChangeEvent]) -> Dict[str, int]:
+        """Coalesce y aplica un batch de eventos; luego persiste los resume tokens."""
+        latest: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        tokens: Dict[str, Dict[str, Any]] = {}
+        for collection, change in batch:
+            latest[(collection, change["documentKey"]["_id"])] = change
+            if "_id" in change:
+                tokens[collection] = change["_id"]
+
+        by_collection = defaultdict(list)
+        for (collection, _), change in latest.items():
+            by_collection[collection].append(change)
+
+        if by_collection["training_history"]:
+            training_history_cache.invalidate()
+
+        updated_clusters = await self._apply_orchard_changes(by_collection["orchards"])
+        removed_users = await self._apply_user_changes(by_collection["users"])
+        refreshed_features = await self._refresh_features(by_collection["users"], by_collection["orchards"])
+        assigned_users = await self._assign_new_users(by_collection["users"])
+
+        for collection, token in tokens.items():
+            await self._save_resume_token(collection, token)
+
+        logger.debug(
+            f"Applied {len(batch)} change events ({len(latest)} after coalescing): "
+            f"clusters updated={updated_clusters}, users removed={removed_users}, "
+            f"feature rows refreshed={refreshed_features}, users assigned={assigned_users}"
+        )
+        return {
+            "events": len(batch),
+            "coalesced": len(latest),
+            "clusters_updated": updated_clusters,
+            "users_removed": removed_users,
+            "features_refreshed": refreshed_features,
+            "users_assigned": assigned_users
+        }
+
+    async def _apply_orchard_changes(self, changes: List[Dict[str, Any]]) -> int:
+        """Actualiza las listas top-N de los clusters afectados."""
+        if not changes:
+            return 0
+
+        changed_ids = [str(c["documentKey"]["_id"]) for c in changes]
+        upserts = [
+            c["fullDocument"] for c in changes
+            if c.get("operationType") != "delete"
+            and c.get("fullDocument")
+            and c["fullDocument"].get("state", True)
+        ]
+
+        # Cluster del dueño de cada huerto vigente
+        owner_ids = list({o.get("userId") for o in upserts if o.get("userId")})
+        owners_cursor = self.db.users.find({"_id": {"$in": owner_ids}}, projection={"cluster_id": 1})
+        owner_clusters = {str(u["_id"]): u.get("cluster_id") async for u in owners_cursor}
+
+        orchards_by_cluster = defaultdict(list)
+        for orchard in upserts:
+            cluster_id = owner_clusters.get(orchard.get("userId"))
+            if cluster_id is not None:
+                orchards_by_cluster[cluster_id].append(orchard)
+
+        # Clusters que hoy contienen alguno de los huertos (pudieron cambiar o borrarse)
+        affected = {
+            doc["_id"] async for doc in self.db.cluster_recommendations.find(
+                {"orchards.orchardId": {"$in": changed_ids}}, projection={"_id": 1}
+            )
+        }
+        affected.update(orchards_by_cluster)
+        if not affected:
+            return 0
+
+        last_training = await training_history_cache.get_latest(self.db)
+        profiles = last_training.get("cluster_profiles") if last_training else None
+        now = datetime.now()
+        changed = set(changed_ids)
+        updated = 0
+
+        for cluster_id in affected:
+            cluster_doc = await self.db.cluster_recommendations.find_one({"_id": cluster_id})
+            if cluster_doc is None:
+                # Sin lista del entrenamiento actual; se generará al entrenar
+                continue
+
+            entries = [e for e in cluster_doc.get("orchards", []) if e["orchardId"] not in changed]
+            cluster_profiles = profiles if profiles and cluster_id < len(profiles["feature_means"]) else None
+            entries.extend(
+                score_orchard(orchard, cluster_profiles, cluster_id, now)
+                for orchard in orchards_by_cluster.get(cluster_id, [])
+            )
+
+            await self.db.cluster_recommendations.update_one(
+                {"_id": cluster_id},
+                {"$set": {"orchards": top_entries(entries, settings.CLUSTER_TOP_N), "updated_at": now}}
+            )
+            updated += 1
+
+        return updated
+
+    async def _apply_user_changes(self, changes: List[Dict[str, Any]]) -> int:
+        """Elimina de las listas los huertos de usuarios borrados.
+
+        Los cambios de cluster_id los escribe el entrenamiento, que ya reconstruye
+        las listas completas, por lo que aquí se ignoran.
+        """
+        deleted = [str(c["documentKey"]["_id"]) for c in changes if c.get("operationType") == "delete"]
+        if not deleted:
+            return 0
+
+        await self.db.cluster_recommendations.update_many(
+            {"orchards.userId": {"$in": deleted}},
+            {"$pull": {"orchards": {"userId": {"$in": deleted}}}}
+        )
+        return len(deleted)
+
+    async def _refresh_features(
+        self,
+        user_changes: List[Dict[str, Any]],
+        orchard_changes: List[Dict[str, Any]]
+    ) -> int:
+        """Recalcula las filas de `user_features` de los usuarios afectados."""
+        if not settings.FEATURE_STORE_ENABLED:
+            return 0
+
+        user_ids = {str(c["documentKey"]["_id"]) for c in user_changes if _touches_user_features(c)}
+        if orchard_changes:
+            # Dueño actual y dueños previos (huertos borrados o que cambiaron de usuario)
+            user_ids.update(
+                c["fullDocument"]["userId"] for c in orchard_changes
+                if (c.get("fullDocument") or {}).get("userId")
+            )
+            user_ids.update(await feature_store.users_for_orchards(
+                self.db, [c["documentKey"]["_id"] for c in orchard_changes]
+            ))
+
+        if not user_ids:
+            return 0
+        return await feature_store.refresh_users(self.db, user_ids)
+
+    async def _assign_new_users(self, changes: List[Dict[str, Any]]) -> int:
+        """Asigna cluster (y actualiza centroides online) a los usuarios que no tienen."""
+        if not settings.ONLINE_CENTROID_UPDATES:
+            return 0
+
+        user_ids = [
+            c["documentKey"]["_id"] for c in changes
+            if c.get("operationType") != "delete"
+            and c.get("fullDocument")
+            and c["fullDocument"].get("cluster_id") is None
+        ]
+        return await online_centroids.assign_users(self.db, user_ids)
+
+
+def _touches_user_features(change: Dict[str, Any]) -> bool:
+    """False para updates de usuario que no modifican campos usados por las features."""
+    description = change.get("updateDescription")
+    if change.get("operationType") != "update" or not description:
+        return True
+    fields = list(description.get("updatedFields", {})) + list(description.get("removedFields", []))
+    return any(field.split(".")[0] in USER_PROJECTION for field in fields)
@@ -0,0 +1,179 @@
+"""Métricas de calidad de clustering con la disimilaridad de K-Prototypes.
+
+Justificación técnica:
+- silhouette_score de scikit-learn sobre X_numeric ignoraba la parte categórica
+  que K-Prototypes sí optimiza y materializaba la matriz n×n de distancias.
+- La disimilaridad es la del modelo: euclidiana² numérica + gamma * discrepancias
+  categóricas. Es una distancia euclidiana² sobre [numéricas, sqrt(gamma/2)·one-hot],
+  así que la silhouette sólo necesita, por fila, la suma de disimilaridades a
+  cada cluster, que sale exacta de agregados por cluster (ClusterDistanceSums):
+  O(n·k·F) en lugar de O(n²·F) y nunca se forma la matriz n×n.
+- Se procesa en bloques de CLUSTER_METRICS_BLOCK_ROWS filas (memoria acotada por
+  filas × (k + F)); los bloques son independientes y NumPy libera el GIL en los
+  matmuls, así que con n_jobs > 1 se reparten en un ThreadPoolExecutor.
+- Davies-Bouldin con la misma disimilaridad: dispersión = costo medio de los
+  miembros a su centroide (el objetivo del modelo), separación = costo entre
+  centroides. Es O(n·k), sin bloques n×n.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def centroid_costs(
+    centroids_numeric: np.ndarray,
+    centroids_categorical: np.ndarray,
+    other_numeric: np.ndarray,
+    other_categorical: np.ndarray,
+    gamma: float
+) -> np.ndarray:
+    """Costo K-Prototypes entre cada par de filas, forma (len(centroids), len(other))."""
+    numeric = np.sum((centroids_numeric[:, None, :] - other_numeric[None, :, :]) ** 2, axis=2)
+    categorical = np.sum(centroids_categorical[:, None, :] != other_categorical[None, :, :], axis=2)
+    return numeric + gamma * categorical
+
+
+def _one_hot(X_categorical: np.ndarray) -> np.ndarray:
+    """One-hot de los códigos por columna; códigos negativos (no vistos) quedan en cero."""
+    X_categorical = np.asarray(X_categorical, dtype=np.int64)
+    blocks = []
+    for column in X_categorical.T:
+        block = np.zeros((len(column), max(int(column.max(initial=0)) + 1, 1)))
+        known = np.flatnonzero(column >= 0)
+        block[known, column[known]] = 1.0
+        blocks.append(block)
+    return np.hstack(blocks) if blocks else np.zeros((len(X_categorical), 0))
+
+
+class ClusterDistanceSums:
+    """Suma de disimilaridades de cada fila a todos los miembros de cada cluster.
+
+    d(a, b) = |a|² + |b|² - 2·a·b + gamma * (n_cat - oh_a·oh_b), así que la suma
+    sobre los miembros de c sólo necesita agregados de c (tamaño, suma de normas,
+    suma de filas y suma de one-hots): un bloque (filas × k) cuesta
+    O(filas·k·F) en lugar de O(filas·n·F), sin formar distancias par a par.
+    """
+
+    def __init__(
+        self,
+        X_numeric: np.ndarray,
+        X_categorical: np.ndarray,
+        labels: np.ndarray,
+        n_clusters: int,
+        gamma: float
+    ):
+        self.X_numeric = np.ascontiguousarray(X_numeric, dtype=np.float64)
+        self.squared_norms = np.einsum('ij,ij->i', self.X_numeric, self.X_numeric)
+        self.one_hot = _one_hot(X_categorical)
+        self.n_categorical = np.asarray(X_categorical).shape[1]
+        self.gamma = float(gamma)
+
+        membership = np.zeros((len(labels), n_clusters))
+        membership[np.arange(len(labels)), labels] = 1.0
+        self.sizes = membership.sum(axis=0)
+        self.cluster_norms = self.squared_norms @ membership
+        self.cluster_numeric = membership.T @ self.X_numeric
+        self.cluster_one_hot = membership.T @ self.one_hot
+
+    def block(self, start: int, stop: int) -> np.ndarray:
+        """Sumas de las filas [start, stop) contra cada cluster, forma (stop-start, k)."""
+        sums = (self.squared_norms[start:stop, None] + self.gamma * self.n_categorical) * self.sizes
+        sums += self.cluster_norms
+        sums -= 2 * (self.X_numeric[start:stop] @ self.cluster_numeric.T)
+        sums -= self.gamma * (self.one_hot[start:stop] @ self.cluster_one_hot.T)
+        return np.maximum(sums, 0, out=sums)
+
+    def self_distance(self, start: int, stop: int) -> np.ndarray:
+        """d(a, a): 0 salvo por códigos no vistos, que la codificación cuenta como discrepancia."""
+        known = np.einsum('ij,ij->i', self.one_hot[start:stop], self.one_hot[start:stop])
+        return self.gamma * (self.n_categorical - known)
+
+
+def mixed_silhouette(
+    X_numeric: np.ndarray,
+    X_categorical: np.ndarray,
+    labels: np.ndarray,
+    gamma: float,
+    n_jobs: Optional[int] = None,
+    block_rows: Optional[int] = None
+) -> float:
+    """Silhouette medio con la disimilaridad de K-Prototypes (0.0 con un solo cluster).
+
+    Misma convención que scikit-learn: s = 0 para miembros de clusters unitarios.
+    """
+    _, labels = np.unique(np.asarray(labels), return_inverse=True)
+    n_clusters = labels.max(initial=-1) + 1
+    if n_clusters < 2:
+        return 0.0
+
+    n = len(labels)
+    distance_sums = ClusterDistanceSums(X_numeric, X_categorical, labels, n_clusters, gamma)
+    sizes = distance_sums.sizes
+    rows = block_rows or settings.CLUSTER_METRICS_BLOCK_ROWS
+
+    def block_sum(start: int) -> float:
+        stop = min(start + rows, n)
+        sums = distance_sums.block(start, stop)
+        own = labels[start:stop]
+        index = np.arange(stop - start)
+
+        own_sums = np.maximum(sums[index, own] - distance_sums.self_distance(start, stop), 0)
+        a = own_sums / np.maximum(sizes[own] - 1, 1)
+        means = sums / sizes
+        means[index, own] = np.inf
+        b = means.min(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = np.nan_to_num((b - a) / np.maximum(a, b))
+        return float(np.where(sizes[own] > 1, scores, 0.0).sum())
+
+    starts = range(0, n, rows)
+    n_jobs = n_jobs or settings.CLUSTER_METRICS_N_JOBS
+    if n_jobs > 1:
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            total = sum(pool.map(block_sum, starts))
+    else:
+        total = sum(map(block_sum, starts))
+    return total / n
+
+
+def mixed_davies_bouldin(
+    X_numeric: np.ndarray,
+    X_categorical: np.ndarray,
+    labels: np.ndarray,
+    centroids_numeric: np.ndarray,
+    centroids_categorical: np.ndarray,
+    gamma: float
+) -> float:
+    """Davies-Bouldin (menor es mejor) con costo K-Prototypes a los centroides del modelo.
+
+    Clusters vacíos no participan; centroides idénticos aportan 0 (convención de scikit-learn).
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    centroids_numeric = np.asarray(centroids_numeric, dtype=np.float64)
+    centroids_categorical = np.asarray(centroids_categorical, dtype=np.int64)
+    n_clusters = len(centroids_numeric)
+
+    point_costs = (
+        np.sum((np.asarray(X_numeric, dtype=np.float64) - centroids_numeric[labels]) ** 2, axis=1)
+        + gamma * np.sum(np.asarray(X_categorical, dtype=np.int64) != centroids_categorical[labels], axis=1)
+    )
+    sizes = np.bincount(labels, minlength=n_clusters)
+    present = np.flatnonzero(sizes)
+    if len(present) < 2:
+        return 0.0
+
+    scatter = np.bincount(labels, weights=point_costs, minlength=n_clusters)[present] / sizes[present]
+    separation = centroid_costs(
+        centroids_numeric[present], centroids_categorical[present],
+        centroids_numeric[present], centroids_categorical[present], gamma
+    )
+    separation[separation == 0] = np.inf
+    ratios = (scatter[:, None] + scatter[None, :]) / separation
+    np.fill_diagonal(ratios, -np.inf)
+    return float(ratios.max(axis=1).mean())
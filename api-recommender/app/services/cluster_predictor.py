@@ -0,0 +1,357 @@
+"""Predictor de clusters sólo para inferencia (NumPy puro, sin sklearn ni kmodes).
+
+Justificación técnica:
+- KPrototypes.predict recorre los puntos uno por uno en Python y exige cargar
+  kmodes (y con él scikit-learn) en el proceso que sirve requests.
+- Asignar un cluster es sólo una distancia contra k centroides:
+  euclidiana² numérica + gamma * discrepancias categóricas, con argmin. Se
+  calcula vectorizada por bloques de filas, con las mismas operaciones que
+  kmodes para obtener exactamente las mismas etiquetas (incluidos empates).
+- Guarda como arrays los parámetros del scaler, los centroides numéricos, las
+  modas categóricas, gamma, los vocabularios categóricos y los centros de la
+  discretización de ubicación, así también codifica features crudas sin pandas.
+- Modelos particionados (ver partitioned_training): cada centroide lleva su
+  partición y su gamma, y cada fila sólo compite contra los centroides de su
+  partición, igual que en el entrenamiento.
+"""
+import logging
+import numpy as np
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple, Union
+from app.core.artifacts import ArtifactStore, is_artifact, load_artifact, save_artifact
+from app.services.compact_features import compact_categorical, compact_enabled, compact_numeric
+from app.services.location_regions import nearest_center
+from app.services.model_registry import model_registry
+from app.services.user_features import DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+
+if TYPE_CHECKING:
+    from kmodes.kprototypes import KPrototypes
+    from app.services.feature_pipeline import FeaturePipeline
+
+logger = logging.getLogger(__name__)
+
+# Filas por bloque en predict: acota la memoria del tensor (filas, k, features)
+PREDICT_CHUNK = 4096
+
+
+def assign_clusters(
+    X_numeric: np.ndarray,
+    X_categorical: np.ndarray,
+    centroids_numeric: np.ndarray,
+    centroids_categorical: np.ndarray,
+    gamma: Union[float, np.ndarray],
+    row_partitions: Optional[np.ndarray] = None,
+    centroid_partitions: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """argmin del costo K-Prototypes contra cada centroide, por bloques de filas.
+
+    gamma es escalar o uno por centroide. Con particiones, una fila sólo
+    compite contra los centroides de su partición (-1 = contra todos).
+    Features float32 (COMPACT_FEATURES) se comparan en float32, sin copiarlas a float64.
+    """
+    X_numeric = np.asarray(X_numeric)
+    if X_numeric.dtype != np.float32:
+        X_numeric = X_numeric.astype(np.float64, copy=False)
+    X_categorical = np.asarray(X_categorical)
+    if not np.issubdtype(X_categorical.dtype, np.integer):
+        X_categorical = X_categorical.astype(np.int64)
+    centroids_numeric = np.asarray(centroids_numeric, dtype=X_numeric.dtype)
+    labels = np.empty(len(X_numeric), dtype=np.int64)
+
+    for start in range(0, len(X_numeric), PREDICT_CHUNK):
+        stop = start + PREDICT_CHUNK
+        numeric_cost = np.sum(
+            (X_numeric[start:stop, None, :] - centroids_numeric[None, :, :]) ** 2, axis=2
+        )
+        categorical_cost = np.sum(
+            X_categorical[start:stop, None, :] != centroids_categorical[None, :, :], axis=2
+        )
+        cost = numeric_cost + gamma * categorical_cost
+        if row_partitions is not None:
+            rows = row_partitions[start:stop, None]
+            cost[(rows >= 0) & (rows != centroid_partitions[None, :])] = np.inf
+        labels[start:stop] = np.argmin(cost, axis=1)
+
+    return labels
+
+
+class ClusterPredictor:
+    """Asignación de clusters K-Prototypes con arrays NumPy."""
+
+    def __init__(
+        self,
+        scaler_mean: np.ndarray,
+        scaler_scale: np.ndarray,
+        centroids_numeric: np.ndarray,
+        centroids_categorical: np.ndarray,
+        gamma: float,
+        feature_names_numeric: List[str],
+        feature_names_categorical: List[str],
+        vocabularies: List[np.ndarray],
+        location_centers: Optional[np.ndarray] = None,
+        partition_key: Optional[str] = None,
+        partition_of_code: Optional[np.ndarray] = None,
+        centroid_partitions: Optional[np.ndarray] = None,
+        centroid_gammas: Optional[np.ndarray] = None
+    ):
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        self.centroids_numeric = np.ascontiguousarray(centroids_numeric, dtype=np.float64)
+        self.centroids_categorical = np.ascontiguousarray(centroids_categorical, dtype=np.int64)
+        self.gamma = float(gamma)
+        self.feature_names_numeric = list(feature_names_numeric)
+        self.feature_names_categorical = list(feature_names_categorical)
+        self.vocabularies = [np.asarray(vocab) for vocab in vocabularies]
+        self.location_centers = (
+            np.asarray(location_centers, dtype=np.float64) if location_centers is not None else None
+        )
+        self._code_maps = [
+            {value: code for code, value in enumerate(vocab.tolist())} for vocab in self.vocabularies
+        ]
+        # Particionado: columna categórica, partición de cada código y de cada centroide
+        self.partition_key = partition_key
+        self.partition_of_code = (
+            np.asarray(partition_of_code, dtype=np.int64) if partition_of_code is not None else None
+        )
+        self.centroid_partitions = (
+            np.asarray(centroid_partitions, dtype=np.int64) if centroid_partitions is not None else None
+        )
+        self.centroid_gammas = (
+            np.asarray(centroid_gammas, dtype=np.float64) if centroid_gammas is not None else None
+        )
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.centroids_numeric)
+
+    @classmethod
+    def from_training(cls, pipeline: "FeaturePipeline", model: "KPrototypes") -> "ClusterPredictor":
+        """Exporta el predictor desde el pipeline ajustado y el modelo entrenado."""
+        if not pipeline.fitted:
+            raise ValueError("Pipeline not fitted. Call fit_transform first.")
+
+        n_numeric = len(pipeline.feature_names_numeric)
+        centroids = model.cluster_centroids_
+        return cls.from_centroids(
+            pipeline,
+            centroids[:, :n_numeric].astype(np.float64),
+            centroids[:, n_numeric:].astype(np.float64).astype(np.int64),
+            model.gamma
+        )
+
+    @classmethod
+    def from_centroids(
+        cls,
+        pipeline: "FeaturePipeline",
+        centroids_numeric: np.ndarray,
+        centroids_categorical: np.ndarray,
+        gamma: float,
+        **partitioning: Any
+    ) -> "ClusterPredictor":
+        """Predictor con centroides ya calculados (p. ej. los de un modelo particionado)."""
+        if not pipeline.fitted:
+            raise ValueError("Pipeline not fitted. Call fit_transform first.")
+
+        location_centers = (
+            pipeline.location_regions.centers if pipeline.location_regions is not None else None
+        )
+        return cls(
+            scaler_mean=pipeline.scaler.mean_,
+            scaler_scale=pipeline.scaler.scale_,
+            centroids_numeric=centroids_numeric,
+            centroids_categorical=centroids_categorical,
+            gamma=gamma,
+            feature_names_numeric=pipeline.feature_names_numeric,
+            feature_names_categorical=pipeline.feature_names_categorical,
+            vocabularies=[
+                np.asarray(pipeline.category_vocabularies[col])
+                for col in pipeline.feature_names_categorical
+            ],
+            location_centers=location_centers,
+            **partitioning
+        )
+
+    def with_centroids(self, centroids_numeric: np.ndarray, centroids_categorical: np.ndarray) -> "ClusterPredictor":
+        """Mismo predictor (scaler, vocabularios, gamma, particiones) con otros centroides."""
+        return ClusterPredictor(
+            scaler_mean=self.scaler_mean,
+            scaler_scale=self.scaler_scale,
+            centroids_numeric=centroids_numeric,
+            centroids_categorical=centroids_categorical,
+            gamma=self.gamma,
+            feature_names_numeric=self.feature_names_numeric,
+            feature_names_categorical=self.feature_names_categorical,
+            vocabularies=self.vocabularies,
+            location_centers=self.location_centers,
+            partition_key=self.partition_key,
+            partition_of_code=self.partition_of_code,
+            centroid_partitions=self.centroid_partitions,
+            centroid_gammas=self.centroid_gammas
+        )
+
+    @property
+    def partitioned(self) -> bool:
+        return self.partition_key is not None
+
+    def row_partitions(self, X_categorical: np.ndarray) -> np.ndarray:
+        """Partición de cada fila según su código en la columna de partición (-1 = desconocida)."""
+        column = self.feature_names_categorical.index(self.partition_key)
+        codes = np.asarray(X_categorical, dtype=np.int64)[:, column]
+        known = (codes >= 0) & (codes < len(self.partition_of_code))
+        return np.where(known, self.partition_of_code[np.where(known, codes, 0)], -1)
+
+    def _region(self, users_features: List[Dict[str, Any]]) -> np.ndarray:
+        """Región de cada usuario: centro de ubicación más cercano (0 sin discretización)."""
+        if self.location_centers is None:
+            return np.zeros(len(users_features), dtype=np.int64)
+
+        locations = np.array([
+            [
+                f.get('latitude') if f.get('latitude') is not None else DEFAULT_LATITUDE,
+                f.get('longitude') if f.get('longitude') is not None else DEFAULT_LONGITUDE
+            ]
+            for f in users_features
+        ], dtype=np.float64)
+        return nearest_center(locations, self.location_centers)
+
+    def encode(self, users_features: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Equivalente a FeaturePipeline.transform: (numéricas escaladas, códigos categóricos).
+
+        Con COMPACT_FEATURES retorna float32 / int8-int16, como el pipeline.
+        """
+        X_numeric = np.array([
+            [f.get(col) if f.get(col) is not None else 0 for col in self.feature_names_numeric]
+            for f in users_features
+        ], dtype=np.float64).reshape(len(users_features), len(self.feature_names_numeric))
+        X_numeric = np.nan_to_num(X_numeric, nan=0.0)
+        X_numeric_scaled = (X_numeric - self.scaler_mean) / self.scaler_scale
+
+        regions = self._region(users_features)
+        columns = []
+        for col, code_map in zip(self.feature_names_categorical, self._code_maps):
+            if col == 'cluster_region':
+                values = regions.tolist()
+            else:
+                values = [f.get(col) if f.get(col) is not None else 'unknown' for f in users_features]
+            columns.append([code_map.get(value, -1) for value in values])
+
+        X_categorical = np.array(columns, dtype=np.int64).T.reshape(
+            len(users_features), len(self.feature_names_categorical)
+        )
+        if compact_enabled():
+            n_codes = max((len(vocab) for vocab in self.vocabularies), default=0)
+            return compact_numeric(X_numeric_scaled), compact_categorical(X_categorical, n_codes)
+        return X_numeric_scaled, X_categorical
+
+    def predict(self, X_numeric: np.ndarray, X_categorical: np.ndarray) -> np.ndarray:
+        """Cluster de cada fila; mismas etiquetas que KPrototypes.predict."""
+        if not self.partitioned:
+            return assign_clusters(
+                X_numeric, X_categorical, self.centroids_numeric, self.centroids_categorical, self.gamma
+            )
+        return assign_clusters(
+            X_numeric, X_categorical, self.centroids_numeric, self.centroids_categorical,
+            self.centroid_gammas, self.row_partitions(X_categorical), self.centroid_partitions
+        )
+
+    def predict_features(self, users_features: List[Dict[str, Any]]) -> np.ndarray:
+        """Codifica features crudas (extract_user_features) y predice su cluster."""
+        if not users_features:
+            return np.empty(0, dtype=np.int64)
+        return self.predict(*self.encode(users_features))
+
+    def project_centroids(self, pipeline: "FeaturePipeline") -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Centroides de este predictor en el espacio de features de otro pipeline ajustado.
+
+        Las numéricas se desescalan con el scaler propio y se escalan con el del
+        pipeline; las categóricas pasan por su valor (código -> valor -> código)
+        y las regiones por el centro de ubicación más cercano. Valores que el
+        pipeline no conoce quedan en -1. None si las features no coinciden.
+        """
+        if (self.feature_names_numeric != list(pipeline.feature_names_numeric)
+                or self.feature_names_categorical != list(pipeline.feature_names_categorical)):
+            return None
+
+        raw = self.centroids_numeric * self.scaler_scale + self.scaler_mean
+        numeric = (raw - pipeline.scaler.mean_) / pipeline.scaler.scale_
+
+        new_centers = (
+            pipeline.location_regions.centers if pipeline.location_regions is not None else None
+        )
+        categorical = np.full_like(self.centroids_categorical, -1)
+        for col, name in enumerate(self.feature_names_categorical):
+            vocabulary = self.vocabularies[col].tolist()
+            new_codes = {value: code for code, value in enumerate(pipeline.category_vocabularies[name])}
+            for row, code in enumerate(self.centroids_categorical[:, col].tolist()):
+                if not 0 <= code < len(vocabulary):
+                    continue
+                value = vocabulary[code]
+                if name == 'cluster_region' and self.location_centers is not None and new_centers is not None:
+                    value = int(nearest_center(self.location_centers[value], new_centers)[0])
+                categorical[row, col] = new_codes.get(value, -1)
+
+        return numeric, categorical
+
+    def save(self, path: Path):
+        """Guarda el predictor como artefacto (manifest JSON + .npy)."""
+        arrays = {
+            'scaler_mean': self.scaler_mean,
+            'scaler_scale': self.scaler_scale,
+            'centroids_numeric': self.centroids_numeric,
+            'centroids_categorical': self.centroids_categorical,
+        }
+        for i, vocab in enumerate(self.vocabularies):
+            arrays[f'vocabulary_{i}'] = vocab
+        if self.location_centers is not None:
+            arrays['location_centers'] = self.location_centers
+        if self.partitioned:
+            arrays['partition_of_code'] = self.partition_of_code
+            arrays['centroid_partitions'] = self.centroid_partitions
+            arrays['centroid_gammas'] = self.centroid_gammas
+
+        save_artifact(path, arrays, metadata={
+            'kind': 'cluster_predictor',
+            'gamma': self.gamma,
+            'feature_names_numeric': self.feature_names_numeric,
+            'feature_names_categorical': self.feature_names_categorical,
+            'partition_key': self.partition_key,
+        })
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "ClusterPredictor":
+        """Carga un predictor guardado con save() (o el .joblib del formato anterior)."""
+        path = Path(path)
+        if not is_artifact(path):
+            import joblib
+
+            return cls(**joblib.load(path))
+
+        arrays, metadata = load_artifact(path, mmap=mmap)
+        return cls(
+            scaler_mean=arrays['scaler_mean'],
+            scaler_scale=arrays['scaler_scale'],
+            centroids_numeric=arrays['centroids_numeric'],
+            centroids_categorical=arrays['centroids_categorical'],
+            gamma=metadata['gamma'],
+            feature_names_numeric=metadata['feature_names_numeric'],
+            feature_names_categorical=metadata['feature_names_categorical'],
+            vocabularies=[
+                arrays[f'vocabulary_{i}'] for i in range(len(metadata['feature_names_categorical']))
+            ],
+            location_centers=arrays.get('location_centers'),
+            partition_key=metadata.get('partition_key'),
+            partition_of_code=arrays.get('partition_of_code'),
+            centroid_partitions=arrays.get('centroid_partitions'),
+            centroid_gammas=arrays.get('centroid_gammas')
+        )
+
+
+def cluster_predictor_path() -> Path:
+    """Directorio del predictor en la versión activa del registro."""
+    return model_registry.artifact_path("cluster_predictor")
+
+
+# Instancia global del predictor
+cluster_predictor_store: ArtifactStore[ClusterPredictor] = ArtifactStore(
+    "Cluster predictor", cluster_predictor_path, ClusterPredictor.load
+)
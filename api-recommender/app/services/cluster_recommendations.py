@@ -0,0 +1,284 @@
+"""Listas top-N de huertos precalculadas por cluster.
+
+Justificación técnica:
+- Los usuarios de un mismo cluster comparten casi los mismos candidatos; el ranking
+  base se calcula una vez por cluster después de cada entrenamiento.
+- Cada cluster se guarda como un documento en `cluster_recommendations`, así el hot
+  path lee un solo documento, excluye los huertos del usuario y re-rankea sólo N
+  elementos con señales personales: O(N) en lugar de O(tamaño del cluster).
+- El ranking base combina afinidad con el perfil del cluster (medias/desviaciones
+  guardadas en training_history), fitness del AG, racha de cuidado y frescura.
+"""
+import heapq
+import logging
+import math
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+# Feature del perfil de cluster comparada con cada atributo del huerto
+PROFILE_FEATURES = {
+    'area': 'avg_orchard_area',
+    'maintenanceMinutes': 'avg_maintenance_minutes',
+    'count_plants': 'avg_count_plants',
+    'streak': 'avg_streak',
+}
+
+# Pesos del score base
+AFFINITY_WEIGHT = 0.5
+FITNESS_WEIGHT = 0.2
+ENGAGEMENT_WEIGHT = 0.15
+FRESHNESS_WEIGHT = 0.15
+
+FRESHNESS_HALF_LIFE_DAYS = 30.0
+ENGAGEMENT_SCALE_DAYS = 30.0
+
+# Señales personales del re-ranking
+OBJECTIVE_BOOST = 0.25
+NEIGHBOR_BOOST = 0.2
+MAINTENANCE_BUDGET_MINUTES = {1: 60, 2: 120, 3: 240, 4: 360}
+
+
+def orchard_summary(orchard: Dict[str, Any]) -> Dict[str, Any]:
+    """Extrae los atributos de un huerto usados para rankear y responder."""
+    width = orchard.get('width', 1)
+    height = orchard.get('height', 1)
+
+    area = None
+    if 'layout' in orchard and 'dimensions' in orchard['layout']:
+        area = orchard['layout']['dimensions'].get('totalArea')
+    elif 'dimensions' in orchard:
+        area = orchard['dimensions'].get('totalArea')
+    if not area:
+        area = width * height
+
+    estimations = orchard.get('estimations', {})
+    weekly_water = estimations.get('weeklyWaterLiters', width * height * 60)
+    maintenance = estimations.get(
+        'maintenanceMinutesPerWeek',
+        orchard.get('maintenanceMinutes', orchard.get('countPlants', 5) * 15)
+    )
+
+    objective = orchard.get('objective')
+    if objective is None and 'metadata' in orchard:
+        objective = orchard['metadata'].get('inputParameters', {}).get('objective')
+
+    return {
+        'orchardId': str(orchard['_id']),
+        'userId': orchard.get('userId'),
+        'name': orchard.get('name', "Huerto sin nombre"),
+        'shortDescription': (orchard.get('description') or "")[:100],
+        'estimatedWeeklyWater': float(weekly_water),
+        'maintenanceMinutes': int(maintenance),
+        'fitness': float(orchard.get('metrics', {}).get('fitness', 0.0)),
+        'objective': objective,
+        'area': float(area),
+        'count_plants': float(orchard.get('countPlants', 0)),
+        'streak': float(orchard.get('streakOfDays', 0)),
+        'createdAt': orchard.get('createdAt'),
+    }
+
+
+def cluster_affinity(summary: Dict[str, Any], profile: Optional[Dict[str, Any]], cluster_id: int) -> float:
+    """Similitud (0-1) entre el huerto y las medias del cluster.
+
+    Usa un kernel gaussiano sobre la distancia normalizada por la desviación
+    del cluster. Sin perfil retorna 0.5 (neutral).
+    """
+    if not profile:
+        return 0.5
+
+    names = profile['feature_names_numeric']
+    means = profile['feature_means'][cluster_id]
+    stds = profile['feature_stds'][cluster_id]
+
+    similarities = []
+    for attribute, feature in PROFILE_FEATURES.items():
+        if feature not in names:
+            continue
+        idx = names.index(feature)
+        spread = stds[idx] if stds[idx] > 0 else 1.0
+        z = (summary[attribute] - means[idx]) / spread
+        similarities.append(math.exp(-0.5 * z * z))
+
+    return sum(similarities) / len(similarities) if similarities else 0.5
+
+
+def _age_days(created_at: Any, now: datetime) -> Optional[float]:
+    if isinstance(created_at, str):
+        try:
+            created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(created_at, datetime):
+        return None
+    if created_at.tzinfo is not None:
+        created_at = created_at.replace(tzinfo=None)
+    return max(0.0, (now - created_at).total_seconds() / 86400)
+
+
+def base_score(summary: Dict[str, Any], affinity: float, now: datetime) -> float:
+    """Score a nivel cluster (independiente del usuario que consulta)."""
+    fitness = min(1.0, max(0.0, summary['fitness']))
+    engagement = 1.0 - math.exp(-summary['streak'] / ENGAGEMENT_SCALE_DAYS)
+
+    age = _age_days(summary['createdAt'], now)
+    freshness = 0.5 if age is None else 0.5 ** (age / FRESHNESS_HALF_LIFE_DAYS)
+
+    return (
+        AFFINITY_WEIGHT * affinity
+        + FITNESS_WEIGHT * fitness
+        + ENGAGEMENT_WEIGHT * engagement
+        + FRESHNESS_WEIGHT * freshness
+    )
+
+
+def score_orchard(
+    orchard: Dict[str, Any],
+    profile: Optional[Dict[str, Any]],
+    cluster_id: int,
+    now: datetime
+) -> Dict[str, Any]:
+    """Calcula la entrada compacta (con score base) de un huerto para un cluster."""
+    summary = orchard_summary(orchard)
+    affinity = cluster_affinity(summary, profile, cluster_id)
+    return _compact_entry(summary, base_score(summary, affinity, now))
+
+
+def top_entries(entries: Iterable[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+    """Conserva las top_n entradas con mayor score base."""
+    return heapq.nlargest(top_n, entries, key=lambda e: e['baseScore'])
+
+
+def rank_candidates(
+    orchards: Iterable[Dict[str, Any]],
+    profile: Optional[Dict[str, Any]],
+    cluster_id: int,
+    top_n: int,
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Rankea huertos candidatos y conserva los top_n (memoria O(top_n))."""
+    now = now or datetime.now()
+    entries = []
+    for orchard in orchards:
+        entries.append(score_orchard(orchard, profile, cluster_id, now))
+        if len(entries) > 4 * top_n:
+            entries = top_entries(entries, top_n)
+
+    return top_entries(entries, top_n)
+
+
+def _compact_entry(summary: Dict[str, Any], score: float) -> Dict[str, Any]:
+    return {
+        'orchardId': summary['orchardId'],
+        'userId': summary['userId'],
+        'name': summary['name'],
+        'shortDescription': summary['shortDescription'],
+        'estimatedWeeklyWater': summary['estimatedWeeklyWater'],
+        'maintenanceMinutes': summary['maintenanceMinutes'],
+        'fitness': summary['fitness'],
+        'objective': summary['objective'],
+        'baseScore': float(score),
+    }
+
+
+def merge_neighbor_entries(
+    cluster_entries: List[Dict[str, Any]],
+    neighbor_entries: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Une candidatos de vecinos cercanos (con boost) y la lista del cluster."""
+    merged = {}
+    for entry in neighbor_entries:
+        merged[entry['orchardId']] = {**entry, 'baseScore': entry['baseScore'] * (1 + NEIGHBOR_BOOST)}
+    for entry in cluster_entries:
+        merged.setdefault(entry['orchardId'], entry)
+    return list(merged.values())
+
+
+def personal_score(entry: Dict[str, Any], objectives: set, experience_level: int) -> float:
+    """Ajusta el score base con señales del usuario (objetivo y experiencia)."""
+    score = entry['baseScore']
+
+    if objectives and entry.get('objective') in objectives:
+        score *= 1 + OBJECTIVE_BOOST
+
+    budget = MAINTENANCE_BUDGET_MINUTES.get(experience_level, MAINTENANCE_BUDGET_MINUTES[2])
+    over_budget = max(0, entry['maintenanceMinutes'] - budget)
+    return score / (1 + over_budget / budget)
+
+
+def rank_for_user(
+    entries: List[Dict[str, Any]],
+    user: Dict[str, Any],
+    user_orchards: List[Dict[str, Any]],
+    limit: int
+) -> List[Dict[str, Any]]:
+    """Filtra huertos propios y re-rankea la lista del cluster para un usuario."""
+    user_id = str(user['_id'])
+    own_ids = {str(o['_id']) for o in user_orchards}
+    objectives = {orchard_summary(o)['objective'] for o in user_orchards} - {None}
+    experience_level = user.get('experience_level', 2)
+
+    recommendations = []
+    for entry in entries:
+        if entry.get('userId') == user_id or entry['orchardId'] in own_ids:
+            continue
+        # Tipos y orden de schemas.OrchardRecommendation (se serializa sin validar)
+        recommendations.append({
+            "orchardId": str(entry['orchardId']),
+            "name": str(entry['name']),
+            "shortDescription": str(entry['shortDescription']),
+            "estimatedWeeklyWater": float(entry['estimatedWeeklyWater']),
+            "maintenanceMinutes": int(entry['maintenanceMinutes']),
+            "fitness": float(entry['fitness']),
+            "score": float(personal_score(entry, objectives, experience_level))
+        })
+
+    recommendations.sort(key=lambda x: x['score'], reverse=True)
+    return recommendations[:limit]
+
+
+async def build_cluster_top_lists(
+    db: AsyncIOMotorDatabase,
+    n_clusters: int,
+    cluster_profiles: Optional[Dict[str, Any]],
+    top_n: int,
+    trained_at: Optional[str] = None
+) -> Dict[int, int]:
+    """Etapa post-entrenamiento: calcula y guarda el top-N de cada cluster.
+
+    Returns:
+        Dict cluster_id -> número de huertos guardados
+    """
+    logger.info(f"Building top-{top_n} recommendation lists for {n_clusters} clusters")
+    now = datetime.now()
+    stored = {}
+
+    for cluster_id in range(n_clusters):
+        users_cursor = db.users.find({"cluster_id": cluster_id}, projection={"_id": 1})
+        user_ids = [str(u['_id']) async for u in users_cursor]
+
+        orchards_cursor = db.orchards.find({"userId": {"$in": user_ids}, "state": True})
+        orchards = [o async for o in orchards_cursor]
+
+        entries = rank_candidates(orchards, cluster_profiles, cluster_id, top_n, now=now)
+
+        await db.cluster_recommendations.replace_one(
+            {"_id": cluster_id},
+            {
+                "_id": cluster_id,
+                "trained_at": trained_at,
+                "generated_at": now,
+                "orchards": entries
+            },
+            upsert=True
+        )
+        stored[cluster_id] = len(entries)
+
+    # Clusters de un modelo anterior con más k ya no existen
+    await db.cluster_recommendations.delete_many({"_id": {"$gte": n_clusters}})
+
+    logger.info(f"Cluster recommendation lists stored: {stored}")
+    return stored
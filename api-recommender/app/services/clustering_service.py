@@ -6,6 +6,16 @@ Justificación técnica:
 - Fallback a MiniBatchKMeans: Para datasets muy grandes (>50k usuarios), permite entrenamiento
   incremental y menor uso de memoria.
 - Elbow + Silhouette: Métodos complementarios para encontrar k óptimo automáticamente.
+  Silhouette y Davies-Bouldin usan la disimilaridad de K-Prototypes (ver cluster_metrics).
+- Warm start: la población cambia poco entre reentrenamientos. Con un modelo
+  previo se ajusta sólo su k (n_init=1, sembrado con sus centroides) y, si la
+  silhouette cae más de WARM_START_SILHOUETTE_TOLERANCE, k±1 sembrados con
+  centroides vecinos; el barrido completo queda como último recurso.
+- Ids estables: los clusters nuevos se emparejan con los anteriores por costo
+  entre centroides (asignación húngara), así cluster_id no se baraja entre
+  versiones y las caches por cluster siguen siendo válidas.
+- La matriz combinada que pide kmodes se arma una vez por entrenamiento y se
+  comparte entre el barrido de k, el warm start y el ajuste final.
 """
 import numpy as np
 import joblib
@@ -14,30 +24,98 @@ from pathlib import Path
 from typing import Tuple, Dict, Any, List, Optional
 from datetime import datetime
 from kmodes.kprototypes import KPrototypes
+from scipy.optimize import linear_sum_assignment
 from sklearn.cluster import MiniBatchKMeans
-from sklearn.metrics import silhouette_score
+from app.core.artifacts import is_artifact, legacy_path, load_artifact, save_artifact
 from app.core.config import settings
+from app.core.timing import SpanRecorder, capture_profile
+from app.services.cluster_metrics import centroid_costs, mixed_davies_bouldin, mixed_silhouette
+from app.services.cluster_predictor import PREDICT_CHUNK, assign_clusters
+from app.services.compact_features import combine
+from app.services.model_registry import model_registry
 
 logger = logging.getLogger(__name__)
 
 
+class WarmStart:
+    """Centroides del modelo anterior, ya en el espacio de features del entrenamiento actual.
+
+    Códigos categóricos que el pipeline actual no conoce vienen como -1.
+    """
+
+    def __init__(
+        self,
+        centroids_numeric: np.ndarray,
+        centroids_categorical: np.ndarray,
+        silhouette: Optional[float] = None,
+        version: Optional[str] = None
+    ):
+        self.centroids_numeric = np.asarray(centroids_numeric, dtype=np.float64)
+        self.centroids_categorical = np.asarray(centroids_categorical, dtype=np.int64)
+        self.silhouette = silhouette
+        self.version = version
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.centroids_numeric)
+
+
+def match_cluster_ids(
+    centroids_numeric: np.ndarray,
+    centroids_categorical: np.ndarray,
+    previous_numeric: np.ndarray,
+    previous_categorical: np.ndarray,
+    gamma: float
+) -> np.ndarray:
+    """Id estable de cada cluster nuevo: ids[i] es el id que toma el cluster i.
+
+    Los clusters emparejados con un centroide anterior conservan su id; los que
+    sobran (k creció, o su pareja tenía un id >= k porque k bajó) toman los ids
+    libres en orden, así los ids siguen siendo 0..k-1.
+    """
+    k = len(centroids_numeric)
+    costs = centroid_costs(
+        np.asarray(centroids_numeric, dtype=np.float64),
+        np.asarray(centroids_categorical, dtype=np.int64),
+        np.asarray(previous_numeric, dtype=np.float64),
+        np.asarray(previous_categorical, dtype=np.int64),
+        gamma
+    )
+    rows, cols = linear_sum_assignment(costs)
+
+    ids = np.full(k, -1, dtype=np.int64)
+    for row, col in zip(rows, cols):
+        if col < k:
+            ids[row] = col
+    free = iter(sorted(set(range(k)) - set(ids.tolist())))
+    for row in np.flatnonzero(ids < 0):
+        ids[row] = next(free)
+    return ids
+
+
 class ClusteringService:
     """Servicio de clustering para usuarios basado en features."""
 
-    def __init__(self):
+    def __init__(self, artifact_dir: Optional[Path] = None):
         self.model: Optional[KPrototypes] = None
         self.n_clusters: int = 0
+        self.gamma: Optional[float] = None
         self.cluster_metadata: Dict[str, Any] = {}
         self.model_path = Path(settings.MODEL_STORAGE_PATH)
         self.model_path.mkdir(parents=True, exist_ok=True)
+        # Directorio de la versión en preparación (registro); None = fuera del registro
+        self.artifact_dir = artifact_dir
         self.trained_at: Optional[datetime] = None
         self.metrics: Dict[str, float] = {}
+        self.timings: Dict[str, Any] = {}
+        self.spans = SpanRecorder()
 
     def find_optimal_k(
         self,
         X_numeric: np.ndarray,
         X_categorical: np.ndarray,
-        method: str = 'silhouette'
+        method: str = 'silhouette',
+        X_combined: Optional[np.ndarray] = None
     ) -> int:
         """Encuentra el número óptimo de clusters.
 
@@ -45,6 +123,7 @@ class ClusteringService:
             X_numeric: Features numéricas escaladas
             X_categorical: Features categóricas codificadas
             method: 'silhouette' o 'elbow'
+            X_combined: combine(X_numeric, X_categorical) ya calculado
 
         Returns:
             Número óptimo de clusters
@@ -58,6 +137,9 @@ class ClusteringService:
 
         best_k = min_k
         best_score = -1
+        if X_combined is None:
+            X_combined = combine(X_numeric, X_categorical)
+        categorical_indices = list(range(X_numeric.shape[1], X_combined.shape[1]))
 
         if method == 'silhouette':
             logger.info(f"Finding optimal k using silhouette method (range: {min_k}-{max_k})")
@@ -66,14 +148,16 @@ class ClusteringService:
                 try:
                     # K-Prototypes temporal
                     kproto = KPrototypes(n_clusters=k, init='Huang', n_init=5, verbose=0, random_state=42)
-                    X_combined = np.concatenate([X_numeric, X_categorical], axis=1)
-                    categorical_indices = list(range(X_numeric.shape[1], X_combined.shape[1]))
 
-                    labels = kproto.fit_predict(X_combined, categorical=categorical_indices)
+                    with self.spans.span("k_fit", k=k) as span:
+                        labels = kproto.fit_predict(X_combined, categorical=categorical_indices)
+                        span['cost'] = float(kproto.cost_)
 
-                    # Calcular silhouette solo sobre features numéricas (más estable)
+                    # Silhouette con la disimilaridad de K-Prototypes (numéricas + categóricas)
                     if len(np.unique(labels)) > 1:
-                        score = silhouette_score(X_numeric, labels)
+                        with self.spans.span("k_silhouette", k=k) as span:
+                            score = mixed_silhouette(X_numeric, X_categorical, labels, kproto.gamma)
+                            span['score'] = float(score)
                         logger.debug(f"k={k}, silhouette={score:.4f}")
 
                         if score > best_score:
@@ -93,10 +177,10 @@ class ClusteringService:
             for k in range(min_k, max_k + 1):
                 try:
                     kproto = KPrototypes(n_clusters=k, init='Huang', n_init=5, verbose=0, random_state=42)
-                    X_combined = np.concatenate([X_numeric, X_categorical], axis=1)
-                    categorical_indices = list(range(X_numeric.shape[1], X_combined.shape[1]))
 
-                    kproto.fit(X_combined, categorical=categorical_indices)
+                    with self.spans.span("k_fit", k=k) as span:
+                        kproto.fit(X_combined, categorical=categorical_indices)
+                        span['cost'] = float(kproto.cost_)
                     inertias.append(kproto.cost_)
                 except Exception as e:
                     logger.warning(f"Failed to cluster with k={k}: {e}")
@@ -114,7 +198,8 @@ class ClusteringService:
         self,
         X_numeric: np.ndarray,
         X_categorical: np.ndarray,
-        user_ids: List[str]
+        user_ids: List[str],
+        warm_start: Optional[WarmStart] = None
     ) -> Dict[str, Any]:
         """Entrena modelo de clustering.
 
@@ -122,51 +207,229 @@ class ClusteringService:
             X_numeric: Features numéricas (N, F_numeric)
             X_categorical: Features categóricas (N, F_categorical)
             user_ids: Lista de IDs de usuarios correspondientes
+            warm_start: Centroides del modelo anterior; siembra el ajuste y
+                conserva sus ids de cluster
 
         Returns:
             Metadata del entrenamiento
         """
         logger.info(f"Training clustering model on {len(user_ids)} users")
+        self.spans = SpanRecorder()
+
+        # Perfil opcional del entrenamiento completo, dentro de la versión que se construye
+        profile_base = (
+            Path(self.artifact_dir) / "training_profile" if self.artifact_dir is not None
+            else self.model_path / f"kprototypes_{settings.MODEL_VERSION}"
+        )
+        with capture_profile(settings.TRAINING_PROFILER, profile_base) as profile_file:
+            result = self._train(X_numeric, X_categorical, user_ids, warm_start)
+
+        if profile_file:
+            self.timings['profile_file'] = str(profile_file)
+            result['timings'] = self.timings
+        return result
+
+    def _warm_start_search(
+        self,
+        X_numeric: np.ndarray,
+        X_categorical: np.ndarray,
+        warm_start: WarmStart,
+        X_combined: np.ndarray
+    ) -> Optional[Tuple[KPrototypes, np.ndarray, float]]:
+        """Ajusta el k anterior sembrado con sus centroides y, si no alcanza, k-1 y k+1.
 
-        # Encontrar k óptimo
-        optimal_k = self.find_optimal_k(X_numeric, X_categorical, method=settings.OPTIMAL_CLUSTER_METHOD)
-        self.n_clusters = optimal_k
-
-        # Combinar features
-        X_combined = np.concatenate([X_numeric, X_categorical], axis=1)
+        Returns:
+            (modelo, labels, silhouette) del mejor candidato, o None si ninguno
+            queda dentro de la tolerancia respecto a la silhouette anterior.
+        """
+        previous_k = warm_start.n_clusters
+        max_k = min(settings.MAX_CLUSTERS, len(X_numeric))
+        threshold = (
+            warm_start.silhouette - settings.WARM_START_SILHOUETTE_TOLERANCE
+            if warm_start.silhouette is not None else -np.inf
+        )
         categorical_indices = list(range(X_numeric.shape[1], X_combined.shape[1]))
 
-        # Entrenar K-Prototypes
-        try:
-            logger.info(f"Training K-Prototypes with k={optimal_k}")
-            self.model = KPrototypes(
-                n_clusters=optimal_k,
-                init='Huang',
-                n_init=10,
-                verbose=1,
-                random_state=42
-            )
+        best = None
+        for k in (previous_k, previous_k - 1, previous_k + 1):
+            if not settings.MIN_CLUSTERS <= k <= max_k:
+                continue
+            try:
+                init = self.warm_start_seeds(X_numeric, X_categorical, warm_start, k)
+                kproto = KPrototypes(n_clusters=k, init=list(init), n_init=1, verbose=0, random_state=42)
+                with self.spans.span("k_fit", k=k, warm_start=True) as span:
+                    labels = kproto.fit_predict(X_combined, categorical=categorical_indices)
+                    span['cost'] = float(kproto.cost_)
+
+                with self.spans.span("k_silhouette", k=k) as span:
+                    score = mixed_silhouette(X_numeric, X_categorical, labels, kproto.gamma)
+                    span['score'] = float(score)
+            except Exception as e:
+                logger.warning(f"Warm-start fit failed for k={k}: {e}")
+                continue
+
+            logger.debug(f"warm start k={k}, silhouette={score:.4f}")
+            if best is None or score > best[2]:
+                best = (kproto, labels, float(score))
+            if k == previous_k and score >= threshold:
+                logger.info(f"Previous k={k} still near-optimal (silhouette={score:.4f}); skipping k sweep")
+                break
+
+        if best is None or best[2] < threshold:
+            logger.info(f"Warm start below tolerance (threshold={threshold:.4f}); running full k sweep")
+            return None
+        return best
+
+    @staticmethod
+    def warm_start_seeds(
+        X_numeric: np.ndarray,
+        X_categorical: np.ndarray,
+        warm_start: WarmStart,
+        k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Centroides iniciales para k a partir de los anteriores (k previo o k±1).
+
+        k-1 fusiona el par de centroides más cercano; k+1 agrega como centroide
+        el punto peor representado. Los códigos categóricos se traducen al
+        codificado interno de kmodes (posición entre los valores únicos de cada
+        columna); los desconocidos toman la moda de la columna.
+        """
+        numeric = warm_start.centroids_numeric.copy()
+        categorical = warm_start.centroids_categorical.copy()
+        # Mismo gamma por defecto que K-Prototypes
+        gamma = 0.5 * float(np.mean(X_numeric.std(axis=0)))
+
+        if k == len(numeric) - 1:
+            costs = centroid_costs(numeric, categorical, numeric, categorical, gamma)
+            np.fill_diagonal(costs, np.inf)
+            keep, drop = sorted(np.unravel_index(np.argmin(costs), costs.shape))
+            numeric[keep] = (numeric[keep] + numeric[drop]) / 2
+            numeric = np.delete(numeric, drop, axis=0)
+            categorical = np.delete(categorical, drop, axis=0)
+        elif k == len(numeric) + 1:
+            point_costs = np.concatenate([
+                centroid_costs(
+                    X_numeric[start:start + PREDICT_CHUNK],
+                    X_categorical[start:start + PREDICT_CHUNK],
+                    numeric, categorical, gamma
+                ).min(axis=1)
+                for start in range(0, len(X_numeric), PREDICT_CHUNK)
+            ])
+            farthest = int(np.argmax(point_costs))
+            numeric = np.vstack([numeric, X_numeric[farthest]])
+            categorical = np.vstack([categorical, X_categorical[farthest]])
+        elif k != len(numeric):
+            raise ValueError(f"Warm start seeds only k={len(numeric)}±1, got k={k}")
+
+        encoded = np.empty_like(categorical)
+        for col in range(categorical.shape[1]):
+            values, counts = np.unique(X_categorical[:, col], return_counts=True)
+            positions = np.searchsorted(values, categorical[:, col]).clip(max=len(values) - 1)
+            known = values[positions] == categorical[:, col]
+            encoded[:, col] = np.where(known, positions, np.argmax(counts))
+
+        return numeric, encoded
+
+    def _align_cluster_ids(self, labels: np.ndarray, warm_start: WarmStart) -> np.ndarray:
+        """Renumera los clusters del modelo para conservar los ids del modelo anterior."""
+        n_numeric = warm_start.centroids_numeric.shape[1]
+        centroids = self.model.cluster_centroids_
+        ids = match_cluster_ids(
+            centroids[:, :n_numeric].astype(float),
+            centroids[:, n_numeric:].astype(float).astype(int),
+            warm_start.centroids_numeric,
+            warm_start.centroids_categorical,
+            self.gamma
+        )
+
+        # El centroide en la posición nueva j es el del cluster i con ids[i] == j
+        order = np.argsort(ids)
+        numeric, categorical = self.model._enc_cluster_centroids
+        self.model._enc_cluster_centroids = [numeric[order], categorical[order]]
+        self.model.labels_ = ids[self.model.labels_].astype(self.model.labels_.dtype)
+        return ids[labels]
+
+    def _train(
+        self,
+        X_numeric: np.ndarray,
+        X_categorical: np.ndarray,
+        user_ids: List[str],
+        warm_start: Optional[WarmStart] = None
+    ) -> Dict[str, Any]:
+        """Cuerpo de train(); cada fase queda registrada como span."""
+        # Una sola matriz combinada para todos los ajustes de este entrenamiento
+        X_combined = combine(X_numeric, X_categorical)
+        categorical_indices = list(range(X_numeric.shape[1], X_combined.shape[1]))
 
-            labels = self.model.fit_predict(X_combined, categorical=categorical_indices)
+        warm = None
+        if warm_start is not None:
+            with self.spans.span("k_search", phase="k_search", warm_start=True):
+                warm = self._warm_start_search(X_numeric, X_categorical, warm_start, X_combined)
 
-            # Calcular métricas
-            if len(np.unique(labels)) > 1:
-                silhouette = silhouette_score(X_numeric, labels)
+        try:
+            if warm is not None:
+                # El ajuste sembrado ya es el modelo final (n_init=1)
+                self.model, labels, silhouette = warm
+                optimal_k = len(self.model.cluster_centroids_)
+                self.gamma = float(self.model.gamma)
             else:
-                silhouette = 0.0
-
+                # Encontrar k óptimo
+                with self.spans.span("k_search", phase="k_search"):
+                    optimal_k = self.find_optimal_k(
+                        X_numeric, X_categorical, method=settings.OPTIMAL_CLUSTER_METHOD,
+                        X_combined=X_combined
+                    )
+
+                # Entrenar K-Prototypes
+                logger.info(f"Training K-Prototypes with k={optimal_k}")
+                self.model = KPrototypes(
+                    n_clusters=optimal_k,
+                    init='Huang',
+                    n_init=10,
+                    verbose=1,
+                    random_state=42
+                )
+
+                with self.spans.span("fit", phase="fit", k=optimal_k):
+                    labels = self.model.fit_predict(X_combined, categorical=categorical_indices)
+                self.gamma = float(self.model.gamma)
+
+                # Calcular métricas
+                with self.spans.span("silhouette", phase="silhouette", k=optimal_k):
+                    silhouette = mixed_silhouette(X_numeric, X_categorical, labels, self.gamma)
+
+            self.n_clusters = optimal_k
+            if warm_start is not None:
+                labels = self._align_cluster_ids(labels, warm_start)
+
+            # Métricas con la disimilaridad del modelo (silhouette_metric distingue
+            # modelos anteriores, cuya silhouette era euclidiana sobre numéricas)
+            n_numeric = X_numeric.shape[1]
+            centroids = self.model.cluster_centroids_
+            davies_bouldin = mixed_davies_bouldin(
+                X_numeric, X_categorical, labels,
+                centroids[:, :n_numeric].astype(float),
+                centroids[:, n_numeric:].astype(float).astype(int),
+                self.gamma
+            )
             self.metrics = {
                 'silhouette_score': float(silhouette),
+                'silhouette_metric': 'kprototypes',
+                'davies_bouldin': davies_bouldin,
                 'n_clusters': optimal_k,
                 'n_samples': len(user_ids),
-                'cost': float(self.model.cost_)
+                'cost': float(self.model.cost_),
+                'warm_start': warm is not None
             }
 
-            # Metadata de clusters
+            # Metadata de clusters (cluster_centroids_ concatena numéricas + categóricas)
+            feature_means, feature_stds = self.compute_cluster_profiles(X_numeric, labels, optimal_k)
             self.cluster_metadata = {
                 'cluster_sizes': {},
-                'centroids_numeric': self.model.cluster_centroids_[0].tolist(),
-                'centroids_categorical': self.model.cluster_centroids_[1].tolist(),
+                'centroids_numeric': centroids[:, :n_numeric].astype(float).tolist(),
+                'centroids_categorical': centroids[:, n_numeric:].astype(float).astype(int).tolist(),
+                'feature_means': feature_means.tolist(),
+                'feature_stds': feature_stds.tolist(),
             }
 
             for cluster_id in range(optimal_k):
@@ -175,70 +438,171 @@ class ClusteringService:
 
             self.trained_at = datetime.now()
 
+            # Tiempos por fase; se guardan con el modelo y en training_history
+            self._record_timings(exclude=("save", "assignments"))
+
             # Guardar modelo
-            self.save_model()
+            with self.spans.span("save", phase="save"):
+                self.save_model()
 
             # Retornar asignaciones
-            cluster_assignments = {
-                user_id: int(label) for user_id, label in zip(user_ids, labels)
-            }
-
-            logger.info(f"Training completed. Silhouette: {silhouette:.4f}, Clusters: {optimal_k}")
+            with self.spans.span("assignments", phase="assignments"):
+                cluster_assignments = {
+                    user_id: int(label) for user_id, label in zip(user_ids, labels)
+                }
+
+            self._record_timings()
+            logger.info(
+                f"Training completed. Silhouette: {silhouette:.4f}, Clusters: {optimal_k}, "
+                f"phase seconds: {self.timings['phases']}"
+            )
 
             return {
                 'cluster_assignments': cluster_assignments,
                 'metrics': self.metrics,
                 'cluster_metadata': self.cluster_metadata,
-                'trained_at': self.trained_at.isoformat()
+                'trained_at': self.trained_at.isoformat(),
+                'timings': self.timings
             }
 
         except Exception as e:
             logger.error(f"Training failed: {e}")
             raise
 
+    def _record_timings(self, exclude: tuple = ()):
+        """Vuelca los spans a self.timings y los totales por fase a self.metrics."""
+        totals = self.spans.totals()
+        phases = {
+            name: seconds for name, seconds in totals.items()
+            if name in ("k_search", "fit", "silhouette", "save", "assignments") and name not in exclude
+        }
+        self.timings = {
+            'phases': phases,
+            'k_candidates': [
+                span for span in self.spans.spans if span['name'] in ("k_fit", "k_silhouette")
+            ],
+        }
+        for name, seconds in phases.items():
+            self.metrics[f'{name}_seconds'] = seconds
+
+    @staticmethod
+    def compute_cluster_profiles(
+        X_numeric: np.ndarray,
+        labels: np.ndarray,
+        n_clusters: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Calcula media y desviación estándar por feature numérica de cada cluster.
+
+        Returns:
+            Tuple (means, stds) con forma (n_clusters, F_numeric). Clusters vacíos quedan en 0.
+        """
+        means = np.zeros((n_clusters, X_numeric.shape[1]))
+        stds = np.zeros((n_clusters, X_numeric.shape[1]))
+
+        for cluster_id in range(n_clusters):
+            members = X_numeric[labels == cluster_id]
+            if len(members):
+                # Acumulado en float64 también con features compactas (float32)
+                means[cluster_id] = members.mean(axis=0, dtype=np.float64)
+                stds[cluster_id] = members.std(axis=0, dtype=np.float64)
+
+        return means, stds
+
     def predict(self, X_numeric: np.ndarray, X_categorical: np.ndarray) -> np.ndarray:
-        """Predice clusters para nuevos usuarios."""
-        if self.model is None:
+        """Predice clusters para nuevos usuarios.
+
+        Siempre con assign_clusters (argmin NumPy del costo K-Prototypes, el
+        mismo del predictor que sirve), con o sin objeto KPrototypes cargado.
+        """
+        if self.model is not None:
+            # cluster_centroids_ concatena numéricas + categóricas
+            n_numeric = X_numeric.shape[1]
+            centroids = self.model.cluster_centroids_
+            centroids_numeric = centroids[:, :n_numeric].astype(np.float64)
+            centroids_categorical = centroids[:, n_numeric:].astype(float).astype(np.int64)
+        elif self.cluster_metadata.get('centroids_numeric'):
+            centroids_numeric = np.asarray(self.cluster_metadata['centroids_numeric'], dtype=np.float64)
+            centroids_categorical = np.asarray(self.cluster_metadata['centroids_categorical'], dtype=np.int64)
+        else:
             raise ValueError("Model not trained. Call train() first or load_model()")
 
-        X_combined = np.concatenate([X_numeric, X_categorical], axis=1)
-        categorical_indices = list(range(X_numeric.shape[1], X_combined.shape[1]))
+        if self.gamma is None:
+            raise ValueError("Model not trained. Call train() first or load_model()")
+        return assign_clusters(X_numeric, X_categorical, centroids_numeric, centroids_categorical, self.gamma)
 
-        return self.model.predict(X_combined, categorical=categorical_indices)
+    def artifact_path(self) -> Path:
+        """Dónde se guarda el modelo: la versión en preparación o la ruta fuera del registro."""
+        if self.artifact_dir is not None:
+            return Path(self.artifact_dir) / "kprototypes"
+        return model_registry.legacy_artifact_path("kprototypes")
 
     def save_model(self):
-        """Guarda el modelo entrenado."""
+        """Guarda el modelo entrenado como artefacto (manifest JSON + .npy)."""
         if self.model is None:
             raise ValueError("No model to save")
 
-        model_file = self.model_path / f"kprototypes_{settings.MODEL_VERSION}.joblib"
-        metadata_file = self.model_path / f"metadata_{settings.MODEL_VERSION}.joblib"
-
-        joblib.dump(self.model, model_file)
-        joblib.dump({
+        metadata = {
+            key: value for key, value in self.cluster_metadata.items()
+            if key not in ('centroids_numeric', 'centroids_categorical')
+        }
+        save_artifact(self.artifact_path(), {
+            'centroids_numeric': np.asarray(self.cluster_metadata['centroids_numeric'], dtype=np.float64),
+            'centroids_categorical': np.asarray(self.cluster_metadata['centroids_categorical'], dtype=np.int64),
+        }, metadata={
+            'kind': 'kprototypes',
             'n_clusters': self.n_clusters,
-            'cluster_metadata': self.cluster_metadata,
+            'gamma': self.gamma,
+            'cluster_metadata': metadata,
             'trained_at': self.trained_at,
-            'metrics': self.metrics
-        }, metadata_file)
+            'metrics': self.metrics,
+            'timings': self.timings
+        })
 
-        logger.info(f"Model saved to {model_file}")
+        logger.info(f"Model saved to {self.artifact_path()}")
 
     def load_model(self):
-        """Carga el modelo entrenado."""
-        model_file = self.model_path / f"kprototypes_{settings.MODEL_VERSION}.joblib"
+        """Carga el modelo activo del registro (o, para migración, los archivos anteriores)."""
+        path = (
+            Path(self.artifact_dir) / "kprototypes" if self.artifact_dir is not None
+            else model_registry.artifact_path("kprototypes")
+        )
+        if is_artifact(path):
+            arrays, metadata = load_artifact(path)
+            self.model = None
+            self.n_clusters = metadata['n_clusters']
+            self.gamma = metadata['gamma']
+            self.cluster_metadata = {
+                **metadata['cluster_metadata'],
+                'centroids_numeric': arrays['centroids_numeric'].tolist(),
+                'centroids_categorical': arrays['centroids_categorical'].tolist(),
+            }
+            # JSON guarda las llaves como str
+            self.cluster_metadata['cluster_sizes'] = {
+                int(cluster_id): size
+                for cluster_id, size in self.cluster_metadata.get('cluster_sizes', {}).items()
+            }
+            self.trained_at = datetime.fromisoformat(metadata['trained_at']) if metadata['trained_at'] else None
+            self.metrics = metadata['metrics']
+            self.timings = metadata.get('timings', {})
+            logger.info(f"Model loaded from {path}")
+            return
+
+        model_file = legacy_path(path)
         metadata_file = self.model_path / f"metadata_{settings.MODEL_VERSION}.joblib"
 
         if not model_file.exists():
-            raise FileNotFoundError(f"Model file not found: {model_file}")
+            raise FileNotFoundError(f"Model file not found: {path}")
 
+        logger.warning(f"Loading legacy joblib model {model_file}; retrain to migrate to the artifact format")
         self.model = joblib.load(model_file)
         metadata = joblib.load(metadata_file)
 
         self.n_clusters = metadata['n_clusters']
+        self.gamma = float(self.model.gamma)
         self.cluster_metadata = metadata['cluster_metadata']
         self.trained_at = metadata['trained_at']
         self.metrics = metadata['metrics']
+        self.timings = metadata.get('timings', {})
 
         logger.info(f"Model loaded from {model_file}")
 
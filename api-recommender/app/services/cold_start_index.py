@@ -0,0 +1,248 @@
+"""Índice de recomendaciones cold-start para usuarios sin cluster asignado.
+
+Justificación técnica:
+- Un usuario recién registrado no tiene cluster_id; antes se usaba el cluster 0
+  completo, lento y casi siempre equivocado.
+- Al registrarse sólo se conocen experience_level y, a lo sumo, una ubicación.
+  Después de cada entrenamiento se calcula, por bucket (región, experiencia), la
+  proporción de usuarios de cada cluster y se mezclan las listas top-N de esos
+  clusters ponderando el score base por esa proporción.
+- Buckets de respaldo: (región, *), (*, experiencia) y (*, *), para combinaciones
+  sin usuarios entrenados.
+- Todo el índice es un documento en `cold_start_recommendations` (reemplazo
+  atómico). Cada worker lo mantiene en memoria y lo revalida tras
+  TRAINING_CACHE_TTL_SECONDS consultando sólo `trained_at`; responder es un
+  lookup en un dict más el re-ranking personal de COLD_START_TOP_N entradas.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.services.cluster_recommendations import top_entries
+from app.services.location_regions import nearest_center
+from app.services.user_features import DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "cold_start_recommendations"
+INDEX_ID = "active"
+
+# Comodín de bucket (región o experiencia desconocida)
+ANY = "*"
+
+
+def bucket_key(region: Optional[int], experience_level: Optional[int]) -> str:
+    """Clave `región:experiencia` de un bucket."""
+    return f"{ANY if region is None else region}:{ANY if experience_level is None else experience_level}"
+
+
+def _experience(value: Any) -> Optional[int]:
+    try:
+        return int(round(float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def bucket_cluster_shares(
+    regions: Optional[Sequence[int]],
+    experience_levels: Sequence[Any],
+    labels: Sequence[int],
+    n_clusters: int
+) -> Dict[str, np.ndarray]:
+    """Proporción de usuarios de cada cluster por bucket (incluye buckets de respaldo)."""
+    labels = np.asarray(labels, dtype=np.int64)
+    levels = [_experience(level) for level in experience_levels]
+    regions = [None] * len(labels) if regions is None else [int(r) for r in regions]
+
+    members: Dict[str, List[int]] = {}
+    for row, (region, level) in enumerate(zip(regions, levels)):
+        keys = {bucket_key(region, level), bucket_key(region, None), bucket_key(None, level), bucket_key(None, None)}
+        for key in keys:
+            members.setdefault(key, []).append(row)
+
+    shares = {}
+    for key, rows in members.items():
+        counts = np.bincount(labels[rows], minlength=n_clusters).astype(np.float64)
+        shares[key] = counts / counts.sum()
+    return shares
+
+
+def blend_cluster_entries(
+    shares: np.ndarray,
+    cluster_entries: Dict[int, List[Dict[str, Any]]],
+    top_n: int
+) -> List[Dict[str, Any]]:
+    """Top-N de las listas de cluster con el score base ponderado por la proporción del cluster."""
+    entries = [
+        {**entry, 'baseScore': float(entry['baseScore'] * shares[cluster_id])}
+        for cluster_id, cluster_list in cluster_entries.items()
+        if cluster_id < len(shares) and shares[cluster_id] > 0
+        for entry in cluster_list
+    ]
+    return top_entries(entries, top_n)
+
+
+async def build_cold_start_index(
+    db: AsyncIOMotorDatabase,
+    regions: Optional[Sequence[int]],
+    experience_levels: Sequence[Any],
+    labels: Sequence[int],
+    n_clusters: int,
+    location_centers: Optional[np.ndarray],
+    top_n: int,
+    trained_at: Optional[str] = None
+) -> Dict[str, Any]:
+    """Etapa post-entrenamiento (después de las listas top-N): calcula y guarda el índice."""
+    cluster_entries = {
+        doc["_id"]: doc.get("orchards", [])
+        async for doc in db.cluster_recommendations.find({"_id": {"$lt": n_clusters}})
+    }
+
+    shares = bucket_cluster_shares(regions, experience_levels, labels, n_clusters)
+    buckets = {key: blend_cluster_entries(share, cluster_entries, top_n) for key, share in shares.items()}
+
+    doc = {
+        "_id": INDEX_ID,
+        "trained_at": trained_at,
+        "generated_at": datetime.now(),
+        "location_centers": None if location_centers is None else np.asarray(location_centers).tolist(),
+        "buckets": buckets
+    }
+    await db[COLLECTION].replace_one({"_id": INDEX_ID}, doc, upsert=True)
+    cold_start_index.set(doc)
+
+    logger.info(f"Cold-start index stored: {len(buckets)} buckets")
+    return doc
+
+
+class ColdStartIndex:
+    """Mantiene el índice cold-start en memoria del proceso."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._buckets: Dict[str, List[Dict[str, Any]]] = {}
+        self._centers: Optional[np.ndarray] = None
+        self._version: Any = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded and (time.monotonic() - self._checked_at) < self.ttl_seconds
+
+    async def refresh(self, db: AsyncIOMotorDatabase):
+        """Revalida contra la BD si expiró el TTL; relee el índice sólo si cambió."""
+        if self._is_fresh():
+            record_cache("cold_start_index", hit=True)
+            return
+
+        record_cache("cold_start_index", hit=False)
+        async with self._lock:
+            if self._is_fresh():
+                return
+
+            head = await db[COLLECTION].find_one({"_id": INDEX_ID}, projection={"trained_at": 1})
+            version = head["trained_at"] if head else None
+            if head is None:
+                self._apply(None)
+            elif not self._loaded or version != self._version:
+                self._apply(await db[COLLECTION].find_one({"_id": INDEX_ID}))
+                logger.debug(f"Cold-start index reloaded (trained_at={version})")
+
+            self._loaded = True
+            self._checked_at = time.monotonic()
+
+    def _apply(self, doc: Optional[Dict[str, Any]]):
+        self._buckets = doc.get("buckets", {}) if doc else {}
+        centers = doc.get("location_centers") if doc else None
+        self._centers = np.asarray(centers, dtype=np.float64) if centers else None
+        self._version = doc.get("trained_at") if doc else None
+
+    def set(self, doc: Dict[str, Any]):
+        """Actualiza el índice con uno recién construido en este worker."""
+        self._apply(doc)
+        self._loaded = True
+        self._checked_at = time.monotonic()
+
+    def region_of(self, latitude: Optional[float], longitude: Optional[float]) -> Optional[int]:
+        """Región del índice para una ubicación (la default si falta, como en las features)."""
+        if self._centers is None:
+            return None
+        location = [
+            DEFAULT_LATITUDE if latitude is None else latitude,
+            DEFAULT_LONGITUDE if longitude is None else longitude
+        ]
+        return int(nearest_center(location, self._centers)[0])
+
+    def regions_of(self, locations: Sequence[Tuple[Optional[float], Optional[float]]]) -> List[Optional[int]]:
+        """region_of para varias ubicaciones con un solo cálculo de distancias."""
+        if self._centers is None or not locations:
+            return [None] * len(locations)
+        points = np.array([
+            [DEFAULT_LATITUDE if latitude is None else latitude,
+             DEFAULT_LONGITUDE if longitude is None else longitude]
+            for latitude, longitude in locations
+        ], dtype=np.float64)
+        return nearest_center(points, self._centers).tolist()
+
+    def _bucket(self, region: Optional[int], experience_level: Any) -> Optional[List[Dict[str, Any]]]:
+        level = _experience(experience_level)
+        for key in (
+            bucket_key(region, level), bucket_key(region, None),
+            bucket_key(None, level), bucket_key(None, None)
+        ):
+            if key in self._buckets:
+                return self._buckets[key]
+        return None
+
+    def lookup(
+        self,
+        experience_level: Any,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Entradas del bucket más específico disponible (None sin índice)."""
+        if not self._buckets:
+            return None
+        return self._bucket(self.region_of(latitude, longitude), experience_level)
+
+    def lookup_many(
+        self,
+        experience_levels: Sequence[Any],
+        locations: Sequence[Tuple[Optional[float], Optional[float]]]
+    ) -> Optional[List[Optional[List[Dict[str, Any]]]]]:
+        """lookup() para varios usuarios (None sin índice)."""
+        if not self._buckets:
+            return None
+        regions = self.regions_of(locations)
+        return [self._bucket(region, level) for region, level in zip(regions, experience_levels)]
+
+    async def get_entries(
+        self,
+        db: AsyncIOMotorDatabase,
+        experience_level: Any,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        await self.refresh(db)
+        return self.lookup(experience_level, latitude, longitude)
+
+    async def get_entries_many(
+        self,
+        db: AsyncIOMotorDatabase,
+        experience_levels: Sequence[Any],
+        locations: Sequence[Tuple[Optional[float], Optional[float]]]
+    ) -> Optional[List[Optional[List[Dict[str, Any]]]]]:
+        await self.refresh(db)
+        return self.lookup_many(experience_levels, locations)
+
+
+# Instancia global del índice
+cold_start_index = ColdStartIndex(settings.TRAINING_CACHE_TTL_SECONDS)
@@ -0,0 +1,57 @@
+"""Representación compacta de las matrices de features (COMPACT_FEATURES).
+
+Justificación técnica:
+- StandardScaler devuelve float64 y los códigos categóricos viajaban como
+  int64 o, peor, dentro de un X_combined float64 junto a las numéricas.
+- En modo compacto las numéricas escaladas son float32 y los códigos el
+  entero con signo más chico que cubre el vocabulario (int8 hasta 127
+  valores, si no int16), en dos arrays separados. El escalado se sigue
+  calculando en float64 y sólo el resultado se guarda en float32, así el
+  pipeline de entrenamiento y ClusterPredictor.encode producen los mismos valores.
+- Los arrays son contiguos por columna (orden Fortran, como la salida de
+  StandardScaler sobre un DataFrame): con 2-3 columnas categóricas y 16
+  numéricas, los broadcasts de assign_clusters recorren filas en el loop
+  interno. En orden C el loop interno es de 2 elementos y la comparación de
+  códigos resulta ~8x más lenta.
+- assign_clusters (predictor, change streams, cold start) conserva el dtype de
+  entrada: el tensor (filas, k, features) de distancias ocupa la mitad.
+- kmodes necesita una sola matriz combinada y castea internamente la parte
+  numérica a float64, así que para K-Prototypes se arma X_combined una vez por
+  entrenamiento (combine) en lugar de una vez por cada k evaluado.
+- Silhouette y Davies-Bouldin siguen en float64: sus agregados por cluster
+  restan sumas grandes y en float32 perderían precisión.
+"""
+import numpy as np
+
+from app.core.config import settings
+
+
+def compact_enabled() -> bool:
+    return settings.COMPACT_FEATURES
+
+
+def categorical_dtype(n_codes: int) -> np.dtype:
+    """Entero con signo más chico para códigos 0..n_codes-1 y -1 (valor no visto)."""
+    if n_codes <= np.iinfo(np.int8).max:
+        return np.dtype(np.int8)
+    if n_codes <= np.iinfo(np.int16).max:
+        return np.dtype(np.int16)
+    return np.dtype(np.int32)
+
+
+def compact_numeric(X_numeric: np.ndarray) -> np.ndarray:
+    return np.asfortranarray(X_numeric, dtype=np.float32)
+
+
+def compact_categorical(X_categorical: np.ndarray, n_codes: int) -> np.ndarray:
+    return np.asfortranarray(X_categorical, dtype=categorical_dtype(n_codes))
+
+
+def combine(X_numeric: np.ndarray, X_categorical: np.ndarray) -> np.ndarray:
+    """Matriz [numéricas, categóricas] que espera kmodes, en el dtype de las numéricas."""
+    X_numeric = np.asarray(X_numeric)
+    dtype = X_numeric.dtype if np.issubdtype(X_numeric.dtype, np.floating) else np.float64
+    combined = np.empty((len(X_numeric), X_numeric.shape[1] + X_categorical.shape[1]), dtype=dtype)
+    combined[:, :X_numeric.shape[1]] = X_numeric
+    combined[:, X_numeric.shape[1]:] = X_categorical
+    return combined
@@ -0,0 +1,168 @@
+"""Exportación NDJSON en streaming de asignaciones de cluster y recomendaciones.
+
+Justificación técnica:
+- Gateway, analytics y notifications necesitan el mapeo usuario→cluster y el
+  top-N de cada usuario después de cada entrenamiento; con GETs por usuario un
+  export de 100k+ usuarios tarda demasiado y cargarlo entero dispara memoria.
+- Los usuarios se leen con un cursor de Mongo ordenado por `_id` y se procesan
+  en batches de EXPORT_BATCH_SIZE: memoria constante respecto al total.
+- Las recomendaciones usan la lista top-N del cluster (una lectura por cluster
+  por export, misma foto para todo el stream) o el índice cold-start en
+  memoria, más una consulta $in de huertos por batch para el re-ranking
+  personal; no se consultan vecinos por usuario.
+- Después de cada batch se emite una línea `{"cursor": "<token>"}`; el export
+  completo termina con `{"cursor": null}`. El token (opaco) guarda el último
+  `_id` y el `trained_at` del entrenamiento: reanudar tras un reentrenamiento
+  falla con StaleCursorError en lugar de mezclar asignaciones de dos modelos.
+"""
+import base64
+import binascii
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.services.cluster_recommendations import rank_for_user
+from app.services.cold_start_index import cold_start_index
+from app.services.training_cache import training_history_cache
+
+logger = logging.getLogger(__name__)
+
+# Campos de huertos que usa rank_for_user (exclusión y objetivo del usuario)
+ORCHARD_PROJECTION = {"userId": 1, "objective": 1, "metadata.inputParameters.objective": 1}
+
+
+class StaleCursorError(ValueError):
+    """El cursor pertenece a un entrenamiento anterior."""
+
+
+def encode_cursor(trained_at: str, last_id: Any) -> str:
+    payload = orjson.dumps({"v": trained_at, "after": last_id})
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(token: str) -> Tuple[str, Any]:
+    """(trained_at, último _id) de un token; ValueError si está malformado."""
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return payload["v"], payload["after"]
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError, UnicodeEncodeError) as e:
+        raise ValueError("Invalid export cursor") from e
+
+
+async def resolve_export(db: AsyncIOMotorDatabase, cursor: Optional[str]) -> Tuple[str, Any]:
+    """Valida el export antes de empezar a transmitir: (trained_at, _id desde el que seguir).
+
+    Raises:
+        LookupError: sin entrenamiento
+        ValueError: cursor malformado
+        StaleCursorError: el cursor es de otro entrenamiento
+    """
+    last_training = await training_history_cache.get_latest(db)
+    if not last_training:
+        raise LookupError("Model not trained")
+    trained_at = str(last_training["trained_at"])
+
+    if cursor is None:
+        return trained_at, None
+
+    cursor_version, after = decode_cursor(cursor)
+    if cursor_version != trained_at:
+        raise StaleCursorError("Export cursor belongs to a previous training; restart the export")
+    return trained_at, after
+
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return orjson.dumps(record) + b"\n"
+
+
+async def _user_batches(
+    db: AsyncIOMotorDatabase,
+    query: Dict[str, Any],
+    projection: Dict[str, Any],
+    after: Any,
+    limit: Optional[int]
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Usuarios en orden de `_id` (desde `after`) agrupados en batches."""
+    if after is not None:
+        query = {**query, "_id": {"$gt": after}}
+    batch_size = settings.EXPORT_BATCH_SIZE
+    cursor = db.users.find(query, projection=projection).sort("_id", 1).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    batch = []
+    async for user in cursor:
+        batch.append(user)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def stream_assignments(
+    db: AsyncIOMotorDatabase,
+    trained_at: str,
+    after: Any = None,
+    cluster_id: Optional[int] = None,
+    limit: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """Líneas `{"userId", "clusterId"}` de los usuarios con cluster asignado."""
+    query = {"cluster_id": cluster_id} if cluster_id is not None else {"cluster_id": {"$ne": None}}
+    exported = 0
+    async for batch in _user_batches(db, query, {"cluster_id": 1}, after, limit):
+        yield b"".join(_line({"userId": user["_id"], "clusterId": user["cluster_id"]}) for user in batch)
+        yield _line({"cursor": encode_cursor(trained_at, batch[-1]["_id"])})
+        exported += len(batch)
+
+    if not limit or exported < limit:
+        yield _line({"cursor": None})
+
+
+async def stream_recommendations(
+    db: AsyncIOMotorDatabase,
+    trained_at: str,
+    after: Any = None,
+    cluster_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    top_n: int = 10
+) -> AsyncIterator[bytes]:
+    """Líneas `{"userId", "clusterId", "recommendations"}` con el top-N de cada usuario."""
+    query = {"cluster_id": cluster_id} if cluster_id is not None else {}
+    projection = {"cluster_id": 1, "experience_level": 1}
+    cluster_entries: Dict[int, List[Dict[str, Any]]] = {}
+    await cold_start_index.refresh(db)
+    exported = 0
+
+    async for batch in _user_batches(db, query, projection, after, limit):
+        user_ids = [user["_id"] for user in batch]
+        orchards_by_user: Dict[Any, List[Dict[str, Any]]] = {}
+        async for orchard in db.orchards.find({"userId": {"$in": user_ids}}, projection=ORCHARD_PROJECTION):
+            orchards_by_user.setdefault(orchard["userId"], []).append(orchard)
+
+        lines = []
+        for user in batch:
+            user_cluster = user.get("cluster_id")
+            if user_cluster is None:
+                entries = cold_start_index.lookup(user.get("experience_level")) or []
+            else:
+                if user_cluster not in cluster_entries:
+                    doc = await db.cluster_recommendations.find_one({"_id": user_cluster})
+                    cluster_entries[user_cluster] = doc.get("orchards", []) if doc else []
+                entries = cluster_entries[user_cluster]
+
+            lines.append(_line({
+                "userId": user["_id"],
+                "clusterId": user_cluster,
+                "recommendations": rank_for_user(entries, user, orchards_by_user.get(user["_id"], []), top_n)
+            }))
+
+        yield b"".join(lines)
+        yield _line({"cursor": encode_cursor(trained_at, batch[-1]["_id"])})
+        exported += len(batch)
+
+    if not limit or exported < limit:
+        yield _line({"cursor": None})
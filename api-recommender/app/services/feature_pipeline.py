@@ -3,15 +3,20 @@
 Justificación técnica:
 - StandardScaler: Normaliza features numéricas para que todas contribuyan equitativamente
 - K-Prototypes: Maneja datos mixtos (numéricos + categóricos) sin necesidad de one-hot encode todo
-- Discretización de ubicación: Reduce dimensionalidad manteniendo información geográfica
+- Discretización de ubicación: Reduce dimensionalidad manteniendo información geográfica.
+  Las regiones del entrenamiento anterior se reutilizan si la ubicación no derivó
+  (ver location_regions).
+- Con COMPACT_FEATURES las matrices salen en float32 / int8-int16 (ver compact_features).
 """
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from datetime import datetime
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+from app.core.config import settings
+from app.services.compact_features import compact_categorical, compact_enabled, compact_numeric
+from app.services.location_regions import LocationRegions, target_regions
+from app.services.user_features import CATEGORICAL_FEATURES, NUMERIC_FEATURES, extract_user_features
 
 logger = logging.getLogger(__name__)
 
@@ -19,146 +24,26 @@ logger = logging.getLogger(__name__)
 class FeaturePipeline:
     """Extrae y transforma features de usuarios y orchards para clustering."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        previous_location_regions: Optional[LocationRegions] = None,
+        compact: Optional[bool] = None
+    ):
         self.scaler = StandardScaler()
-        self.location_clusterer = None  # KMeans para discretizar lat/lon
+        # float32 / int8-int16 en lugar de float64 (None = COMPACT_FEATURES)
+        self.compact = compact_enabled() if compact is None else compact
+        self.location_regions: Optional[LocationRegions] = None  # centros para discretizar lat/lon
+        # Regiones del entrenamiento anterior, candidatas a reutilizarse en fit_transform
+        self.previous_location_regions = previous_location_regions
+        self.location_regions_reused = False
         self.feature_names_numeric = []
         self.feature_names_categorical = []
+        self.category_vocabularies: Dict[str, list] = {}  # código -> valor, por columna
         self.fitted = False
 
     def extract_user_features(self, user: Dict[str, Any], orchards: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Extrae features de un usuario y sus orchards.
-
-        Args:
-            user: Documento de usuario desde MongoDB
-            orchards: Lista de orchards del usuario
-
-        Returns:
-            Dict con features numéricas y categóricas
-        """
-        features = {}
-
-        # ===== USER FEATURES =====
-        features['experience_level'] = user.get('experience_level', 2)
-        features['count_orchards'] = len(orchards)
-        features['has_tokenFCM'] = 1 if user.get('tokenFCM') else 0
-        features['profile_image_present'] = 1 if user.get('profile_image') else 0
-
-        # Account age in days
-        created_at = user.get('createdAt', datetime.now())
-        if isinstance(created_at, str):
-            created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-        account_age = (datetime.now() - created_at).days
-        features['account_age_days'] = max(0, account_age)
-
-        # ===== AGGREGATE ORCHARD FEATURES =====
-        if orchards:
-            # Área promedio
-            areas = []
-            for orchard in orchards:
-                # Priorizar totalArea, fallback a width*height
-                if 'layout' in orchard and 'dimensions' in orchard['layout']:
-                    area = orchard['layout']['dimensions'].get('totalArea')
-                    if not area:
-                        w = orchard.get('width', 0)
-                        h = orchard.get('height', 0)
-                        area = w * h
-                else:
-                    area = orchard.get('width', 0) * orchard.get('height', 0)
-                areas.append(area)
-
-            features['avg_orchard_area'] = np.mean(areas) if areas else 0
-
-            # Agua semanal total
-            water = []
-            for orchard in orchards:
-                if 'estimations' in orchard:
-                    water.append(orchard['estimations'].get('weeklyWaterLiters', 0))
-            features['sum_weekly_water_liters'] = np.sum(water) if water else 0
-
-            # Mantenimiento promedio
-            maintenance = []
-            for orchard in orchards:
-                if 'estimations' in orchard:
-                    maintenance.append(orchard['estimations'].get('maintenanceMinutesPerWeek', 0))
-                elif 'maintenanceMinutes' in orchard:
-                    maintenance.append(orchard['maintenanceMinutes'])
-            features['avg_maintenance_minutes'] = np.mean(maintenance) if maintenance else 0
-
-            # Contadores promedio
-            features['avg_count_plants'] = np.mean([o.get('countPlants', 0) for o in orchards])
-            features['avg_timeOfLife'] = np.mean([o.get('timeOfLife', 0) for o in orchards])
-            features['avg_streak'] = np.mean([o.get('streakOfDays', 0) for o in orchards])
-
-            # Diversidad de plantas (número de tipos distintos)
-            all_types = set()
-            for orchard in orchards:
-                if 'layout' in orchard and 'plants' in orchard['layout']:
-                    for plant in orchard['layout']['plants']:
-                        all_types.update(plant.get('type', []))
-            features['avg_plant_diversity'] = len(all_types)
-
-            # Category distribution
-            category_breakdown = {'vegetable': [], 'medicinal': [], 'ornamental': [], 'aromatic': []}
-            for orchard in orchards:
-                if 'layout' in orchard and 'categoryBreakdown' in orchard['layout']:
-                    cb = orchard['layout']['categoryBreakdown']
-                    for cat in category_breakdown.keys():
-                        category_breakdown[cat].append(cb.get(cat, 0))
-                elif 'metadata' in orchard and 'inputParameters' in orchard['metadata']:
-                    dist = orchard['metadata']['inputParameters'].get('categoryDistribution', {})
-                    for cat in category_breakdown.keys():
-                        category_breakdown[cat].append(dist.get(cat, 0))
-
-            for cat, values in category_breakdown.items():
-                features[f'pct_{cat}'] = np.mean(values) if values else 0
-
-            # Objetivo más común
-            objectives = []
-            for orchard in orchards:
-                if 'objective' in orchard:
-                    objectives.append(orchard['objective'])
-                elif 'metadata' in orchard:
-                    obj = orchard['metadata'].get('inputParameters', {}).get('objective')
-                    if obj:
-                        objectives.append(obj)
-
-            if objectives:
-                features['objective'] = max(set(objectives), key=objectives.count)
-            else:
-                features['objective'] = 'alimenticio'
-
-            # Ubicación (usar primera orchard o default)
-            lat, lon = None, None
-            for orchard in orchards:
-                if 'metadata' in orchard:
-                    loc = orchard['metadata'].get('inputParameters', {}).get('location', {})
-                    lat = loc.get('lat')
-                    lon = loc.get('lon')
-                    if lat is not None and lon is not None:
-                        break
-
-            features['latitude'] = lat if lat is not None else 16.75
-            features['longitude'] = lon if lon is not None else -93.11
-
-        else:
-            # Usuario sin orchards - valores default
-            features['avg_orchard_area'] = 0
-            features['sum_weekly_water_liters'] = 0
-            features['avg_maintenance_minutes'] = 0
-            features['avg_count_plants'] = 0
-            features['avg_timeOfLife'] = 0
-            features['avg_streak'] = 0
-            features['avg_plant_diversity'] = 0
-            features['pct_vegetable'] = 0
-            features['pct_medicinal'] = 0
-            features['pct_ornamental'] = 0
-            features['pct_aromatic'] = 0
-            features['objective'] = 'alimenticio'
-            features['latitude'] = 16.75
-            features['longitude'] = -93.11
-
-        return features
+        """Extrae features de un usuario y sus orchards (ver user_features.extract_user_features)."""
+        return extract_user_features(user, orchards)
 
     def fit_transform(self, users_features: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
         """Ajusta el pipeline y transforma features.
@@ -172,24 +57,18 @@ class FeaturePipeline:
         df = pd.DataFrame(users_features)
 
         # Definir columnas
-        numeric_cols = [
-            'experience_level', 'count_orchards', 'has_tokenFCM', 'profile_image_present',
-            'account_age_days', 'avg_orchard_area', 'sum_weekly_water_liters',
-            'avg_maintenance_minutes', 'avg_count_plants', 'avg_timeOfLife', 'avg_streak',
-            'avg_plant_diversity', 'pct_vegetable', 'pct_medicinal', 'pct_ornamental',
-            'pct_aromatic'
-        ]
-
-        categorical_cols = ['objective']
+        numeric_cols = list(NUMERIC_FEATURES)
+        categorical_cols = list(CATEGORICAL_FEATURES)
 
         # Discretizar ubicación (cluster_region)
         if 'latitude' in df.columns and 'longitude' in df.columns:
-            locations = df[['latitude', 'longitude']].values
-            n_location_clusters = min(10, len(df) // 10)  # Max 10 regiones
+            locations = df[['latitude', 'longitude']].values.astype(float)
+            n_location_clusters = target_regions(len(df))  # Max 10 regiones
             if n_location_clusters >= 2:
-                self.location_clusterer = KMeans(n_clusters=n_location_clusters, random_state=42, n_init=10)
-                df['cluster_region'] = self.location_clusterer.fit_predict(locations)
+                self.location_regions = self._fit_location_regions(locations, n_location_clusters)
+                df['cluster_region'] = self.location_regions.assign(locations)
             else:
+                self.location_regions = None
                 df['cluster_region'] = 0
 
             categorical_cols.append('cluster_region')
@@ -213,6 +92,9 @@ class FeaturePipeline:
 
         # Categóricos (convertir a int para k-prototypes)
         X_categorical = df[categorical_cols].astype('category')
+        self.category_vocabularies = {
+            col: X_categorical[col].cat.categories.tolist() for col in categorical_cols
+        }
         X_categorical = X_categorical.apply(lambda x: x.cat.codes).values
 
         self.feature_names_numeric = numeric_cols
@@ -221,7 +103,27 @@ class FeaturePipeline:
 
         logger.info(f"Pipeline fitted: {len(numeric_cols)} numeric features, {len(categorical_cols)} categorical features")
 
-        return X_numeric_scaled, X_categorical
+        return self._output(X_numeric_scaled, X_categorical)
+
+    def _output(self, X_numeric: np.ndarray, X_categorical: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Matrices en el dtype configurado (compactas y contiguas por columna con compact)."""
+        if not self.compact:
+            return X_numeric, X_categorical
+        n_codes = max((len(vocab) for vocab in self.category_vocabularies.values()), default=0)
+        return compact_numeric(X_numeric), compact_categorical(X_categorical, n_codes)
+
+    def _fit_location_regions(self, locations: np.ndarray, n_regions: int) -> LocationRegions:
+        """Reutiliza las regiones anteriores si no hubo drift; si no, ajusta KMeans."""
+        self.location_regions_reused = False
+        previous = self.previous_location_regions
+        if previous is not None and settings.LOCATION_REGIONS_REUSE:
+            if previous.is_reusable(locations, settings.LOCATION_DRIFT_THRESHOLD):
+                self.location_regions_reused = True
+                logger.info(f"Reusing {previous.n_regions} location regions (drift {previous.drift(locations):.3f})")
+                return previous
+            logger.info(f"Location regions drifted or region count changed; refitting {n_regions} regions")
+
+        return LocationRegions.fit(locations, n_regions)
 
     def transform(self, users_features: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
         """Transforma features usando scaler ya ajustado."""
@@ -231,9 +133,9 @@ class FeaturePipeline:
         df = pd.DataFrame(users_features)
 
         # Discretizar ubicación
-        if self.location_clusterer and 'latitude' in df.columns and 'longitude' in df.columns:
-            locations = df[['latitude', 'longitude']].values
-            df['cluster_region'] = self.location_clusterer.predict(locations)
+        if self.location_regions is not None and 'latitude' in df.columns and 'longitude' in df.columns:
+            locations = df[['latitude', 'longitude']].values.astype(float)
+            df['cluster_region'] = self.location_regions.assign(locations)
         else:
             df['cluster_region'] = 0
 
@@ -254,7 +156,24 @@ class FeaturePipeline:
         X_numeric = df[self.feature_names_numeric].values
         X_numeric_scaled = self.scaler.transform(X_numeric)
 
-        X_categorical = df[self.feature_names_categorical].astype('category')
-        X_categorical = X_categorical.apply(lambda x: x.cat.codes).values
+        # Mismos códigos que en el ajuste; valores no vistos quedan en -1
+        X_categorical = np.column_stack([
+            pd.Categorical(df[col], categories=self.category_vocabularies[col]).codes
+            for col in self.feature_names_categorical
+        ])
+
+        return self._output(X_numeric_scaled, X_categorical)
+
+    def inverse_transform_numeric(self, X_numeric_scaled: np.ndarray) -> np.ndarray:
+        """Regresa features numéricas escaladas a sus unidades originales."""
+        if not self.fitted:
+            raise ValueError("Pipeline not fitted. Call fit_transform first.")
+
+        return self.scaler.inverse_transform(np.atleast_2d(X_numeric_scaled))
+
+    def inverse_scale_spread(self, spread_scaled: np.ndarray) -> np.ndarray:
+        """Convierte dispersiones (std) en espacio escalado a unidades originales."""
+        if not self.fitted:
+            raise ValueError("Pipeline not fitted. Call fit_transform first.")
 
-        return X_numeric_scaled, X_categorical
+        return np.atleast_2d(spread_scaled) * self.scaler.scale_
@@ -0,0 +1,236 @@
+"""Feature store persistente por usuario (colección `user_features`).
+
+Justificación técnica:
+- Cada entrenamiento recalculaba las features de todos los usuarios uniendo los
+  documentos completos de `users` y `orchards` (layout, plantas, métricas),
+  aunque la mayoría no había cambiado.
+- Cada fila guarda el vector numérico en el orden de NUMERIC_FEATURES, el
+  objetivo, la ubicación, createdAt (la antigüedad se recalcula al leer) y un
+  source_version: hash de los campos del usuario que usa la extracción y de los
+  stamps `_id@updatedAt` de sus huertos.
+- El consumidor de change streams refresca las filas de los usuarios afectados
+  (eventos de `users` y de `orchards`); sólo se reescriben filas cuyo
+  source_version cambió.
+- Al entrenar, sync() compara stamps con un scan proyectado (pocos bytes por
+  documento) y recalcula sólo las filas viejas, faltantes o huérfanas; luego el
+  ingest es un único scan secuencial de filas pequeñas.
+- get_features() lee una sola fila para la inferencia incremental.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteMany, ReplaceOne
+
+from app.services.user_features import NUMERIC_FEATURES, account_age_days, extract_user_features
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "user_features"
+
+# Incrementar si cambian las features o su orden: sync() reescribe todas las filas
+FEATURE_SCHEMA_VERSION = 1
+
+# Usuarios por consulta $in / bulk_write al refrescar
+REFRESH_CHUNK = 1000
+
+# Campos del usuario que usa extract_user_features
+USER_PROJECTION = {"experience_level": 1, "tokenFCM": 1, "profile_image": 1, "createdAt": 1}
+
+# api-orchard escribe `updateAt`; los datos sintéticos sólo traen createdAt
+ORCHARD_STAMP_FIELDS = ("updatedAt", "updateAt", "createdAt")
+ORCHARD_STAMP_PROJECTION = {"userId": 1, **{field: 1 for field in ORCHARD_STAMP_FIELDS}}
+
+# Campos de la fila que necesita row_to_features
+ROW_PROJECTION = {"numeric": 1, "objective": 1, "location": 1, "created_at": 1}
+
+
+def _stamp_value(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else str(value)
+
+
+def orchard_stamp(orchard: Dict[str, Any]) -> str:
+    """`_id@fecha` de la última modificación conocida del huerto."""
+    for field in ORCHARD_STAMP_FIELDS:
+        if orchard.get(field) is not None:
+            return f"{orchard['_id']}@{_stamp_value(orchard[field])}"
+    return str(orchard["_id"])
+
+
+def source_version(user: Dict[str, Any], orchard_stamps: Iterable[str]) -> str:
+    """Hash corto de lo que determina las features de un usuario."""
+    parts = [
+        _stamp_value(user.get("experience_level", 2)),
+        "1" if user.get("tokenFCM") else "0",
+        "1" if user.get("profile_image") else "0",
+        _stamp_value(user.get("createdAt")),
+    ]
+    parts.extend(sorted(orchard_stamps))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _as_float(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def build_row(user: Dict[str, Any], orchards: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fila de `user_features` a partir de los documentos crudos."""
+    features = extract_user_features(user, orchards)
+    return {
+        "_id": str(user["_id"]),
+        "numeric": [_as_float(features.get(col)) for col in NUMERIC_FEATURES],
+        "objective": features.get("objective"),
+        "location": [_as_float(features.get("latitude")), _as_float(features.get("longitude"))],
+        "created_at": user.get("createdAt"),
+        "orchard_ids": [orchard["_id"] for orchard in orchards],
+        "source_version": source_version(user, [orchard_stamp(o) for o in orchards]),
+        "schema_version": FEATURE_SCHEMA_VERSION,
+        "updated_at": datetime.utcnow()
+    }
+
+
+def row_to_features(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Dict equivalente a extract_user_features (account_age_days a la fecha actual)."""
+    features = dict(zip(NUMERIC_FEATURES, row["numeric"]))
+    features["account_age_days"] = account_age_days(row.get("created_at"))
+    features["objective"] = row.get("objective")
+    features["latitude"], features["longitude"] = row["location"]
+    return features
+
+
+class FeatureStore:
+    """Lectura y mantenimiento de la colección `user_features`."""
+
+    def __init__(self, collection: str = COLLECTION, chunk_size: int = REFRESH_CHUNK):
+        self.collection = collection
+        self.chunk_size = chunk_size
+
+    async def refresh_users(self, db: AsyncIOMotorDatabase, user_ids: Iterable[Any]) -> int:
+        """Recalcula las filas de los usuarios dados y borra las de usuarios inexistentes.
+
+        Returns:
+            Número de filas escritas o borradas
+        """
+        ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        changed = 0
+
+        for start in range(0, len(ids), self.chunk_size):
+            chunk = ids[start:start + self.chunk_size]
+            users = await db.users.find({"_id": {"$in": chunk}}, projection=USER_PROJECTION).to_list(length=None)
+
+            orchards_by_user = defaultdict(list)
+            async for orchard in db.orchards.find({"userId": {"$in": chunk}}):
+                orchards_by_user[orchard["userId"]].append(orchard)
+
+            stored = {
+                row["_id"]: (row.get("source_version"), row.get("schema_version"))
+                async for row in db[self.collection].find(
+                    {"_id": {"$in": chunk}}, projection={"source_version": 1, "schema_version": 1}
+                )
+            }
+
+            operations = []
+            for user in users:
+                row = build_row(user, orchards_by_user.get(str(user["_id"]), []))
+                if stored.get(row["_id"]) != (row["source_version"], FEATURE_SCHEMA_VERSION):
+                    operations.append(ReplaceOne({"_id": row["_id"]}, row, upsert=True))
+            changed += len(operations)
+
+            existing = {str(user["_id"]) for user in users}
+            removed = [user_id for user_id in chunk if user_id not in existing and user_id in stored]
+            if removed:
+                operations.append(DeleteMany({"_id": {"$in": removed}}))
+                changed += len(removed)
+
+            if operations:
+                await db[self.collection].bulk_write(operations, ordered=False)
+
+        return changed
+
+    async def users_for_orchards(self, db: AsyncIOMotorDatabase, orchard_ids: Iterable[Any]) -> List[str]:
+        """Usuarios cuyas filas incluyen alguno de los huertos (sirve para huertos borrados)."""
+        cursor = db[self.collection].find({"orchard_ids": {"$in": list(orchard_ids)}}, projection={"_id": 1})
+        return [row["_id"] async for row in cursor]
+
+    async def sync(self, db: AsyncIOMotorDatabase) -> Dict[str, int]:
+        """Pone al día la colección comparando source_version con los stamps actuales."""
+        await db[self.collection].create_index("orchard_ids")
+
+        stamps = defaultdict(list)
+        async for orchard in db.orchards.find({"userId": {"$ne": None}}, projection=ORCHARD_STAMP_PROJECTION):
+            stamps[orchard["userId"]].append(orchard_stamp(orchard))
+
+        versions = {}
+        async for user in db.users.find({}, projection=USER_PROJECTION):
+            user_id = str(user["_id"])
+            versions[user_id] = source_version(user, stamps.get(user_id, []))
+
+        stored = {
+            row["_id"]: (row.get("source_version"), row.get("schema_version"))
+            async for row in db[self.collection].find({}, projection={"source_version": 1, "schema_version": 1})
+        }
+
+        stale = [
+            user_id for user_id, version in versions.items()
+            if stored.get(user_id) != (version, FEATURE_SCHEMA_VERSION)
+        ]
+        orphans = [user_id for user_id in stored if user_id not in versions]
+
+        await self.refresh_users(db, stale)
+        if orphans:
+            await db[self.collection].delete_many({"_id": {"$in": orphans}})
+
+        stats = {"users": len(versions), "refreshed": len(stale), "removed": len(orphans)}
+        logger.info(f"Feature store synced: {stats}")
+        return stats
+
+    async def load_all(self, db: AsyncIOMotorDatabase) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """(user_ids, features) de todas las filas en un solo scan."""
+        user_ids, users_features = [], []
+        async for row in db[self.collection].find({}, projection=ROW_PROJECTION):
+            user_ids.append(row["_id"])
+            users_features.append(row_to_features(row))
+        return user_ids, users_features
+
+    async def load_users(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_ids: Iterable[Any]
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """(user_ids, features) de los usuarios dados que existen.
+
+        Los que aún no tienen fila (p. ej. FEATURE_STORE_ENABLED desactivado) se
+        calculan desde `users` y `orchards` sin escribir la fila.
+        """
+        ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        rows = {
+            row["_id"]: row
+            async for row in db[self.collection].find({"_id": {"$in": ids}}, projection=ROW_PROJECTION)
+        }
+
+        missing = [user_id for user_id in ids if user_id not in rows]
+        if missing:
+            users = await db.users.find({"_id": {"$in": missing}}, projection=USER_PROJECTION).to_list(length=None)
+            orchards_by_user = defaultdict(list)
+            async for orchard in db.orchards.find({"userId": {"$in": missing}}):
+                orchards_by_user[orchard["userId"]].append(orchard)
+            for user in users:
+                row = build_row(user, orchards_by_user.get(str(user["_id"]), []))
+                rows[row["_id"]] = row
+
+        found = [user_id for user_id in ids if user_id in rows]
+        return found, [row_to_features(rows[user_id]) for user_id in found]
+
+    async def get_features(self, db: AsyncIOMotorDatabase, user_id: Any) -> Optional[Dict[str, Any]]:
+        """Features de un usuario desde su fila (None si no tiene)."""
+        row = await db[self.collection].find_one({"_id": str(user_id)}, projection=ROW_PROJECTION)
+        return row_to_features(row) if row else None
+
+
+# Instancia global del feature store
+feature_store = FeatureStore()
@@ -0,0 +1,102 @@
+"""Discretización de ubicación (cluster_region) reutilizable entre entrenamientos.
+
+Justificación técnica:
+- FeaturePipeline ajustaba un KMeans(n_init=10) sobre la lat/lon de todos los
+  usuarios en cada entrenamiento, aunque las ubicaciones casi no cambian.
+- Los centros se guardan como artefacto en la versión del registro junto con
+  el costo de referencia (distancia² media al centro más cercano al ajustar).
+  El siguiente entrenamiento los reutiliza mientras el costo medio de las
+  ubicaciones actuales no supere la referencia en más de
+  LOCATION_DRIFT_THRESHOLD (relativo) y el número de regiones objetivo no cambie.
+- Reutilizar conserva además los códigos de región, así el warm start y las
+  caches no ven regiones renumeradas.
+- Asignar región es un argmin vectorizado contra a lo sumo 10 centros, en
+  entrenamiento, en transform() y en el predictor; sin llamar a KMeans.predict.
+"""
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from app.core.artifacts import load_artifact, save_artifact
+from app.services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Máximo de regiones (una por cada 10 usuarios hasta este tope)
+MAX_REGIONS = 10
+USERS_PER_REGION = 10
+
+
+def target_regions(n_users: int) -> int:
+    """Número de regiones para n usuarios (menos de 2 = sin discretización)."""
+    return min(MAX_REGIONS, n_users // USERS_PER_REGION)
+
+
+def squared_distances(locations: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Distancia² de cada (lat, lon) a cada centro, forma (N, n_centros)."""
+    locations = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+    return ((locations[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+
+
+def nearest_center(locations: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Índice del centro más cercano a cada (lat, lon)."""
+    return squared_distances(locations, centers).argmin(axis=1)
+
+
+class LocationRegions:
+    """Centros de región y costo de referencia del ajuste."""
+
+    def __init__(self, centers: np.ndarray, reference_cost: float):
+        self.centers = np.ascontiguousarray(centers, dtype=np.float64)
+        self.reference_cost = float(reference_cost)
+
+    @property
+    def n_regions(self) -> int:
+        return len(self.centers)
+
+    @classmethod
+    def fit(cls, locations: np.ndarray, n_regions: int) -> "LocationRegions":
+        """Ajusta los centros con KMeans (sólo en entrenamiento)."""
+        from sklearn.cluster import KMeans
+
+        locations = np.asarray(locations, dtype=np.float64)
+        kmeans = KMeans(n_clusters=n_regions, random_state=42, n_init=10).fit(locations)
+        regions = cls(kmeans.cluster_centers_, 0.0)
+        regions.reference_cost = regions.mean_cost(locations)
+        return regions
+
+    def assign(self, locations: np.ndarray) -> np.ndarray:
+        return nearest_center(locations, self.centers)
+
+    def mean_cost(self, locations: np.ndarray) -> float:
+        """Distancia² media de las ubicaciones a su centro más cercano."""
+        if not len(locations):
+            return 0.0
+        return float(squared_distances(locations, self.centers).min(axis=1).mean())
+
+    def drift(self, locations: np.ndarray) -> float:
+        """Aumento relativo del costo medio respecto al ajuste (0 = sin cambio)."""
+        return (self.mean_cost(locations) - self.reference_cost) / max(self.reference_cost, 1e-12)
+
+    def is_reusable(self, locations: np.ndarray, threshold: float) -> bool:
+        """True si el número de regiones objetivo no cambió y el drift no supera el umbral."""
+        if target_regions(len(locations)) != self.n_regions:
+            return False
+        return self.drift(locations) <= threshold
+
+    def save(self, path: Path):
+        save_artifact(path, {'centers': self.centers}, metadata={
+            'kind': 'location_regions',
+            'reference_cost': self.reference_cost,
+        })
+
+    @classmethod
+    def load(cls, path: Path) -> "LocationRegions":
+        arrays, metadata = load_artifact(path, mmap=False)
+        return cls(arrays['centers'], metadata['reference_cost'])
+
+
+def location_regions_path() -> Path:
+    """Directorio de las regiones en la versión activa del registro."""
+    return model_registry.artifact_path("location_regions")
@@ -0,0 +1,231 @@
+"""Registro de versiones de modelo bajo MODEL_STORAGE_PATH.
+
+Justificación técnica:
+- Con un MODEL_VERSION fijo cada entrenamiento sobrescribía los archivos en su
+  lugar: una caída a mitad de escritura dejaba un modelo corrupto y no había a
+  qué volver.
+- Cada entrenamiento escribe sus artefactos (kprototypes, cluster_predictor,
+  neighbor_index) en `versions/.staging-<id>/`; al terminar el directorio se
+  renombra a `versions/<id>/` (atómico) y se promueve reescribiendo el puntero
+  `active.json` con write-then-rename. Un lector ve la versión anterior completa
+  o la nueva completa, nunca una mezcla.
+- Los ids son `<MODEL_VERSION>-<timestamp>`: ordenan cronológicamente.
+- Retención: se conservan las MODEL_REGISTRY_KEEP_VERSIONS versiones
+  entrenadas más recientes y siempre la activa. Borrar una versión que un
+  worker tiene mapeada es seguro (POSIX mantiene el archivo hasta que se libera
+  el mmap).
+- Los checkpoints de centroides online se publican como hijos de su versión
+  entrenada (`.parent.json`): no cuentan para la retención (sólo se conserva
+  el activo), su versión entrenada nunca se borra mientras uno esté activo y
+  rollback los salta hasta el entrenamiento anterior.
+- Los workers detectan la promoción en ArtifactStore.get(), que resuelve la ruta
+  a través del puntero en cada llamada (un stat del puntero, cacheado por mtime).
+- Sin puntero (antes del primer entrenamiento con registro) las rutas apuntan a
+  los artefactos planos anteriores (`kprototypes_v1`, `*.joblib`) para migrar.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = "versions"
+ACTIVE_FILE = "active.json"
+PARENT_FILE = ".parent.json"
+STAGING_PREFIX = ".staging-"
+
+
+class ModelVersion:
+    """Versión en preparación: los artefactos se escriben en su directorio de staging."""
+
+    def __init__(self, version_id: str, staging_dir: Path):
+        self.id = version_id
+        self.staging_dir = staging_dir
+
+    def path(self, name: str) -> Path:
+        return self.staging_dir / name
+
+
+class ModelRegistry:
+    """Versiones de modelo con promoción atómica, rollback y retención."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self._root = Path(root) if root else None
+        self._lock = threading.Lock()
+        self._active_cache: Tuple[Optional[Tuple[str, int, int]], Optional[str]] = (None, None)
+
+    @property
+    def root(self) -> Path:
+        # MODEL_STORAGE_PATH se lee en cada uso (los tests lo cambian por proceso)
+        return self._root or Path(settings.MODEL_STORAGE_PATH)
+
+    @property
+    def versions_dir(self) -> Path:
+        return self.root / VERSIONS_DIR
+
+    @property
+    def active_file(self) -> Path:
+        return self.root / ACTIVE_FILE
+
+    # ===== LECTURA =====
+
+    def active_version(self) -> Optional[str]:
+        """Id de la versión activa (None si todavía no hay registro)."""
+        try:
+            stat = os.stat(self.active_file)
+        except FileNotFoundError:
+            return None
+
+        key = (str(self.active_file), stat.st_mtime_ns, stat.st_ino)
+        cached_key, cached_version = self._active_cache
+        if cached_key == key:
+            return cached_version
+
+        try:
+            with open(self.active_file) as f:
+                version = json.load(f)["version"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Unreadable model registry pointer {self.active_file}: {e}")
+            return cached_version
+
+        self._active_cache = (key, version)
+        return version
+
+    def list_versions(self) -> List[str]:
+        """Versiones publicadas, de la más antigua a la más reciente."""
+        if not self.versions_dir.is_dir():
+            return []
+        return sorted(
+            entry.name for entry in self.versions_dir.iterdir()
+            if entry.is_dir() and not entry.name.startswith(".")
+        )
+
+    def version_dir(self, version_id: str) -> Path:
+        return self.versions_dir / version_id
+
+    def parent_version(self, version_id: str) -> Optional[str]:
+        """Versión entrenada de la que deriva un checkpoint (None si fue entrenada)."""
+        try:
+            with open(self.version_dir(version_id) / PARENT_FILE) as f:
+                return json.load(f)["parent"]
+        except FileNotFoundError:
+            return None
+
+    def trained_version(self, version_id: str) -> str:
+        """La versión misma si fue entrenada; la de su entrenamiento si es un checkpoint."""
+        return self.parent_version(version_id) or version_id
+
+    def trained_versions(self) -> List[str]:
+        """Versiones entrenadas (sin checkpoints), de la más antigua a la más reciente."""
+        return [version for version in self.list_versions() if self.parent_version(version) is None]
+
+    def artifact_path(self, name: str) -> Path:
+        """Ruta del artefacto `name` en la versión activa (o la ruta plana anterior)."""
+        version = self.active_version()
+        if version is None:
+            return self.legacy_artifact_path(name)
+        return self.version_dir(version) / name
+
+    def legacy_artifact_path(self, name: str) -> Path:
+        """Ruta fuera del registro: `<name>_<MODEL_VERSION>` (formato previo al registro)."""
+        return self.root / f"{name}_{settings.MODEL_VERSION}"
+
+    def describe(self) -> Dict[str, Any]:
+        active = self.active_version()
+        return {
+            "active": active,
+            "versions": [
+                {"version": version, "active": version == active, "parent": self.parent_version(version)}
+                for version in reversed(self.list_versions())
+            ],
+        }
+
+    # ===== ESCRITURA =====
+
+    def begin_version(self) -> ModelVersion:
+        """Crea el directorio de staging de una versión nueva."""
+        version_id = f"{settings.MODEL_VERSION}-{datetime.now():%Y%m%dT%H%M%S%f}"
+        staging_dir = self.versions_dir / f"{STAGING_PREFIX}{version_id}"
+        staging_dir.mkdir(parents=True)
+        return ModelVersion(version_id, staging_dir)
+
+    def discard(self, version: ModelVersion):
+        """Elimina una versión que no llegó a publicarse."""
+        shutil.rmtree(version.staging_dir, ignore_errors=True)
+
+    def publish(self, version: ModelVersion, promote: bool = True, parent: Optional[str] = None) -> str:
+        """Mueve la versión de staging a versions/<id>, la promueve y aplica retención.
+
+        Con `parent` la versión es un checkpoint de esa versión entrenada.
+        """
+        if parent is not None:
+            with open(version.path(PARENT_FILE), "w") as f:
+                json.dump({"parent": parent}, f)
+        os.rename(version.staging_dir, self.version_dir(version.id))
+        logger.info(f"Model version {version.id} published")
+        if promote:
+            self.promote(version.id)
+        self.prune()
+        return version.id
+
+    def promote(self, version_id: str):
+        """Apunta active.json a la versión (write-then-rename)."""
+        if not self.version_dir(version_id).is_dir():
+            raise ValueError(f"Unknown model version {version_id}")
+
+        with self._lock:
+            tmp = self.root / f".{ACTIVE_FILE}.tmp-{uuid.uuid4().hex}"
+            with open(tmp, "w") as f:
+                json.dump({"version": version_id, "promoted_at": datetime.now().isoformat()}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.active_file)
+
+        logger.info(f"Model version {version_id} promoted to active")
+
+    def previous_version(self) -> str:
+        """Versión que promovería rollback(): el entrenamiento anterior al activo."""
+        versions = self.trained_versions()
+        active = self.active_version()
+        trained = self.trained_version(active) if active else None
+        if trained not in versions:
+            raise ValueError("No active model version to roll back from")
+
+        position = versions.index(trained)
+        if position == 0:
+            raise ValueError(f"No model version older than {trained}")
+        return versions[position - 1]
+
+    def rollback(self) -> str:
+        """Promueve el entrenamiento anterior al activo; retorna su id."""
+        previous = self.previous_version()
+        self.promote(previous)
+        return previous
+
+    def prune(self, keep: Optional[int] = None) -> List[str]:
+        """Borra los entrenamientos más antiguos y los checkpoints inactivos; nunca la activa ni su entrenamiento."""
+        keep = keep or settings.MODEL_REGISTRY_KEEP_VERSIONS
+        active = self.active_version()
+        versions = self.list_versions()
+        trained = [version for version in versions if self.parent_version(version) is None]
+        kept = set(trained[-keep:]) | {active}
+        if active is not None:
+            kept.add(self.trained_version(active))
+        removed = [version for version in versions if version not in kept]
+
+        for version in removed:
+            shutil.rmtree(self.version_dir(version), ignore_errors=True)
+            logger.info(f"Model version {version} removed by retention policy")
+        return removed
+
+
+# Instancia global del registro
+model_registry = ModelRegistry()
@@ -0,0 +1,212 @@
+"""Índice aproximado de vecinos cercanos (IVF) sobre vectores de usuarios.
+
+Justificación técnica:
+- Los clusters de K-Prototypes (3-15) son muy gruesos para "usuarios similares";
+  comparar contra todos los usuarios es O(n) por request.
+- Embedding mixto: features numéricas escaladas concatenadas con one-hot de las
+  categóricas multiplicado por sqrt(gamma/2). La distancia euclidiana al cuadrado
+  en este espacio es exactamente el costo de K-Prototypes
+  (euclidiana² numérica + gamma * discrepancias categóricas).
+- IVF: MiniBatchKMeans con ~sqrt(n) listas invertidas; cada consulta revisa sólo
+  las n_probe listas más cercanas, O(sqrt(n)) en lugar de O(n). Un BallTree no
+  mejora a fuerza bruta en ~30 dimensiones.
+- scikit-learn se importa al construir, no al importar el módulo: el camino de
+  serving lo importa al arrancar. joblib sólo para leer índices del formato anterior.
+"""
+import logging
+import numpy as np
+from pathlib import Path
+from typing import List, Optional, Tuple
+from app.core.artifacts import ArtifactStore, is_artifact, load_artifact, save_artifact
+from app.core.config import settings
+from app.services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+MIN_LISTS = 1
+MAX_LISTS = 4096
+
+
+class UserNeighborIndex:
+    """Índice IVF de vecinos cercanos sobre el embedding mixto de usuarios."""
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: Optional[int] = None):
+        self.n_lists = n_lists
+        self.n_probe = n_probe or settings.NEIGHBOR_INDEX_N_PROBE
+        self.gamma: float = 0.0
+        self.category_sizes: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.centers: Optional[np.ndarray] = None
+        self.centers_sq: Optional[np.ndarray] = None
+        self.vectors: Optional[np.ndarray] = None  # ordenados por lista
+        self.vectors_sq: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.row_ids: Optional[np.ndarray] = None  # posición ordenada -> fila original
+        self.user_ids: List[str] = []
+        self._positions: dict = {}
+
+    def embed(self, X_numeric: np.ndarray, X_categorical: np.ndarray) -> np.ndarray:
+        """Construye el embedding mixto (numéricas + one-hot ponderado por gamma)."""
+        X_numeric = np.asarray(X_numeric, dtype=np.float64)
+        X_categorical = np.asarray(X_categorical, dtype=np.int64)
+        weight = np.sqrt(self.gamma / 2.0)
+
+        blocks = [X_numeric]
+        for col, size in enumerate(self.category_sizes):
+            codes = X_categorical[:, col]
+            one_hot = np.zeros((len(codes), size))
+            known = (codes >= 0) & (codes < size)
+            one_hot[np.nonzero(known)[0], codes[known]] = weight
+            blocks.append(one_hot)
+
+        return np.ascontiguousarray(np.concatenate(blocks, axis=1))
+
+    def build(
+        self,
+        X_numeric: np.ndarray,
+        X_categorical: np.ndarray,
+        user_ids: List[str],
+        gamma: float
+    ) -> "UserNeighborIndex":
+        """Construye el índice con los vectores de entrenamiento."""
+        from sklearn.cluster import MiniBatchKMeans
+
+        self.gamma = float(gamma)
+        X_categorical = np.asarray(X_categorical, dtype=np.int64)
+        self.category_sizes = (
+            X_categorical.max(axis=0) + 1 if X_categorical.size else np.zeros(0, dtype=np.int64)
+        )
+        embedded = self.embed(X_numeric, X_categorical)
+
+        n_lists = self.n_lists or int(np.sqrt(len(embedded)))
+        n_lists = int(np.clip(n_lists, MIN_LISTS, min(MAX_LISTS, len(embedded))))
+        quantizer = MiniBatchKMeans(
+            n_clusters=n_lists,
+            random_state=42,
+            n_init=1,
+            batch_size=4096
+        )
+        labels = quantizer.fit_predict(embedded)
+
+        order = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels, minlength=n_lists)
+
+        self.n_lists = n_lists
+        self.centers = quantizer.cluster_centers_
+        self.centers_sq = np.einsum('ij,ij->i', self.centers, self.centers)
+        self.vectors = embedded[order]
+        self.vectors_sq = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.row_ids = order
+        self.user_ids = list(user_ids)
+        self._positions = {uid: pos for pos, uid in enumerate(self._sorted_user_ids())}
+
+        logger.info(f"Neighbor index built: {len(user_ids)} users, {n_lists} lists")
+        return self
+
+    def _sorted_user_ids(self) -> List[str]:
+        return np.asarray(self.user_ids)[self.row_ids].tolist()
+
+    def _query_vector(self, q: np.ndarray, k: int, n_probe: int) -> Tuple[np.ndarray, np.ndarray]:
+        # ||x - q||² = ||x||² - 2 x·q + ||q||²; ||q||² no cambia el orden
+        center_dist = self.centers_sq - 2.0 * (self.centers @ q)
+        n_probe = min(n_probe, self.n_lists)
+        probes = np.argpartition(center_dist, n_probe - 1)[:n_probe]
+
+        rows = np.concatenate([
+            np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes
+        ])
+        if len(rows) == 0:
+            return rows, np.zeros(0)
+
+        dist = self.vectors_sq[rows] - 2.0 * (self.vectors[rows] @ q)
+        k = min(k, len(rows))
+        top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top])]
+        q_sq = float(q @ q)
+        return rows[top], np.maximum(dist[top] + q_sq, 0.0)
+
+    def query(
+        self,
+        X_numeric: np.ndarray,
+        X_categorical: np.ndarray,
+        k: int,
+        n_probe: Optional[int] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """Vecinos aproximados de cada vector: lista de (user_id, distancia²)."""
+        if self.vectors is None:
+            raise ValueError("Index not built. Call build() first or load()")
+
+        results = []
+        for q in self.embed(X_numeric, X_categorical):
+            positions, dist = self._query_vector(q, k, n_probe or self.n_probe)
+            # Ids por hit: armar la lista ordenada completa costaría O(n) por query
+            results.append([
+                (self.user_ids[self.row_ids[p]], float(d)) for p, d in zip(positions, dist)
+            ])
+        return results
+
+    def neighbors_of_user(self, user_id: str, k: int) -> List[str]:
+        """Vecinos aproximados de un usuario indexado (excluyéndolo). [] si no está."""
+        position = self._positions.get(user_id)
+        if position is None:
+            return []
+
+        positions, _ = self._query_vector(self.vectors[position], k + 1, self.n_probe)
+        return [
+            self.user_ids[self.row_ids[p]] for p in positions if p != position
+        ][:k]
+
+    def save(self, path: Path):
+        """Guarda el índice como artefacto (manifest JSON + .npy)."""
+        save_artifact(path, {
+            'category_sizes': self.category_sizes,
+            'centers': self.centers,
+            'vectors': self.vectors,
+            'offsets': self.offsets,
+            'row_ids': self.row_ids,
+            'user_ids': np.asarray(self.user_ids, dtype=str),
+        }, metadata={
+            'kind': 'neighbor_index',
+            'n_lists': int(self.n_lists),
+            'n_probe': int(self.n_probe),
+            'gamma': self.gamma,
+        })
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "UserNeighborIndex":
+        """Carga un índice guardado con save() (o el .joblib del formato anterior).
+
+        Con mmap los vectores quedan mapeados: los workers comparten las páginas.
+        """
+        path = Path(path)
+        if is_artifact(path):
+            data, metadata = load_artifact(path, mmap=mmap)
+            data.update(metadata)
+        else:
+            import joblib
+
+            data = joblib.load(path)
+
+        index = cls(n_lists=data['n_lists'], n_probe=data['n_probe'])
+        index.gamma = data['gamma']
+        index.category_sizes = data['category_sizes']
+        index.centers = data['centers']
+        index.centers_sq = np.einsum('ij,ij->i', index.centers, index.centers)
+        index.vectors = data['vectors']
+        index.vectors_sq = np.einsum('ij,ij->i', index.vectors, index.vectors)
+        index.offsets = data['offsets']
+        index.row_ids = data['row_ids']
+        index.user_ids = list(np.asarray(data['user_ids']).tolist())
+        index._positions = {uid: pos for pos, uid in enumerate(index._sorted_user_ids())}
+        return index
+
+
+def neighbor_index_path() -> Path:
+    """Directorio del índice en la versión activa del registro."""
+    return model_registry.artifact_path("neighbor_index")
+
+
+# Instancia global del índice
+neighbor_index_store: ArtifactStore[UserNeighborIndex] = ArtifactStore(
+    "Neighbor index", neighbor_index_path, UserNeighborIndex.load
+)
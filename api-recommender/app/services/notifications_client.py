@@ -3,6 +3,7 @@ import logging
 import httpx
 from typing import List, Dict, Any
 from app.core.config import settings
+from app.core.metrics import NOTIFICATION_RECIPIENTS, NOTIFICATIONS_SENT, observe_phase
 
 logger = logging.getLogger(__name__)
 
@@ -41,14 +42,19 @@ class NotificationsClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
-                return response.json()
+            with observe_phase("notification_send"):
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
         except httpx.HTTPError as e:
+            NOTIFICATIONS_SENT.labels(endpoint="user", outcome="error").inc()
             logger.error(f"Failed to send notification to user {user_id}: {e}")
             raise
 
+        NOTIFICATIONS_SENT.labels(endpoint="user", outcome="success").inc()
+        NOTIFICATION_RECIPIENTS.labels(endpoint="user").inc(1)
+        return response.json()
+
     async def send_to_multiple_users(
         self,
         user_ids: List[str],
@@ -77,14 +83,58 @@ class NotificationsClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
-                return response.json()
+            with observe_phase("notification_send"):
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
         except httpx.HTTPError as e:
+            NOTIFICATIONS_SENT.labels(endpoint="multiple", outcome="error").inc()
             logger.error(f"Failed to send notifications to multiple users: {e}")
             raise
 
+        NOTIFICATIONS_SENT.labels(endpoint="multiple", outcome="success").inc()
+        NOTIFICATION_RECIPIENTS.labels(endpoint="multiple").inc(len(user_ids))
+        return response.json()
+
+    async def send_batch(self, notifications: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Envía varias notificaciones distintas en un solo request.
+
+        Args:
+            notifications: Mensajes con userIds, title, body y data (opcional)
+
+        Returns:
+            Respuesta del servicio de notificaciones con resumen de envíos
+        """
+        url = f"{self.base_url}/users/batch"
+        payload = {
+            "notifications": [
+                {
+                    "userIds": notification["userIds"],
+                    "title": notification["title"],
+                    "body": notification["body"],
+                    "data": notification.get("data") or {}
+                }
+                for notification in notifications
+            ]
+        }
+
+        try:
+            with observe_phase("notification_send"):
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
+        except httpx.HTTPError as e:
+            NOTIFICATIONS_SENT.labels(endpoint="batch", outcome="error").inc()
+            logger.error(f"Failed to send batch of {len(notifications)} notifications: {e}")
+            raise
+
+        NOTIFICATIONS_SENT.labels(endpoint="batch", outcome="success").inc()
+        NOTIFICATION_RECIPIENTS.labels(endpoint="batch").inc(
+            sum(len(notification["userIds"]) for notification in notifications)
+        )
+        return response.json()
+
     async def broadcast(
         self,
         title: str,
@@ -110,14 +160,18 @@ class NotificationsClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
-                return response.json()
+            with observe_phase("notification_send"):
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
         except httpx.HTTPError as e:
+            NOTIFICATIONS_SENT.labels(endpoint="broadcast", outcome="error").inc()
             logger.error(f"Failed to broadcast notification: {e}")
             raise
 
+        NOTIFICATIONS_SENT.labels(endpoint="broadcast", outcome="success").inc()
+        return response.json()
+
 
 # Instancia global del cliente
 notifications_client = NotificationsClient()
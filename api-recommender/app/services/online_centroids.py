@@ -0,0 +1,289 @@
+"""Actualización online de centroides entre reentrenamientos (ONLINE_CENTROID_UPDATES).
+
+Justificación técnica:
+- Entre reentrenamientos los usuarios nuevos no tienen cluster_id (se sirven
+  desde el índice cold-start) y los centroides quedan congelados mientras la
+  población deriva.
+- El consumidor de change streams asigna en batch a los usuarios sin cluster
+  con el predictor vigente y con esas asignaciones aplica un paso de
+  mini-batch K-Prototypes: cada centroide numérico se mueve hacia la media de
+  sus usuarios nuevos y las frecuencias de cada valor categórico del cluster
+  se actualizan con el mismo peso; la moda es el valor más frecuente (sólo
+  cambia si otro valor la supera).
+- Tasa por cluster: b / (PRIOR_WEIGHT + n), con b los usuarios del batch y n
+  los usuarios del cluster: su tamaño en el entrenamiento (metadata de
+  kprototypes) más los asignados online. Es el promedio incremental, así un
+  cluster grande se mueve menos que uno chico; PRIOR_WEIGHT suma peso extra al
+  centroide entrenado. Nunca baja de la tasa equivalente a b pasos de
+  MIN_LEARNING_RATE, así los centroides siguen a la deriva en lugar de volver
+  a congelarse.
+- gamma, scaler, vocabularios y particiones no cambian: en un modelo
+  particionado cada usuario sólo actualiza centroides de su partición.
+- Cada CHECKPOINT_USERS asignaciones (y al detener el consumidor) se publica
+  una versión nueva en el registro, hija de la versión entrenada: los
+  artefactos de la activa como hard links, el predictor actualizado y el
+  estado online (conteos y frecuencias). Los checkpoints no cuentan para la
+  retención de entrenamientos (sólo se conserva el activo).
+  Un reinicio retoma desde ahí, los demás workers recargan el predictor y el
+  siguiente entrenamiento hace warm start desde los centroides actualizados.
+  El artefacto kprototypes queda como lo dejó el entrenamiento.
+- Si mientras tanto se promovió otra versión (entrenamiento o rollback) el
+  checkpoint se descarta y el estado se reinicia desde la versión nueva.
+- Sólo escribe el worker dueño del lease de change streams.
+"""
+import asyncio
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.core.artifacts import ArtifactError, is_artifact, load_artifact, read_manifest, save_artifact
+from app.core.config import settings
+from app.services.cluster_predictor import ClusterPredictor
+from app.services.feature_store import feature_store
+from app.services.model_registry import ModelRegistry, model_registry
+
+logger = logging.getLogger(__name__)
+
+PREDICTOR_ARTIFACT = "cluster_predictor"
+STATE_ARTIFACT = "online_centroids"
+MODEL_ARTIFACT = "kprototypes"
+
+
+def _link_or_copy(source: str, target: str):
+    """Hard link (los artefactos publicados no se modifican); copia entre filesystems."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def trained_cluster_sizes(version_dir: Path, n_clusters: int) -> Optional[np.ndarray]:
+    """Tamaño de cada cluster en el entrenamiento (metadata de kprototypes); None si no está."""
+    try:
+        sizes = read_manifest(version_dir / MODEL_ARTIFACT)["metadata"]["cluster_metadata"]["cluster_sizes"]
+    except (OSError, ArtifactError, KeyError, TypeError) as e:
+        logger.warning(f"No trained cluster sizes in {version_dir.name}, online counts start at zero: {e}")
+        return None
+
+    counts = np.zeros(n_clusters)
+    for cluster_id, size in sizes.items():
+        if 0 <= int(cluster_id) < n_clusters:
+            counts[int(cluster_id)] = size
+    return counts
+
+
+def learning_rate(batch_size: int, assigned: float, prior_weight: float, min_learning_rate: float) -> float:
+    """Peso del batch en el centroide: b / (prior + n), con piso de b pasos de min_learning_rate."""
+    decayed = batch_size / (prior_weight + assigned)
+    floor = 1.0 - (1.0 - min_learning_rate) ** batch_size
+    return min(1.0, max(decayed, floor))
+
+
+class OnlineCentroids:
+    """Centroides de un predictor con los conteos y frecuencias para actualizarlos."""
+
+    def __init__(
+        self,
+        predictor: ClusterPredictor,
+        trained_version: str,
+        counts: Optional[np.ndarray] = None,
+        frequencies: Optional[List[np.ndarray]] = None,
+        n_assigned: int = 0
+    ):
+        self.predictor = predictor
+        self.trained_version = trained_version
+        self.centroids_numeric = np.array(predictor.centroids_numeric, dtype=np.float64)
+        self.centroids_categorical = np.array(predictor.centroids_categorical, dtype=np.int64)
+        self.counts = (
+            np.array(counts, dtype=np.float64) if counts is not None else np.zeros(predictor.n_clusters)
+        )
+        if frequencies is None:
+            # Sin historia: toda la frecuencia en la moda del entrenamiento
+            frequencies = []
+            for col, vocab in enumerate(predictor.vocabularies):
+                frequency = np.zeros((predictor.n_clusters, len(vocab)))
+                modes = self.centroids_categorical[:, col]
+                known = (modes >= 0) & (modes < len(vocab))
+                frequency[np.flatnonzero(known), modes[known]] = 1.0
+                frequencies.append(frequency)
+        self.frequencies = [np.array(frequency, dtype=np.float64) for frequency in frequencies]
+        self.n_assigned = n_assigned
+
+    def update(
+        self,
+        X_numeric: np.ndarray,
+        X_categorical: np.ndarray,
+        labels: np.ndarray,
+        prior_weight: float,
+        min_learning_rate: float
+    ):
+        """Paso de mini-batch: mueve cada centroide hacia los usuarios que se le asignaron."""
+        X_categorical = np.asarray(X_categorical, dtype=np.int64)
+        for cluster in np.unique(labels).tolist():
+            rows = labels == cluster
+            batch_size = int(rows.sum())
+            self.counts[cluster] += batch_size
+            rate = learning_rate(batch_size, self.counts[cluster], prior_weight, min_learning_rate)
+
+            batch_mean = np.asarray(X_numeric[rows]).mean(axis=0, dtype=np.float64)
+            self.centroids_numeric[cluster] += rate * (batch_mean - self.centroids_numeric[cluster])
+
+            for col, frequency in enumerate(self.frequencies):
+                n_codes = frequency.shape[1]
+                codes = X_categorical[rows, col]
+                codes = codes[(codes >= 0) & (codes < n_codes)]
+                histogram = np.bincount(codes, minlength=n_codes) / batch_size
+                frequency[cluster] = (1.0 - rate) * frequency[cluster] + rate * histogram
+
+                mode = self.centroids_categorical[cluster, col]
+                best = int(np.argmax(frequency[cluster]))
+                if not 0 <= mode < n_codes or frequency[cluster, best] > frequency[cluster, mode]:
+                    self.centroids_categorical[cluster, col] = best
+
+        self.n_assigned += len(labels)
+        self.predictor = self.predictor.with_centroids(
+            self.centroids_numeric.copy(), self.centroids_categorical.copy()
+        )
+
+    def save(self, path: Path):
+        arrays = {'counts': self.counts}
+        for i, frequency in enumerate(self.frequencies):
+            arrays[f'frequencies_{i}'] = frequency
+        save_artifact(path, arrays, metadata={
+            'kind': STATE_ARTIFACT,
+            'trained_version': self.trained_version,
+            'n_assigned': self.n_assigned,
+        })
+
+    @classmethod
+    def load(cls, version_dir: Path) -> "OnlineCentroids":
+        """Estado de una versión del registro; sin estado online, desde su predictor y entrenamiento."""
+        predictor = ClusterPredictor.load(version_dir / PREDICTOR_ARTIFACT, mmap=False)
+        state_path = version_dir / STATE_ARTIFACT
+        if not is_artifact(state_path):
+            return cls(
+                predictor, trained_version=version_dir.name,
+                counts=trained_cluster_sizes(version_dir, predictor.n_clusters)
+            )
+
+        arrays, metadata = load_artifact(state_path, mmap=False)
+        return cls(
+            predictor,
+            trained_version=metadata['trained_version'],
+            counts=arrays['counts'],
+            frequencies=[arrays[f'frequencies_{i}'] for i in range(len(predictor.vocabularies))],
+            n_assigned=metadata['n_assigned']
+        )
+
+
+class OnlineCentroidUpdater:
+    """Asigna usuarios nuevos, actualiza los centroides y hace checkpoints al registro."""
+
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.registry = registry or model_registry
+        self.state: Optional[OnlineCentroids] = None
+        self.version: Optional[str] = None
+        self.pending = 0
+
+    def _current_state(self) -> Optional[OnlineCentroids]:
+        """Estado de la versión activa; se recarga si otra versión fue promovida."""
+        active = self.registry.active_version()
+        if active is None:
+            return None
+        if self.state is None or active != self.version:
+            if self.pending:
+                logger.warning(
+                    f"Model version {active} promoted, dropping {self.pending} online centroid updates"
+                )
+            self.state = OnlineCentroids.load(self.registry.version_dir(active))
+            self.version = active
+            self.pending = 0
+        return self.state
+
+    async def assign_users(self, db: AsyncIOMotorDatabase, user_ids: Iterable[Any]) -> int:
+        """Asigna cluster a los usuarios dados y actualiza los centroides con ellos.
+
+        Returns:
+            Número de usuarios asignados
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+
+        state = await asyncio.to_thread(self._current_state)
+        if state is None:
+            return 0
+
+        ids, users_features = await feature_store.load_users(db, user_ids)
+        if not ids:
+            return 0
+
+        X_numeric, X_categorical = state.predictor.encode(users_features)
+        labels = state.predictor.predict(X_numeric, X_categorical)
+        state.update(
+            X_numeric, X_categorical, labels,
+            settings.ONLINE_CENTROID_PRIOR_WEIGHT, settings.ONLINE_CENTROID_MIN_LEARNING_RATE
+        )
+
+        # Sólo usuarios que siguen sin cluster: un entrenamiento concurrente tiene prioridad
+        await db.users.bulk_write([
+            UpdateOne({"_id": user_id, "cluster_id": None}, {"$set": {"cluster_id": int(label)}})
+            for user_id, label in zip(ids, labels.tolist())
+        ], ordered=False)
+
+        self.pending += len(ids)
+        if self.pending >= settings.ONLINE_CENTROID_CHECKPOINT_USERS:
+            await self.checkpoint()
+        return len(ids)
+
+    async def checkpoint(self) -> Optional[str]:
+        """Publica los centroides actualizados como versión nueva; retorna su id."""
+        if self.state is None or not self.pending:
+            return None
+
+        version_id = await asyncio.to_thread(self._publish, self.version, self.state)
+        if version_id is None:
+            self.state = None
+        else:
+            self.version = version_id
+        self.pending = 0
+        return version_id
+
+    def _publish(self, base_version: str, state: OnlineCentroids) -> Optional[str]:
+        version = self.registry.begin_version()
+        try:
+            for entry in self.registry.version_dir(base_version).iterdir():
+                if entry.name in (PREDICTOR_ARTIFACT, STATE_ARTIFACT) or entry.name.startswith("."):
+                    continue
+                if entry.is_dir():
+                    shutil.copytree(entry, version.path(entry.name), copy_function=_link_or_copy)
+                else:
+                    _link_or_copy(str(entry), str(version.path(entry.name)))
+
+            state.predictor.save(version.path(PREDICTOR_ARTIFACT))
+            state.save(version.path(STATE_ARTIFACT))
+
+            if self.registry.active_version() != base_version:
+                logger.warning(f"Model version changed during online centroid checkpoint of {base_version}")
+                self.registry.discard(version)
+                return None
+            version_id = self.registry.publish(version, parent=state.trained_version)
+        except BaseException:
+            self.registry.discard(version)
+            raise
+
+        logger.info(
+            f"Online centroids checkpointed as {version_id} "
+            f"({state.n_assigned} users assigned since {state.trained_version})"
+        )
+        return version_id
+
+
+# Instancia global del actualizador
+online_centroids = OnlineCentroidUpdater()
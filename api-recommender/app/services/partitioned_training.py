@@ -0,0 +1,350 @@
+"""Entrenamiento particionado: un K-Prototypes independiente por partición.
+
+Justificación técnica:
+- Un K-Prototypes global escala con toda la población (barrido de k, n_init y
+  silhouette O(n²) por bloques). Con TRAINING_PARTITION_KEY (una columna
+  categórica del pipeline, p. ej. `cluster_region` u `objective`) los usuarios
+  se separan por su valor y cada partición se entrena por separado en procesos
+  worker (ProcessPoolExecutor, contexto spawn: el proceso del servicio tiene
+  threads de motor y APScheduler). El tiempo de entrenamiento pasa a depender
+  de la partición más grande.
+- El pipeline (scaler, vocabularios, regiones) se ajusta una sola vez para
+  todos: las particiones comparten espacio de features y el predictor, el
+  índice de vecinos y las listas top-N funcionan igual que con un modelo global.
+- Ids con espacio de nombres por rango: la partición p ocupa los cluster_id
+  [offset_p, offset_p + k_p), contiguos en el orden de las particiones, así
+  los arrays por cluster (perfiles, listas top-N, cold-start) siguen
+  indexándose por cluster_id. training_history y el manifest de kprototypes
+  guardan el rango, los valores y las métricas de cada partición.
+- Valores con menos de TRAINING_PARTITION_MIN_USERS usuarios se agrupan en una
+  partición común, para no ajustar modelos sobre unas decenas de puntos.
+- El predictor guarda la partición y el gamma de cada centroide: un usuario
+  sólo se asigna entre los clusters de su partición, con el costo de ese modelo.
+- Cada partición se guarda además como artefacto propio
+  (`partitions/p<i>/kprototypes` dentro de la versión) y el warm start se
+  reparte por partición, así que los ids locales se mantienen entre versiones.
+- Silhouette y Davies-Bouldin del modelo son los promedios de las particiones
+  ponderados por tamaño (la silhouette global volvería a ser O(n²)).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.artifacts import save_artifact
+from app.core.config import settings
+from app.services.cluster_predictor import ClusterPredictor
+from app.services.clustering_service import ClusteringService, WarmStart
+from app.services.feature_pipeline import FeaturePipeline
+
+logger = logging.getLogger(__name__)
+
+# Subdirectorio de la versión con los modelos de cada partición
+PARTITIONS_DIR = "partitions"
+
+
+class Partition:
+    """Filas de entrenamiento que comparten valor(es) de la columna de partición."""
+
+    def __init__(self, index: int, codes: List[int], values: List[Any], rows: np.ndarray):
+        self.index = index
+        self.codes = codes
+        self.values = values
+        self.rows = rows
+
+    @property
+    def name(self) -> str:
+        return "+".join(str(value) for value in self.values)
+
+
+def _plain(value: Any) -> Any:
+    """Valor de vocabulario serializable a JSON (los códigos de región pueden venir como np.int64)."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def plan_partitions(codes: np.ndarray, vocabulary: List[Any], min_users: int) -> List[Partition]:
+    """Agrupa las filas por código de la columna de partición.
+
+    Cada código con al menos min_users filas es una partición; el resto se
+    junta en una partición común, que se suma a la partición más chica si no
+    llega a min_users por sí misma.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    unique, counts = np.unique(codes, return_counts=True)
+    groups = [[int(code)] for code, count in zip(unique, counts) if count >= min_users]
+    pooled = [int(code) for code, count in zip(unique, counts) if count < min_users]
+
+    if pooled:
+        if not groups or counts[np.isin(unique, pooled)].sum() >= min_users:
+            groups.append(pooled)
+        else:
+            sizes = [counts[np.isin(unique, group)].sum() for group in groups]
+            groups[int(np.argmin(sizes))].extend(pooled)
+
+    return [
+        Partition(
+            index=index,
+            codes=sorted(group),
+            values=[_plain(vocabulary[code]) for code in sorted(group)],
+            rows=np.flatnonzero(np.isin(codes, group))
+        )
+        for index, group in enumerate(groups)
+    ]
+
+
+def split_warm_start(
+    warm_start: Optional[WarmStart],
+    partitions: List[Partition],
+    key_column: int,
+    previous_partitions: Optional[List[Dict[str, Any]]] = None
+) -> Dict[int, WarmStart]:
+    """Centroides anteriores de cada partición, por su valor en la columna de partición.
+
+    La silhouette de referencia es la de la partición anterior con los mismos
+    valores; sin ella el warm start conserva el k anterior.
+    """
+    if warm_start is None:
+        return {}
+
+    silhouettes = {
+        tuple(previous["values"]): previous.get("silhouette_score")
+        for previous in previous_partitions or []
+    }
+    split = {}
+    for partition in partitions:
+        mask = np.isin(warm_start.centroids_categorical[:, key_column], partition.codes)
+        if not mask.any():
+            continue
+        split[partition.index] = WarmStart(
+            warm_start.centroids_numeric[mask],
+            warm_start.centroids_categorical[mask],
+            silhouette=silhouettes.get(tuple(partition.values)),
+            version=warm_start.version
+        )
+    return split
+
+
+def train_partition(
+    X_numeric: np.ndarray,
+    X_categorical: np.ndarray,
+    user_ids: List[str],
+    warm_start: Optional[WarmStart],
+    artifact_dir: Path
+) -> Dict[str, Any]:
+    """Entrena una partición (se ejecuta en un proceso worker).
+
+    Retorna el resultado de ClusteringService.train con las etiquetas como
+    array (en el orden de user_ids) y el gamma del modelo.
+    """
+    clustering = ClusteringService(artifact_dir=artifact_dir)
+    result = clustering.train(X_numeric, X_categorical, user_ids, warm_start=warm_start)
+    assignments = result.pop('cluster_assignments')
+    result['labels'] = np.fromiter(assignments.values(), dtype=np.int64, count=len(user_ids))
+    result['gamma'] = float(clustering.gamma)
+    return result
+
+
+async def train_partitions(
+    X_numeric: np.ndarray,
+    X_categorical: np.ndarray,
+    user_ids: List[str],
+    partitions: List[Partition],
+    warm_starts: Dict[int, WarmStart],
+    staging_dir: Path
+) -> List[Dict[str, Any]]:
+    """Entrena todas las particiones; con más de un worker, en procesos separados.
+
+    Las particiones se envían de la más grande a la más chica para que la
+    más lenta empiece primero. Retorna los resultados en el orden de partitions.
+    """
+    jobs = [
+        (
+            X_numeric[partition.rows],
+            X_categorical[partition.rows],
+            [user_ids[row] for row in partition.rows],
+            warm_starts.get(partition.index),
+            Path(staging_dir) / PARTITIONS_DIR / f"p{partition.index}"
+        )
+        for partition in partitions
+    ]
+    workers = min(settings.TRAINING_PARTITION_WORKERS or os.cpu_count() or 1, len(jobs))
+    logger.info(
+        f"Training {len(partitions)} partitions "
+        f"(sizes {[len(partition.rows) for partition in partitions]}) with {workers} workers"
+    )
+
+    if workers <= 1:
+        return [train_partition(*job) for job in jobs]
+
+    order = sorted(range(len(jobs)), key=lambda i: len(partitions[i].rows), reverse=True)
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, train_partition, *jobs[i]) for i in order
+        ))
+    by_index = dict(zip(order, results))
+    return [by_index[i] for i in range(len(jobs))]
+
+
+def merge_partitions(
+    partitions: List[Partition],
+    results: List[Dict[str, Any]],
+    X_numeric: np.ndarray,
+    user_ids: List[str],
+    partition_key: str
+) -> Dict[str, Any]:
+    """Une los modelos por partición en un resultado con la forma de ClusteringService.train.
+
+    Los cluster_id locales de la partición p se desplazan a offset_p + id.
+    """
+    labels = np.empty(len(user_ids), dtype=np.int64)
+    metadata: Dict[str, Any] = {
+        'cluster_sizes': {}, 'centroids_numeric': [], 'centroids_categorical': [],
+        'feature_means': [], 'feature_stds': [],
+    }
+    summaries, gammas, centroid_partitions = [], [], []
+    offset = 0
+
+    for partition, result in zip(partitions, results):
+        k = result['metrics']['n_clusters']
+        labels[partition.rows] = result['labels'] + offset
+        partition_metadata = result['cluster_metadata']
+        for cluster_id, size in partition_metadata['cluster_sizes'].items():
+            metadata['cluster_sizes'][offset + int(cluster_id)] = size
+        for key in ('centroids_numeric', 'centroids_categorical', 'feature_means', 'feature_stds'):
+            metadata[key].extend(partition_metadata[key])
+
+        gammas.extend([result['gamma']] * k)
+        centroid_partitions.extend([partition.index] * k)
+        summaries.append({
+            "index": partition.index,
+            "name": partition.name,
+            "values": partition.values,
+            "offset": offset,
+            "n_clusters": k,
+            "n_samples": len(partition.rows),
+            "silhouette_score": result['metrics']['silhouette_score'],
+            "davies_bouldin": result['metrics']['davies_bouldin'],
+            "gamma": result['gamma'],
+            "warm_start": result['metrics']['warm_start'],
+            "phases": result['timings']['phases'],
+        })
+        offset += k
+
+    weights = np.array([summary['n_samples'] for summary in summaries], dtype=np.float64)
+
+    def weighted(name: str) -> float:
+        return float(np.average([summary[name] for summary in summaries], weights=weights))
+
+    metrics = {
+        'silhouette_score': weighted('silhouette_score'),
+        'silhouette_metric': 'kprototypes',
+        'davies_bouldin': weighted('davies_bouldin'),
+        'n_clusters': offset,
+        'n_samples': len(user_ids),
+        'cost': float(sum(result['metrics']['cost'] for result in results)),
+        'warm_start': any(result['metrics']['warm_start'] for result in results),
+    }
+
+    return {
+        'cluster_assignments': {user_id: int(label) for user_id, label in zip(user_ids, labels)},
+        'labels': labels,
+        'metrics': metrics,
+        'cluster_metadata': metadata,
+        'trained_at': datetime.now().isoformat(),
+        'timings': {'phases': {}, 'partitions': [summary['phases'] for summary in summaries]},
+        # Mismo gamma por defecto que K-Prototypes, sobre toda la población (índice de vecinos)
+        'gamma': 0.5 * float(np.mean(X_numeric.std(axis=0))),
+        'centroid_gammas': np.asarray(gammas, dtype=np.float64),
+        'centroid_partitions': np.asarray(centroid_partitions, dtype=np.int64),
+        'partition_key': partition_key,
+        'partitions': summaries,
+    }
+
+
+async def train_partitioned(
+    pipeline: FeaturePipeline,
+    X_numeric: np.ndarray,
+    X_categorical: np.ndarray,
+    user_ids: List[str],
+    staging_dir: Path,
+    warm_start: Optional[WarmStart] = None,
+    previous_partitions: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Particiona por TRAINING_PARTITION_KEY, entrena cada partición y une los resultados."""
+    partition_key = settings.TRAINING_PARTITION_KEY
+    if partition_key not in pipeline.feature_names_categorical:
+        raise ValueError(
+            f"Unknown partition key '{partition_key}'. "
+            f"Valid: {pipeline.feature_names_categorical}"
+        )
+    key_column = pipeline.feature_names_categorical.index(partition_key)
+
+    partitions = plan_partitions(
+        X_categorical[:, key_column],
+        pipeline.category_vocabularies[partition_key],
+        settings.TRAINING_PARTITION_MIN_USERS
+    )
+    warm_starts = split_warm_start(warm_start, partitions, key_column, previous_partitions)
+    results = await train_partitions(X_numeric, X_categorical, user_ids, partitions, warm_starts, staging_dir)
+
+    merged = merge_partitions(partitions, results, X_numeric, user_ids, partition_key)
+    merged['partition_of_code'] = partition_of_code(partitions, len(pipeline.category_vocabularies[partition_key]))
+    logger.info(
+        f"Partitioned training completed: {len(partitions)} partitions, "
+        f"{merged['metrics']['n_clusters']} clusters"
+    )
+    return merged
+
+
+def partition_of_code(partitions: List[Partition], n_codes: int) -> np.ndarray:
+    """Partición de cada código de la columna (-1 para códigos sin filas de entrenamiento)."""
+    mapping = np.full(n_codes, -1, dtype=np.int64)
+    for partition in partitions:
+        for code in partition.codes:
+            if 0 <= code < n_codes:
+                mapping[code] = partition.index
+    return mapping
+
+
+def partitioned_predictor(pipeline: FeaturePipeline, merged: Dict[str, Any]) -> ClusterPredictor:
+    """Predictor NumPy del modelo particionado."""
+    metadata = merged['cluster_metadata']
+    return ClusterPredictor.from_centroids(
+        pipeline,
+        np.asarray(metadata['centroids_numeric'], dtype=np.float64),
+        np.asarray(metadata['centroids_categorical'], dtype=np.int64),
+        merged['gamma'],
+        partition_key=merged['partition_key'],
+        partition_of_code=merged['partition_of_code'],
+        centroid_partitions=merged['centroid_partitions'],
+        centroid_gammas=merged['centroid_gammas']
+    )
+
+
+def save_merged_model(path: Path, merged: Dict[str, Any]):
+    """Guarda el modelo unido con el formato de ClusteringService.save_model (+ particiones)."""
+    metadata = merged['cluster_metadata']
+    save_artifact(path, {
+        'centroids_numeric': np.asarray(metadata['centroids_numeric'], dtype=np.float64),
+        'centroids_categorical': np.asarray(metadata['centroids_categorical'], dtype=np.int64),
+    }, metadata={
+        'kind': 'kprototypes',
+        'n_clusters': merged['metrics']['n_clusters'],
+        'gamma': merged['gamma'],
+        'cluster_metadata': {
+            key: value for key, value in metadata.items()
+            if key not in ('centroids_numeric', 'centroids_categorical')
+        },
+        'trained_at': merged['trained_at'],
+        'metrics': merged['metrics'],
+        'timings': merged['timings'],
+        'partition_key': merged['partition_key'],
+        'partitions': merged['partitions'],
+    })
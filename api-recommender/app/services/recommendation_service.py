@@ -1,110 +1,472 @@
 """Servicio de generación de recomendaciones."""
+import asyncio
+import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.services.feature_pipeline import FeaturePipeline
+from app.core.config import settings
+from app.core.metrics import observe_phase, record_cache
+from app.core.microbatch import MicroBatcher
+from app.core.singleflight import SingleFlight
+from app.services.cluster_recommendations import merge_neighbor_entries, rank_candidates, rank_for_user
+from app.services.cold_start_index import cold_start_index
+from app.services.neighbor_index import neighbor_index_store
 from app.services.notifications_client import notifications_client
+from app.services.training_cache import training_history_cache
+from app.services.user_features import extract_user_features
 
 logger = logging.getLogger(__name__)
 
 
+# Requests concurrentes idénticos comparten una sola ejecución
+user_recommendations_flight = SingleFlight("user_recommendations")
+cluster_candidates_flight = SingleFlight("cluster_candidates")
+
+
 async def get_recommendations_for_user(
     db: AsyncIOMotorDatabase,
     user_id: str,
     limit: int = 10
 ) -> Dict[str, Any]:
-    """Genera recomendaciones de huertos para un usuario."""
-    # Obtener usuario
-    user = await db.users.find_one({"_id": user_id})
-    if not user:
-        raise ValueError(f"User {user_id} not found")
+    """Genera recomendaciones de huertos para un usuario.
+
+    Sirve desde la lista top-N precalculada del cluster (cluster_recommendations)
+    más los huertos de sus vecinos cercanos (índice IVF), y sólo re-rankea esos
+    candidatos con señales personales. Si aún no existe la lista (antes del
+    primer entrenamiento) escanea el cluster completo. Usuarios sin cluster_id
+    se sirven desde el índice cold-start.
+
+    Requests concurrentes del mismo usuario y limit comparten el resultado, y
+    los de un mismo cluster comparten la carga de candidatos (singleflight).
+    """
+    return await user_recommendations_flight.do(
+        (user_id, limit), lambda: _recommendations_for_user(db, user_id, limit)
+    )
+
+
+async def _recommendations_for_user(db: AsyncIOMotorDatabase, user_id: str, limit: int) -> Dict[str, Any]:
+    with observe_phase("user_lookup"):
+        # Obtener usuario
+        user = await db.users.find_one({"_id": user_id})
+        if not user:
+            raise ValueError(f"User {user_id} not found")
+
+        # Orchards propios (excluirlos y señal de objetivo)
+        user_orchards = await db.orchards.find({"userId": user_id}).to_list(length=None)
 
     cluster_id = user.get("cluster_id")
     if cluster_id is None:
+        # Usuario aún no entrenado: índice cold-start por región y experiencia
+        features = extract_user_features(user, user_orchards)
+        recommendations = await _rank_cold_start(
+            db, user, user_orchards, limit, features.get("latitude"), features.get("longitude")
+        )
+        if recommendations is not None:
+            return _response(user_id, None, recommendations)
+
         logger.warning(f"User {user_id} has no cluster_id assigned")
         cluster_id = 0
 
-    # Obtener orchards del mismo cluster (excluyendo los del usuario)
-    cluster_users_cursor = db.users.find({"cluster_id": cluster_id})
-    cluster_users = await cluster_users_cursor.to_list(length=None)
-    cluster_user_ids = [str(u['_id']) for u in cluster_users if str(u['_id']) != user_id]
+    with observe_phase("candidate_fetch"):
+        entries = await cluster_candidates_flight.do(cluster_id, lambda: _cluster_candidates(db, cluster_id))
+        neighbor_entries = await _rank_neighbor_candidates(db, user_id, cluster_id)
 
-    # Obtener orchards candidatos
-    orchards_cursor = db.orchards.find({
-        "userId": {"$in": cluster_user_ids},
-        "state": True
-    })
-    candidate_orchards = await orchards_cursor.to_list(length=None)
+    with observe_phase("scoring"):
+        if neighbor_entries:
+            entries = merge_neighbor_entries(entries, neighbor_entries)
+        recommendations = rank_for_user(entries, user, user_orchards, limit)
 
-    if not candidate_orchards:
-        return {
-            "userId": user_id,
-            "clusterIdAssigned": cluster_id,
-            "recommendations": [],
-            "generatedAt": datetime.now()
-        }
+    return _response(user_id, cluster_id, recommendations)
+
+
+async def get_cold_start_recommendations(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    experience_level: Optional[int] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    limit: int = 10
+) -> Optional[Dict[str, Any]]:
+    """Recomendaciones para un usuario recién registrado desde el índice cold-start.
 
-    # Calcular scores (simplificado - en producción usar embeddings)
-    recommendations = []
-    for orchard in candidate_orchards[:limit]:
-        score = np.random.random()  # Placeholder - implementar similarity real
+    Con experience_level (del webhook) no consulta la BD. Retorna None si no
+    hay índice o si el usuario ya tiene cluster (usar get_recommendations_for_user).
+    """
+    user = {"_id": user_id, "experience_level": experience_level}
+    if experience_level is None:
+        user = await db.users.find_one({"_id": user_id}, projection={"experience_level": 1, "cluster_id": 1})
+        if not user:
+            raise ValueError(f"User {user_id} not found")
+        if user.get("cluster_id") is not None:
+            return None
 
-        recommendations.append({
-            "orchardId": str(orchard['_id']),
-            "name": orchard.get("name", "Huerto sin nombre"),
-            "shortDescription": orchard.get("description", "")[:100],
-            "estimatedWeeklyWater": orchard.get("width", 1) * orchard.get("height", 1) * 60,
-            "maintenanceMinutes": orchard.get("countPlants", 5) * 15,
-            "fitness": 0.85,  # Placeholder
-            "score": float(score)
-        })
+    recommendations = await _rank_cold_start(db, user, [], limit, latitude, longitude)
+    return _response(user_id, None, recommendations) if recommendations is not None else None
 
-    # Ordenar por score
-    recommendations.sort(key=lambda x: x['score'], reverse=True)
 
+async def _rank_cold_start(
+    db: AsyncIOMotorDatabase,
+    user: Dict[str, Any],
+    user_orchards: List[Dict[str, Any]],
+    limit: int,
+    latitude: Optional[float],
+    longitude: Optional[float]
+) -> Optional[List[Dict[str, Any]]]:
+    """Re-ranking personal de las entradas del bucket del usuario (None sin índice)."""
+    if not settings.COLD_START_INDEX_ENABLED:
+        return None
+
+    with observe_phase("candidate_fetch"):
+        entries = await cold_start_index.get_entries(db, user.get("experience_level"), latitude, longitude)
+    if entries is None:
+        return None
+
+    with observe_phase("scoring"):
+        return rank_for_user(entries, user, user_orchards, limit)
+
+
+def _response(user_id: str, cluster_id: Optional[int], recommendations: List[Dict[str, Any]]) -> Dict[str, Any]:
     return {
         "userId": user_id,
         "clusterIdAssigned": cluster_id,
-        "recommendations": recommendations[:limit],
+        "recommendations": recommendations,
         "generatedAt": datetime.now()
     }
 
 
-async def handle_user_registered(db: AsyncIOMotorDatabase, user_id: str):
+async def get_recommendations_for_users(
+    db: AsyncIOMotorDatabase,
+    user_ids: List[str],
+    limit: int = 10
+) -> Dict[str, Any]:
+    """Recomendaciones para varios usuarios en un solo request.
+
+    Los usuarios se resuelven concurrentemente; los inexistentes se reportan en
+    notFound en lugar de fallar todo el batch.
+    """
+    unique_ids = list(dict.fromkeys(user_ids))
+    outcomes = await asyncio.gather(
+        *(get_recommendations_for_user(db, user_id, limit=limit) for user_id in unique_ids),
+        return_exceptions=True
+    )
+
+    results = []
+    not_found = []
+    for user_id, outcome in zip(unique_ids, outcomes):
+        if isinstance(outcome, ValueError):
+            not_found.append(user_id)
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            results.append(outcome)
+
+    return {"results": results, "notFound": not_found}
+
+
+async def _cluster_profiles(db: AsyncIOMotorDatabase, cluster_id: int) -> Optional[Dict[str, Any]]:
+    """Perfiles del último entrenamiento si incluyen al cluster."""
+    last_training = await training_history_cache.get_latest(db)
+    profiles = last_training.get("cluster_profiles") if last_training else None
+    if profiles and cluster_id >= len(profiles.get("feature_means", [])):
+        return None
+    return profiles
+
+
+async def _rank_neighbor_candidates(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    cluster_id: int
+) -> List[Dict[str, Any]]:
+    """Huertos de los vecinos más cercanos del usuario (vacío sin índice)."""
+    if not settings.NEIGHBOR_INDEX_ENABLED:
+        return []
+
+    index = neighbor_index_store.get()
+    if index is None:
+        return []
+
+    neighbor_ids = index.neighbors_of_user(user_id, settings.NEIGHBOR_K)
+    if not neighbor_ids:
+        return []
+
+    orchards_cursor = db.orchards.find({"userId": {"$in": neighbor_ids}, "state": True})
+    orchards = await orchards_cursor.to_list(length=None)
+    profiles = await _cluster_profiles(db, cluster_id)
+    return rank_candidates(orchards, profiles, cluster_id, top_n=settings.CLUSTER_TOP_N)
+
+
+async def _rank_neighbor_candidates_many(
+    db: AsyncIOMotorDatabase,
+    users: List[Tuple[str, int]]
+) -> List[List[Dict[str, Any]]]:
+    """_rank_neighbor_candidates para varios (user_id, cluster) con una sola lectura de huertos."""
+    if not settings.NEIGHBOR_INDEX_ENABLED:
+        return [[] for _ in users]
+
+    index = neighbor_index_store.get()
+    if index is None:
+        return [[] for _ in users]
+
+    neighbor_ids = [index.neighbors_of_user(user_id, settings.NEIGHBOR_K) for user_id, _ in users]
+    wanted = list({neighbor for ids in neighbor_ids for neighbor in ids})
+    if not wanted:
+        return [[] for _ in users]
+
+    orchards_by_user: Dict[str, List[Dict[str, Any]]] = {}
+    async for orchard in db.orchards.find({"userId": {"$in": wanted}, "state": True}):
+        orchards_by_user.setdefault(orchard["userId"], []).append(orchard)
+    profiles = {cluster_id: await _cluster_profiles(db, cluster_id) for cluster_id in {c for _, c in users}}
+
+    return [
+        rank_candidates(
+            [orchard for neighbor in ids for orchard in orchards_by_user.get(neighbor, [])],
+            profiles[cluster_id], cluster_id, top_n=settings.CLUSTER_TOP_N
+        ) if ids else []
+        for (_, cluster_id), ids in zip(users, neighbor_ids)
+    ]
+
+
+async def _cluster_candidates(db: AsyncIOMotorDatabase, cluster_id: int) -> List[Dict[str, Any]]:
+    """Lista top-N del cluster; sin lista precalculada, ranking completo del cluster."""
+    cluster_doc = await db.cluster_recommendations.find_one({"_id": cluster_id})
+    record_cache("cluster_recommendations", hit=cluster_doc is not None)
+    if cluster_doc is not None:
+        return cluster_doc.get("orchards", [])
+    return await _rank_cluster_candidates(db, cluster_id, settings.CLUSTER_TOP_N)
+
+
+async def _rank_cluster_candidates(
+    db: AsyncIOMotorDatabase,
+    cluster_id: int,
+    top_n: int
+) -> List[Dict[str, Any]]:
+    """Ranking completo del cluster cuando no hay lista precalculada.
+
+    No depende del usuario (rank_for_user excluye sus huertos), así lo comparten
+    todos los requests concurrentes del cluster.
+    """
+    cluster_users_cursor = db.users.find({"cluster_id": cluster_id}, projection={"_id": 1})
+    cluster_user_ids = [str(u['_id']) async for u in cluster_users_cursor]
+
+    # Obtener orchards candidatos
+    orchards_cursor = db.orchards.find({
+        "userId": {"$in": cluster_user_ids},
+        "state": True
+    })
+    candidate_orchards = await orchards_cursor.to_list(length=None)
+
+    profiles = await _cluster_profiles(db, cluster_id)
+    return rank_candidates(candidate_orchards, profiles, cluster_id, top_n=top_n)
+
+
+async def handle_user_registered(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    experience_level: Optional[int] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None
+):
     """Maneja webhook de usuario recién registrado."""
     logger.info(f"Handling new user registered: {user_id}")
 
-    # Obtener recomendaciones inmediatas
-    recommendations = await get_recommendations_for_user(db, user_id, limit=3)
+    # Obtener recomendaciones inmediatas (índice cold-start; sin índice, el camino por cluster)
+    recommendations = await get_cold_start_recommendations(
+        db, user_id, experience_level, latitude, longitude, limit=3
+    )
+    if recommendations is None:
+        recommendations = await get_recommendations_for_user(db, user_id, limit=3)
 
     # Enviar notificación al usuario
     if recommendations['recommendations']:
-        try:
-            top_recommendations = recommendations['recommendations'][:3]
-            orchard_names = ", ".join([r['name'] for r in top_recommendations])
-
-            await notifications_client.send_to_user(
-                user_id=user_id,
-                title="¡Bienvenido a PlantGen! 🌱",
-                body=f"Descubre estos huertos recomendados para ti: {orchard_names}",
-                data={
-                    "type": "new_user_recommendations",
-                    "recommendations": top_recommendations
-                }
-            )
-            logger.info(f"Notification sent to new user {user_id}")
-        except Exception as e:
-            logger.error(f"Failed to send notification to user {user_id}: {e}")
+        await _send_welcome_notification(user_id, recommendations['recommendations'][:3])
 
     logger.info(f"Generated {len(recommendations['recommendations'])} recommendations for new user {user_id}")
 
     return recommendations
 
 
+async def submit_user_registered(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    experience_level: Optional[int] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None
+) -> Dict[str, Any]:
+    """Webhook de registro: se une al micro-batch abierto (o se atiende solo sin WEBHOOK_BATCHING)."""
+    if not settings.WEBHOOK_BATCHING:
+        return await handle_user_registered(db, user_id, experience_level, latitude, longitude)
+
+    return await user_registered_batcher.submit(db, {
+        "user_id": user_id,
+        "experience_level": experience_level,
+        "latitude": latitude,
+        "longitude": longitude
+    })
+
+
+async def handle_users_registered(
+    db: AsyncIOMotorDatabase,
+    registrations: List[Dict[str, Any]]
+) -> List[Union[Dict[str, Any], BaseException]]:
+    """Maneja un batch de webhooks de registro; un resultado (o excepción) por registro.
+
+    Mismas recomendaciones que handle_user_registered, pero con una sola lectura
+    de usuarios y otra de sus huertos, un lookup del índice cold-start para todo
+    el batch (regiones en un solo cálculo de distancias), los candidatos de cada
+    cluster cargados una vez y un solo envío de notificaciones con un mensaje
+    por grupo de usuarios que reciben las mismas recomendaciones.
+    """
+    results: List[Any] = [None] * len(registrations)
+
+    with observe_phase("user_lookup"):
+        user_ids = list({r["user_id"] for r in registrations})
+        cursor = db.users.find({"_id": {"$in": user_ids}})
+        stored = {str(user["_id"]): user async for user in cursor}
+
+    cold_start = []
+    by_cluster = []
+    for position, registration in enumerate(registrations):
+        user_id = registration["user_id"]
+        user = stored.get(user_id)
+        if registration.get("experience_level") is not None:
+            # Como el camino por request: con el nivel del webhook no hace falta el documento
+            cold_start.append((position, {"_id": user_id, "experience_level": registration["experience_level"]}))
+        elif user is None:
+            results[position] = ValueError(f"User {user_id} not found")
+        elif user.get("cluster_id") is not None:
+            by_cluster.append((position, user, user["cluster_id"]))
+        else:
+            cold_start.append((position, user))
+
+    buckets = None
+    if cold_start and settings.COLD_START_INDEX_ENABLED:
+        with observe_phase("candidate_fetch"):
+            buckets = await cold_start_index.get_entries_many(
+                db,
+                [user.get("experience_level") for _, user in cold_start],
+                [(registrations[p].get("latitude"), registrations[p].get("longitude")) for p, _ in cold_start]
+            )
+
+    with observe_phase("scoring"):
+        for row, (position, user) in enumerate(cold_start):
+            entries = buckets[row] if buckets is not None else None
+            if entries is not None:
+                results[position] = _response(str(user["_id"]), None, rank_for_user(entries, user, [], 3))
+                continue
+            # Sin índice: camino por cluster (cluster 0 si aún no fue entrenado)
+            user_id = registrations[position]["user_id"]
+            user = stored.get(user_id)
+            if user is None:
+                results[position] = ValueError(f"User {user_id} not found")
+            else:
+                cluster_id = user.get("cluster_id")
+                by_cluster.append((position, user, cluster_id if cluster_id is not None else 0))
+
+    if by_cluster:
+        await _rank_cluster_users(db, by_cluster, results)
+
+    # Un solo envío: un mensaje por grupo de usuarios con las mismas recomendaciones
+    groups: Dict[str, Tuple[List[str], List[Dict[str, Any]]]] = {}
+    for result in results:
+        if isinstance(result, dict) and result['recommendations']:
+            top_recommendations = result['recommendations'][:3]
+            key = json.dumps(top_recommendations, sort_keys=True)
+            group_ids, _ = groups.setdefault(key, ([], top_recommendations))
+            if result['userId'] not in group_ids:
+                group_ids.append(result['userId'])
+    if groups:
+        await _send_welcome_notifications(list(groups.values()))
+
+    logger.info(
+        f"Handled {len(registrations)} user registrations in one batch "
+        f"({len(groups)} notification groups)"
+    )
+    return results
+
+
+async def _rank_cluster_users(
+    db: AsyncIOMotorDatabase,
+    by_cluster: List[Tuple[int, Dict[str, Any], int]],
+    results: List[Any]
+):
+    """Camino por cluster de un batch: (posición, usuario, cluster) -> results[posición].
+
+    Una lectura de huertos propios para todos, candidatos una vez por cluster
+    (compartidos con los requests concurrentes vía singleflight) y una lectura
+    de huertos de vecinos para todo el batch.
+    """
+    with observe_phase("user_lookup"):
+        cursor = db.orchards.find({"userId": {"$in": list({str(user["_id"]) for _, user, _ in by_cluster})}})
+        orchards_by_user: Dict[str, List[Dict[str, Any]]] = {}
+        async for orchard in cursor:
+            orchards_by_user.setdefault(orchard["userId"], []).append(orchard)
+
+    clusters = sorted({cluster_id for _, _, cluster_id in by_cluster})
+    with observe_phase("candidate_fetch"):
+        loaded = await asyncio.gather(*(
+            cluster_candidates_flight.do(cluster_id, lambda cluster_id=cluster_id: _cluster_candidates(db, cluster_id))
+            for cluster_id in clusters
+        ), return_exceptions=True)
+        candidates = dict(zip(clusters, loaded))
+        neighbor_entries = await _rank_neighbor_candidates_many(
+            db, [(str(user["_id"]), cluster_id) for _, user, cluster_id in by_cluster]
+        )
+
+    with observe_phase("scoring"):
+        for (position, user, cluster_id), neighbors in zip(by_cluster, neighbor_entries):
+            entries = candidates[cluster_id]
+            if isinstance(entries, BaseException):
+                results[position] = entries
+                continue
+            if neighbors:
+                entries = merge_neighbor_entries(entries, neighbors)
+            user_id = str(user["_id"])
+            recommendations = rank_for_user(entries, user, orchards_by_user.get(user_id, []), 3)
+            results[position] = _response(user_id, cluster_id, recommendations)
+
+
+def _welcome_message(top_recommendations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    orchard_names = ", ".join([r['name'] for r in top_recommendations])
+    return {
+        "title": "¡Bienvenido a PlantGen! 🌱",
+        "body": f"Descubre estos huertos recomendados para ti: {orchard_names}",
+        "data": {
+            "type": "new_user_recommendations",
+            "recommendations": top_recommendations
+        }
+    }
+
+
+async def _send_welcome_notification(user_id: str, top_recommendations: List[Dict[str, Any]]):
+    """Notificación de bienvenida a un usuario."""
+    try:
+        await notifications_client.send_to_user(user_id=user_id, **_welcome_message(top_recommendations))
+        logger.info(f"Notification sent to new user {user_id}")
+    except Exception as e:
+        logger.error(f"Failed to send notification to user {user_id}: {e}")
+
+
+async def _send_welcome_notifications(groups: List[Tuple[List[str], List[Dict[str, Any]]]]):
+    """Notificaciones de bienvenida de un batch en un solo envío (un mensaje por grupo)."""
+    notifications = [
+        {"userIds": user_ids, **_welcome_message(top_recommendations)}
+        for user_ids, top_recommendations in groups
+    ]
+    try:
+        await notifications_client.send_batch(notifications)
+        logger.info(f"Notifications sent to {sum(len(ids) for ids, _ in groups)} new users in one batch")
+    except Exception as e:
+        logger.error(f"Failed to send batched notifications to {len(groups)} groups: {e}")
+
+
+# Webhooks de registro concurrentes se procesan en micro-batches
+user_registered_batcher = MicroBatcher(
+    "user_registered", handle_users_registered, settings.WEBHOOK_BATCH_WINDOW_MS, settings.WEBHOOK_MAX_BATCH
+)
+
+
 async def notify_cluster(db: AsyncIOMotorDatabase, cluster_id: int) -> Dict[str, Any]:
     """Envía recomendaciones a todos los usuarios de un cluster."""
     users_cursor = db.users.find({"cluster_id": cluster_id, "tokenFCM": {"$ne": None}})
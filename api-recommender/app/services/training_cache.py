@@ -0,0 +1,84 @@
+"""Caché en memoria del entrenamiento activo registrado en training_history.
+
+Justificación técnica:
+- /status y /clusters se consultan constantemente desde dashboards; ambos sólo
+  necesitan el documento del modelo activo: el de `activated_at` más reciente
+  (un entrenamiento lo fija al insertarse; promover o hacer rollback a una
+  versión lo actualiza en el documento de su entrenamiento).
+- El documento se mantiene en memoria del proceso y se refresca directamente al
+  terminar un entrenamiento en este worker.
+- Otros workers lo revalidan tras TRAINING_CACHE_TTL_SECONDS con una consulta
+  barata (sólo `_id` del último documento); el documento completo únicamente se
+  vuelve a leer cuando la versión cambió.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+_LATEST_SORT = [("activated_at", -1), ("trained_at", -1)]
+
+
+class TrainingHistoryCache:
+    """Mantiene el último documento de training_history en memoria."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._doc: Optional[Dict[str, Any]] = None
+        self._version: Any = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded and (time.monotonic() - self._checked_at) < self.ttl_seconds
+
+    async def get_latest(self, db: AsyncIOMotorDatabase) -> Optional[Dict[str, Any]]:
+        """Retorna el último entrenamiento, consultando la BD sólo si expiró el TTL."""
+        if self._is_fresh():
+            record_cache("training_history", hit=True)
+            return self._doc
+
+        record_cache("training_history", hit=False)
+        async with self._lock:
+            # Otra corrutina pudo revalidar mientras esperábamos el lock
+            if self._is_fresh():
+                return self._doc
+
+            head = await db.training_history.find_one(
+                {}, projection={"_id": 1}, sort=_LATEST_SORT
+            )
+            version = head["_id"] if head else None
+
+            if not self._loaded or version != self._version:
+                self._doc = (
+                    await db.training_history.find_one({"_id": version})
+                    if head else None
+                )
+                self._version = version
+                logger.debug(f"Training history cache reloaded (version={version})")
+
+            self._loaded = True
+            self._checked_at = time.monotonic()
+            return self._doc
+
+    def set_latest(self, doc: Dict[str, Any]):
+        """Actualiza la caché con un entrenamiento recién insertado."""
+        self._doc = doc
+        self._version = doc.get("_id")
+        self._loaded = True
+        self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Fuerza la revalidación en la próxima lectura."""
+        self._checked_at = 0.0
+
+
+# Instancia global de la caché
+training_history_cache = TrainingHistoryCache(settings.TRAINING_CACHE_TTL_SECONDS)
@@ -1,64 +1,157 @@
-"""Servicio de entrenamiento del modelo de clustering."""
+"""Servicio de entrenamiento del modelo de clustering.
+
+El stack de ML (pandas, scikit-learn, kmodes) se importa dentro de
+train_clustering_model: los workers que sólo sirven /status, /clusters y
+recomendaciones no pagan esos imports al arrancar.
+"""
 import logging
-from typing import Dict, Any
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Set, Tuple
 from datetime import datetime
+import numpy as np
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.core.artifacts import ArtifactError, is_artifact, read_manifest, resolve_artifact
+from app.core.config import settings
+from app.core.metrics import TRAINING_PHASE_DURATION, observe_phase
+from app.services.cluster_predictor import ClusterPredictor, cluster_predictor_path, cluster_predictor_store
+from app.services.cluster_recommendations import build_cluster_top_lists
+from app.services.cold_start_index import build_cold_start_index
+from app.services.feature_store import feature_store
+from app.services.location_regions import LocationRegions, location_regions_path
+from app.services.model_registry import model_registry
+from app.services.neighbor_index import UserNeighborIndex, neighbor_index_store
+from app.services.training_cache import training_history_cache
+from app.services.user_features import DEFAULT_LATITUDE, DEFAULT_LONGITUDE, extract_user_features
 
-from app.services.feature_pipeline import FeaturePipeline
-from app.services.clustering_service import ClusteringService
+if TYPE_CHECKING:
+    from app.services.clustering_service import WarmStart
+    from app.services.feature_pipeline import FeaturePipeline
 
 logger = logging.getLogger(__name__)
 
+# Secciones opcionales de /clusters (parámetro include=)
+CLUSTER_INFO_SECTIONS = {"centroids", "scaled", "profiles"}
+
+# Decimales al persistir perfiles (arrays compactos en training_history)
+PROFILE_DECIMALS = 6
+
 
 async def train_clustering_model(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
     """Entrena modelo de clustering con todos los usuarios."""
+    from app.services.clustering_service import ClusteringService
+    from app.services.feature_pipeline import FeaturePipeline
+
     logger.info("Starting clustering training...")
 
-    # Cargar usuarios y orchards
-    users_cursor = db.users.find({})
-    users = await users_cursor.to_list(length=None)
+    # Cargar features por usuario
+    with observe_phase("ingest", TRAINING_PHASE_DURATION):
+        if settings.FEATURE_STORE_ENABLED:
+            user_ids, users_features = await load_users_features_from_store(db)
+        else:
+            user_ids, users_features = await load_users_features_from_source(db)
+
+        if len(user_ids) < 10:
+            raise ValueError("Not enough users for clustering (minimum: 10)")
+
+    # Fit pipeline (las regiones de ubicación del modelo activo se reutilizan si no derivaron)
+    pipeline = FeaturePipeline(previous_location_regions=load_location_regions())
+
+    with observe_phase("extract", TRAINING_PHASE_DURATION):
+        X_numeric, X_categorical = pipeline.fit_transform(users_features)
+
+    warm_start = load_warm_start(pipeline) if settings.TRAINING_WARM_START else None
+
+    # Artefactos de esta versión en staging; se publican juntos al final
+    version = model_registry.begin_version()
+    try:
+        if settings.TRAINING_PARTITION_KEY:
+            # Un K-Prototypes por partición, en procesos worker (ver partitioned_training)
+            from app.services.partitioned_training import (
+                partitioned_predictor, save_merged_model, train_partitioned
+            )
 
-    if len(users) < 10:
-        raise ValueError("Not enough users for clustering (minimum: 10)")
+            with observe_phase("partitioned_fit", TRAINING_PHASE_DURATION):
+                result = await train_partitioned(
+                    pipeline, X_numeric, X_categorical, user_ids, version.staging_dir,
+                    warm_start=warm_start, previous_partitions=load_previous_partitions()
+                )
+                save_merged_model(version.path("kprototypes"), result)
+            gamma = result['gamma']
+        else:
+            # Entrenar clustering (fases k_search, fit, silhouette y save se miden dentro)
+            clustering = ClusteringService(artifact_dir=version.staging_dir)
+            result = clustering.train(X_numeric, X_categorical, user_ids, warm_start=warm_start)
+            gamma = clustering.model.gamma
 
-    # Extraer features
-    pipeline = FeaturePipeline()
-    users_features = []
-    user_ids = []
+        if pipeline.location_regions is not None:
+            pipeline.location_regions.save(version.path("location_regions"))
 
-    for user in users:
-        user_id = str(user['_id'])
-        # Obtener orchards del usuario
-        orchards_cursor = db.orchards.find({"userId": user_id})
-        orchards = await orchards_cursor.to_list(length=None)
+        # Predictor NumPy para asignar clusters sin kmodes al servir
+        with observe_phase("predictor_export", TRAINING_PHASE_DURATION):
+            if settings.TRAINING_PARTITION_KEY:
+                predictor = partitioned_predictor(pipeline, result)
+            else:
+                predictor = ClusterPredictor.from_training(pipeline, clustering.model)
+            predictor.save(version.path("cluster_predictor"))
 
-        features = pipeline.extract_user_features(user, orchards)
-        users_features.append(features)
-        user_ids.append(user_id)
+        # Índice de vecinos cercanos para "usuarios similares"
+        neighbor_index = None
+        if settings.NEIGHBOR_INDEX_ENABLED:
+            with observe_phase("neighbor_index", TRAINING_PHASE_DURATION):
+                neighbor_index = UserNeighborIndex().build(
+                    X_numeric, X_categorical, user_ids, gamma=gamma
+                )
+                neighbor_index.save(version.path("neighbor_index"))
 
-    # Fit pipeline
-    X_numeric, X_categorical = pipeline.fit_transform(users_features)
+        model_registry.publish(version)
+    except BaseException:
+        model_registry.discard(version)
+        raise
 
-    # Entrenar clustering
-    clustering = ClusteringService()
-    result = clustering.train(X_numeric, X_categorical, user_ids)
+    cluster_predictor_store.set(predictor)
+    if neighbor_index is not None:
+        neighbor_index_store.set(neighbor_index)
 
     # Guardar cluster_id en usuarios
     cluster_assignments = result['cluster_assignments']
-    for user_id, cluster_id in cluster_assignments.items():
-        await db.users.update_one(
-            {"_id": user_id},
-            {"$set": {"cluster_id": cluster_id}}
-        )
+    with observe_phase("write_back", TRAINING_PHASE_DURATION):
+        for user_id, cluster_id in cluster_assignments.items():
+            await db.users.update_one(
+                {"_id": user_id},
+                {"$set": {"cluster_id": cluster_id}}
+            )
 
     # Guardar metadata de training
-    await db.training_history.insert_one({
+    training_doc = {
         "trained_at": result['trained_at'],
+        "activated_at": datetime.now().isoformat(),
         "n_clusters": result['metrics']['n_clusters'],
         "n_samples": result['metrics']['n_samples'],
         "silhouette_score": result['metrics']['silhouette_score'],
-        "cluster_sizes": result['cluster_metadata']['cluster_sizes']
-    })
+        "davies_bouldin": result['metrics']['davies_bouldin'],
+        "cluster_sizes": {
+            str(cluster_id): size
+            for cluster_id, size in result['cluster_metadata']['cluster_sizes'].items()
+        },
+        "cluster_profiles": build_cluster_profiles(pipeline, result['cluster_metadata']),
+        "timings": result['timings'],
+        "model_version": version.id,
+        "warm_start_from": warm_start.version if result['metrics']['warm_start'] else None,
+        "location_regions_reused": pipeline.location_regions_reused
+    }
+    if 'partitions' in result:
+        training_doc["partition_key"] = result['partition_key']
+        training_doc["partitions"] = result['partitions']
+    await db.training_history.insert_one(training_doc)
+    training_history_cache.set_latest(training_doc)
+
+    await build_serving_state(
+        db, training_doc, users_features,
+        labels=[cluster_assignments[user_id] for user_id in user_ids],
+        location_regions=pipeline.location_regions
+    )
 
     logger.info(f"Training completed: {result['metrics']['n_clusters']} clusters")
 
@@ -72,11 +165,245 @@ async def train_clustering_model(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
     }
 
 
+async def build_serving_state(
+    db: AsyncIOMotorDatabase,
+    training_doc: Dict[str, Any],
+    users_features: List[Dict[str, Any]],
+    labels: List[int],
+    location_regions: Optional[LocationRegions]
+):
+    """Estado derivado del modelo activo: top-N por cluster e índice cold-start."""
+    # Precalcular top-N por cluster para el hot path de recomendaciones
+    with observe_phase("cluster_top_lists", TRAINING_PHASE_DURATION):
+        await build_cluster_top_lists(
+            db,
+            n_clusters=training_doc['n_clusters'],
+            cluster_profiles=training_doc['cluster_profiles'],
+            top_n=settings.CLUSTER_TOP_N,
+            trained_at=training_doc['trained_at']
+        )
+
+    # Índice cold-start para usuarios sin cluster (mezcla de las listas recién guardadas)
+    if settings.COLD_START_INDEX_ENABLED:
+        with observe_phase("cold_start_index", TRAINING_PHASE_DURATION):
+            await build_cold_start_index(
+                db,
+                regions=user_regions(location_regions, users_features),
+                experience_levels=[f.get('experience_level') for f in users_features],
+                labels=labels,
+                n_clusters=training_doc['n_clusters'],
+                location_centers=location_regions.centers if location_regions is not None else None,
+                top_n=settings.COLD_START_TOP_N,
+                trained_at=training_doc['trained_at']
+            )
+
+
+async def activate_model_version(db: AsyncIOMotorDatabase, version_id: Optional[str] = None) -> str:
+    """Promueve una versión del registro (None: la anterior a la activa) con su estado en Mongo.
+
+    El puntero sólo cambia los artefactos; cluster_id de los usuarios, las
+    listas top-N, el índice cold-start y el entrenamiento que muestran /status
+    y /clusters se recalculan con el predictor de la versión y el documento de
+    training_history de su entrenamiento, que pasa a ser el activo.
+    """
+    if version_id is None:
+        version_id = model_registry.previous_version()
+
+    # Un checkpoint de centroides online usa el documento de su versión entrenada
+    training_doc = await db.training_history.find_one(
+        {"model_version": model_registry.trained_version(version_id)}, sort=[("trained_at", -1)]
+    )
+    if training_doc is None:
+        raise ValueError(f"No training history for model version {version_id}")
+
+    model_registry.promote(version_id)
+    version_dir = model_registry.version_dir(version_id)
+
+    predictor = ClusterPredictor.load(version_dir / "cluster_predictor")
+    cluster_predictor_store.set(predictor)
+    if is_artifact(version_dir / "neighbor_index"):
+        neighbor_index_store.set(UserNeighborIndex.load(version_dir / "neighbor_index"))
+    location_regions = (
+        LocationRegions.load(version_dir / "location_regions")
+        if is_artifact(version_dir / "location_regions") else None
+    )
+
+    with observe_phase("ingest", TRAINING_PHASE_DURATION):
+        if settings.FEATURE_STORE_ENABLED:
+            user_ids, users_features = await load_users_features_from_store(db)
+        else:
+            user_ids, users_features = await load_users_features_from_source(db)
+
+    # Re-asignar a todos los usuarios con los centroides de la versión
+    labels = predictor.predict_features(users_features).tolist() if users_features else []
+    with observe_phase("write_back", TRAINING_PHASE_DURATION):
+        if user_ids:
+            await db.users.bulk_write([
+                UpdateOne({"_id": user_id}, {"$set": {"cluster_id": int(label)}})
+                for user_id, label in zip(user_ids, labels)
+            ], ordered=False)
+
+    training_doc["activated_at"] = datetime.now().isoformat()
+    await db.training_history.update_one(
+        {"_id": training_doc["_id"]}, {"$set": {"activated_at": training_doc["activated_at"]}}
+    )
+    training_history_cache.set_latest(training_doc)
+
+    await build_serving_state(db, training_doc, users_features, labels, location_regions)
+
+    logger.info(f"Model version {version_id} activated: {len(user_ids)} users reassigned")
+    return version_id
+
+
+def load_location_regions() -> Optional[LocationRegions]:
+    """Regiones de ubicación de la versión activa (None si no hay o no se pueden leer)."""
+    path = location_regions_path()
+    if not settings.LOCATION_REGIONS_REUSE or not is_artifact(path):
+        return None
+
+    try:
+        return LocationRegions.load(path)
+    except (OSError, ArtifactError, KeyError) as e:
+        logger.warning(f"Previous location regions unreadable, refitting: {e}")
+        return None
+
+
+def user_regions(
+    location_regions: Optional[LocationRegions],
+    users_features: List[Dict[str, Any]]
+) -> Optional[np.ndarray]:
+    """Región de ubicación de cada usuario entrenado (None sin discretización)."""
+    if location_regions is None:
+        return None
+    locations = np.array([
+        [
+            DEFAULT_LATITUDE if f.get('latitude') is None else f['latitude'],
+            DEFAULT_LONGITUDE if f.get('longitude') is None else f['longitude']
+        ]
+        for f in users_features
+    ], dtype=np.float64)
+    return location_regions.assign(locations)
+
+
+async def load_users_features_from_store(db: AsyncIOMotorDatabase) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Features desde `user_features`: sync por stamps y un scan de filas pequeñas."""
+    if settings.FEATURE_STORE_SYNC_ON_TRAINING or await db[feature_store.collection].estimated_document_count() == 0:
+        await feature_store.sync(db)
+    return await feature_store.load_all(db)
+
+
+async def load_users_features_from_source(db: AsyncIOMotorDatabase) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Features recalculadas desde los documentos completos de users y orchards."""
+    users = await db.users.find({}).to_list(length=None)
+
+    # Un solo scan de orchards agrupado por usuario
+    orchards_by_user = defaultdict(list)
+    async for orchard in db.orchards.find({"userId": {"$ne": None}}):
+        orchards_by_user[orchard['userId']].append(orchard)
+
+    user_ids = [str(user['_id']) for user in users]
+    users_features = [
+        extract_user_features(user, orchards_by_user.get(user_id, []))
+        for user, user_id in zip(users, user_ids)
+    ]
+    return user_ids, users_features
+
+
+def load_warm_start(pipeline: "FeaturePipeline") -> Optional["WarmStart"]:
+    """Centroides del modelo activo proyectados al pipeline recién ajustado.
+
+    Se leen del predictor exportado (trae scaler, vocabularios y centros de
+    ubicación, lo necesario para traducir al espacio nuevo) y la silhouette del
+    manifest de kprototypes de la misma versión. None sin modelo previo o si
+    las features cambiaron.
+    """
+    from app.services.clustering_service import WarmStart
+
+    path = resolve_artifact(cluster_predictor_path())
+    if path is None:
+        return None
+
+    try:
+        previous = ClusterPredictor.load(path)
+    except (OSError, ArtifactError, KeyError) as e:
+        logger.warning(f"Warm start disabled, previous predictor unreadable: {e}")
+        return None
+
+    projected = previous.project_centroids(pipeline)
+    if projected is None:
+        logger.info("Warm start disabled: feature set changed since the previous model")
+        return None
+
+    silhouette = None
+    try:
+        metrics = read_manifest(model_registry.artifact_path("kprototypes"))["metadata"]["metrics"]
+        # Sólo es comparable una silhouette calculada con la misma disimilaridad
+        if metrics.get("silhouette_metric") == "kprototypes":
+            silhouette = metrics["silhouette_score"]
+    except (OSError, ArtifactError, KeyError):
+        logger.info("Previous silhouette unavailable; warm start keeps the previous k")
+
+    version = model_registry.active_version()
+    logger.info(f"Warm start from model {version or 'legacy'} (k={previous.n_clusters})")
+    return WarmStart(*projected, silhouette=silhouette, version=version)
+
+
+def load_previous_partitions() -> Optional[List[Dict[str, Any]]]:
+    """Particiones del modelo activo (valores y silhouette), si se entrenó particionado."""
+    try:
+        metadata = read_manifest(model_registry.artifact_path("kprototypes"))["metadata"]
+    except (OSError, ArtifactError):
+        return None
+    if metadata.get("partition_key") != settings.TRAINING_PARTITION_KEY:
+        return None
+    return metadata.get("partitions")
+
+
+def build_cluster_profiles(pipeline: "FeaturePipeline", cluster_metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Arma los perfiles de cluster (centroides y dispersión) como arrays compactos.
+
+    Los centroides y medias se guardan en unidades originales y los centroides
+    también en espacio escalado, para no depender del modelo al servir /clusters.
+    """
+    centroids_scaled = np.asarray(cluster_metadata['centroids_numeric'], dtype=float)
+    means_scaled = np.asarray(cluster_metadata['feature_means'], dtype=float)
+    stds_scaled = np.asarray(cluster_metadata['feature_stds'], dtype=float)
+
+    def compact(values: np.ndarray) -> list:
+        return np.round(values, PROFILE_DECIMALS).tolist()
+
+    return {
+        "feature_names_numeric": list(pipeline.feature_names_numeric),
+        "feature_names_categorical": list(pipeline.feature_names_categorical),
+        "centroids_numeric": compact(pipeline.inverse_transform_numeric(centroids_scaled)),
+        "centroids_numeric_scaled": compact(centroids_scaled),
+        "centroids_categorical": cluster_metadata['centroids_categorical'],
+        "feature_means": compact(pipeline.inverse_transform_numeric(means_scaled)),
+        "feature_stds": compact(pipeline.inverse_scale_spread(stds_scaled)),
+    }
+
+
+def parse_cluster_include(include: Optional[str]) -> Set[str]:
+    """Parsea el parámetro include= de /clusters (lista separada por comas)."""
+    if not include:
+        return set()
+
+    sections = {part.strip() for part in include.split(",") if part.strip()}
+    if "all" in sections:
+        return set(CLUSTER_INFO_SECTIONS)
+
+    unknown = sections - CLUSTER_INFO_SECTIONS
+    if unknown:
+        raise ValueError(
+            f"Unknown include sections: {sorted(unknown)}. "
+            f"Valid: {sorted(CLUSTER_INFO_SECTIONS)} or 'all'"
+        )
+    return sections
+
+
 async def get_training_status(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
     """Obtiene estado del último entrenamiento."""
-    last_training = await db.training_history.find_one(
-        {}, sort=[("trained_at", -1)]
-    )
+    last_training = await training_history_cache.get_latest(db)
 
     if not last_training:
         return {
@@ -97,30 +424,61 @@ async def get_training_status(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
     }
 
 
-async def get_clusters_info(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
-    """Obtiene información de todos los clusters."""
-    last_training = await db.training_history.find_one(
-        {}, sort=[("trained_at", -1)]
-    )
+async def get_clusters_info(
+    db: AsyncIOMotorDatabase,
+    include: Optional[Set[str]] = None
+) -> Dict[str, Any]:
+    """Obtiene información de todos los clusters.
+
+    Args:
+        db: Base de datos
+        include: Secciones opcionales a incluir ('centroids', 'scaled', 'profiles').
+            Sin secciones sólo se retornan los tamaños.
+    """
+    include = include or set()
+    last_training = await training_history_cache.get_latest(db)
 
     if not last_training:
         return {"n_clusters": 0, "clusters": [], "total_users": 0}
 
     cluster_sizes = last_training.get("cluster_sizes", {})
+    # Entrenamientos anteriores a los perfiles no tienen esta sección
+    profiles = last_training.get("cluster_profiles") if include else None
+    # Modelos particionados: cada partición ocupa [offset, offset + n_clusters)
+    partition_names = {
+        partition["offset"] + local_id: partition["name"]
+        for partition in last_training.get("partitions", [])
+        for local_id in range(partition["n_clusters"])
+    }
     clusters = []
 
     for cluster_id, size in cluster_sizes.items():
-        clusters.append({
-            "cluster_id": int(cluster_id),
-            "size": size,
-            "centroid_numeric": [],  # Cargar desde modelo si es necesario
-            "centroid_categorical": []
-        })
+        cluster_id = int(cluster_id)
+        cluster = {"cluster_id": cluster_id, "size": size}
+        if cluster_id in partition_names:
+            cluster["partition"] = partition_names[cluster_id]
+
+        if profiles:
+            if "centroids" in include:
+                cluster["centroid_numeric"] = profiles["centroids_numeric"][cluster_id]
+                cluster["centroid_categorical"] = profiles["centroids_categorical"][cluster_id]
+            if "scaled" in include:
+                cluster["centroid_numeric_scaled"] = profiles["centroids_numeric_scaled"][cluster_id]
+            if "profiles" in include:
+                cluster["feature_means"] = profiles["feature_means"][cluster_id]
+                cluster["feature_stds"] = profiles["feature_stds"][cluster_id]
+
+        clusters.append(cluster)
 
     total_users = sum(cluster_sizes.values())
 
-    return {
+    clusters_info = {
         "n_clusters": len(clusters),
         "clusters": clusters,
         "total_users": total_users
     }
+    if profiles:
+        clusters_info["feature_names_numeric"] = profiles["feature_names_numeric"]
+        clusters_info["feature_names_categorical"] = profiles["feature_names_categorical"]
+
+    return clusters_info
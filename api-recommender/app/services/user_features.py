@@ -0,0 +1,164 @@
+"""Extracción de features de un usuario a partir de sus documentos crudos.
+
+Sin pandas ni scikit-learn: la usan tanto el entrenamiento (FeaturePipeline)
+como el feature store, que se mantiene desde el proceso que sirve requests.
+"""
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
+
+# Orden de las features numéricas (columnas de X_numeric)
+NUMERIC_FEATURES = [
+    'experience_level', 'count_orchards', 'has_tokenFCM', 'profile_image_present',
+    'account_age_days', 'avg_orchard_area', 'sum_weekly_water_liters',
+    'avg_maintenance_minutes', 'avg_count_plants', 'avg_timeOfLife', 'avg_streak',
+    'avg_plant_diversity', 'pct_vegetable', 'pct_medicinal', 'pct_ornamental',
+    'pct_aromatic'
+]
+
+CATEGORICAL_FEATURES = ['objective']
+
+# Ubicación por defecto de usuarios sin huertos con ubicación
+DEFAULT_LATITUDE = 16.75
+DEFAULT_LONGITUDE = -93.11
+
+
+def account_age_days(created_at: Optional[Union[datetime, str]]) -> int:
+    """Días desde createdAt (0 si falta); depende de la fecha actual, no se persiste."""
+    if created_at is None:
+        return 0
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+    return max(0, (datetime.now() - created_at).days)
+
+
+def extract_user_features(user: Dict[str, Any], orchards: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Extrae features de un usuario y sus orchards.
+
+    Args:
+        user: Documento de usuario desde MongoDB
+        orchards: Lista de orchards del usuario
+
+    Returns:
+        Dict con features numéricas y categóricas
+    """
+    features = {}
+
+    # ===== USER FEATURES =====
+    features['experience_level'] = user.get('experience_level', 2)
+    features['count_orchards'] = len(orchards)
+    features['has_tokenFCM'] = 1 if user.get('tokenFCM') else 0
+    features['profile_image_present'] = 1 if user.get('profile_image') else 0
+
+    # Account age in days
+    features['account_age_days'] = account_age_days(user.get('createdAt'))
+
+    # ===== AGGREGATE ORCHARD FEATURES =====
+    if orchards:
+        # Área promedio
+        areas = []
+        for orchard in orchards:
+            # Priorizar totalArea, fallback a width*height
+            if 'layout' in orchard and 'dimensions' in orchard['layout']:
+                area = orchard['layout']['dimensions'].get('totalArea')
+                if not area:
+                    w = orchard.get('width', 0)
+                    h = orchard.get('height', 0)
+                    area = w * h
+            else:
+                area = orchard.get('width', 0) * orchard.get('height', 0)
+            areas.append(area)
+
+        features['avg_orchard_area'] = np.mean(areas) if areas else 0
+
+        # Agua semanal total
+        water = []
+        for orchard in orchards:
+            if 'estimations' in orchard:
+                water.append(orchard['estimations'].get('weeklyWaterLiters', 0))
+        features['sum_weekly_water_liters'] = np.sum(water) if water else 0
+
+        # Mantenimiento promedio
+        maintenance = []
+        for orchard in orchards:
+            if 'estimations' in orchard:
+                maintenance.append(orchard['estimations'].get('maintenanceMinutesPerWeek', 0))
+            elif 'maintenanceMinutes' in orchard:
+                maintenance.append(orchard['maintenanceMinutes'])
+        features['avg_maintenance_minutes'] = np.mean(maintenance) if maintenance else 0
+
+        # Contadores promedio
+        features['avg_count_plants'] = np.mean([o.get('countPlants', 0) for o in orchards])
+        features['avg_timeOfLife'] = np.mean([o.get('timeOfLife', 0) for o in orchards])
+        features['avg_streak'] = np.mean([o.get('streakOfDays', 0) for o in orchards])
+
+        # Diversidad de plantas (número de tipos distintos)
+        all_types = set()
+        for orchard in orchards:
+            if 'layout' in orchard and 'plants' in orchard['layout']:
+                for plant in orchard['layout']['plants']:
+                    all_types.update(plant.get('type', []))
+        features['avg_plant_diversity'] = len(all_types)
+
+        # Category distribution
+        category_breakdown = {'vegetable': [], 'medicinal': [], 'ornamental': [], 'aromatic': []}
+        for orchard in orchards:
+            if 'layout' in orchard and 'categoryBreakdown' in orchard['layout']:
+                cb = orchard['layout']['categoryBreakdown']
+                for cat in category_breakdown.keys():
+                    category_breakdown[cat].append(cb.get(cat, 0))
+            elif 'metadata' in orchard and 'inputParameters' in orchard['metadata']:
+                dist = orchard['metadata']['inputParameters'].get('categoryDistribution', {})
+                for cat in category_breakdown.keys():
+                    category_breakdown[cat].append(dist.get(cat, 0))
+
+        for cat, values in category_breakdown.items():
+            features[f'pct_{cat}'] = np.mean(values) if values else 0
+
+        # Objetivo más común
+        objectives = []
+        for orchard in orchards:
+            if 'objective' in orchard:
+                objectives.append(orchard['objective'])
+            elif 'metadata' in orchard:
+                obj = orchard['metadata'].get('inputParameters', {}).get('objective')
+                if obj:
+                    objectives.append(obj)
+
+        if objectives:
+            features['objective'] = max(set(objectives), key=objectives.count)
+        else:
+            features['objective'] = 'alimenticio'
+
+        # Ubicación (usar primera orchard o default)
+        lat, lon = None, None
+        for orchard in orchards:
+            if 'metadata' in orchard:
+                loc = orchard['metadata'].get('inputParameters', {}).get('location', {})
+                lat = loc.get('lat')
+                lon = loc.get('lon')
+                if lat is not None and lon is not None:
+                    break
+
+        features['latitude'] = lat if lat is not None else DEFAULT_LATITUDE
+        features['longitude'] = lon if lon is not None else DEFAULT_LONGITUDE
+
+    else:
+        # Usuario sin orchards - valores default
+        features['avg_orchard_area'] = 0
+        features['sum_weekly_water_liters'] = 0
+        features['avg_maintenance_minutes'] = 0
+        features['avg_count_plants'] = 0
+        features['avg_timeOfLife'] = 0
+        features['avg_streak'] = 0
+        features['avg_plant_diversity'] = 0
+        features['pct_vegetable'] = 0
+        features['pct_medicinal'] = 0
+        features['pct_ornamental'] = 0
+        features['pct_aromatic'] = 0
+        features['objective'] = 'alimenticio'
+        features['latitude'] = DEFAULT_LATITUDE
+        features['longitude'] = DEFAULT_LONGITUDE
+
+    return features
@@ -0,0 +1,8 @@
+"""Benchmarks offline del recommender (no requieren MongoDB)."""
+import os
+import tempfile
+
+# Settings requiere estas variables; los benchmarks no usan servicios reales
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("MODEL_STORAGE_PATH", tempfile.mkdtemp(prefix="recommender-bench-"))
@@ -0,0 +1,83 @@
+"""Benchmark: tiempo de import al arrancar un worker (cold start).
+
+Uso:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --module app.services.training_service --repeat 10 --top 25
+
+Importa el módulo en un intérprete nuevo por corrida (`python -X importtime`),
+reporta la mediana del tiempo total, los módulos más costosos (acumulado) y si
+el stack de entrenamiento quedó cargado en el camino de serving.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Stack de entrenamiento que no debe cargarse al importar app.main
+HEAVY_MODULES = ("pandas", "sklearn", "kmodes", "scipy")
+
+PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print('TOTAL', time.perf_counter() - start)\n"
+    "print('LOADED', ','.join(m for m in {heavy!r} if m in sys.modules))\n"
+)
+
+
+def run_once(module: str) -> Tuple[float, List[str], Dict[str, int]]:
+    """Importa el módulo en un proceso nuevo; retorna (segundos, pesados, µs acumulados por módulo)."""
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    env.setdefault("JWT_SECRET_KEY", "benchmark")
+
+    completed = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c",
+         PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True, env=env
+    )
+
+    total = 0.0
+    loaded: List[str] = []
+    for line in completed.stdout.splitlines():
+        if line.startswith("TOTAL "):
+            total = float(line.split()[1])
+        elif line.startswith("LOADED "):
+            loaded = [m for m in line.split(" ", 1)[1].split(",") if m]
+
+    cumulative: Dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+
+    return total, loaded, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    loaded: List[str] = []
+    cumulative: Dict[str, int] = {}
+    for _ in range(args.repeat):
+        total, loaded, cumulative = run_once(args.module)
+        totals.append(total)
+
+    print(f"import {args.module}: median {statistics.median(totals) * 1000:.0f} ms "
+          f"(min {min(totals) * 1000:.0f} ms, {args.repeat} runs)")
+    print(f"training stack loaded: {', '.join(loaded) if loaded else 'none'}")
+    print(f"\ntop {args.top} modules by cumulative import time (last run):")
+    for name, micros in sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {micros / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark: índice IVF de vecinos cercanos vs fuerza bruta.
+
+Uso:
+    python -m benchmarks.bench_neighbor_index --users 100000 --queries 500 --k 50
+"""
+import argparse
+import time
+import numpy as np
+
+from app.services.neighbor_index import UserNeighborIndex
+
+
+def synthetic_vectors(n_users: int, seed: int = 42):
+    """Vectores escalados con la forma de FeaturePipeline (16 numéricas, 2 categóricas)."""
+    rng = np.random.default_rng(seed)
+    X_numeric = rng.normal(size=(n_users, 16))
+    X_numeric[:, 0] = rng.integers(1, 5, n_users)
+    X_numeric[:, 2] = rng.integers(0, 2, n_users)
+    X_numeric[:, 3] = rng.integers(0, 2, n_users)
+    X_numeric = (X_numeric - X_numeric.mean(axis=0)) / X_numeric.std(axis=0)
+    X_categorical = np.stack([rng.integers(0, 4, n_users), rng.integers(0, 10, n_users)], axis=1)
+    return X_numeric, X_categorical
+
+
+def brute_force(embedded: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    dist = ((embedded - q) ** 2).sum(axis=1)
+    return np.argpartition(dist, k - 1)[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    X_numeric, X_categorical = synthetic_vectors(args.users)
+    user_ids = [str(i) for i in range(args.users)]
+
+    start = time.perf_counter()
+    index = UserNeighborIndex().build(X_numeric, X_categorical, user_ids, gamma=0.5)
+    print(f"build: {time.perf_counter() - start:.2f}s ({index.n_lists} lists, {args.users} users)")
+
+    embedded = index.embed(X_numeric, X_categorical)
+    query_rows = np.random.default_rng(0).choice(args.users, size=args.queries, replace=False)
+
+    start = time.perf_counter()
+    exact = [set(brute_force(embedded, embedded[row], args.k)) for row in query_rows]
+    brute_ms = (time.perf_counter() - start) / args.queries * 1000
+    print(f"brute force: {brute_ms:.3f} ms/query")
+
+    for n_probe in args.n_probe:
+        start = time.perf_counter()
+        results = index.query(X_numeric[query_rows], X_categorical[query_rows], k=args.k, n_probe=n_probe)
+        ivf_ms = (time.perf_counter() - start) / args.queries * 1000
+
+        recall = np.mean([
+            len({int(uid) for uid, _ in neighbors} & truth) / args.k
+            for neighbors, truth in zip(results, exact)
+        ])
+        print(
+            f"ivf n_probe={n_probe:>3}: {ivf_ms:.3f} ms/query, "
+            f"speedup x{brute_ms / ivf_ms:.1f}, recall@{args.k}={recall:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
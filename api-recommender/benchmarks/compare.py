@@ -0,0 +1,50 @@
+"""Compara dos reportes JSON de run_benchmarks.
+
+Uso:
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Sale con código 1 si algún benchmark empeoró más que el umbral (seconds_min).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Any, Tuple
+
+
+def load_results(path: Path) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    report = json.loads(path.read_text())
+    return {
+        (record["benchmark"], record["scale"]): record
+        for record in report["results"]
+        if "skipped" not in record
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="Regresión relativa tolerada")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+    regressions = 0
+
+    print(f"{'benchmark':<24}{'scale':>9}{'baseline s':>14}{'candidate s':>14}{'change':>10}")
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old = baseline[key]["seconds_min"]
+        new = candidate[key]["seconds_min"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{key[0]:<24}{key[1]:>9}{old:>14.4f}{new:>14.4f}{change:>+10.1%}{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Load test del camino de requests contra MongoDB en memoria (mongomock-motor).
+
+Uso:
+    python -m benchmarks.load_test --users 2000 --concurrency 1 8 32 --requests 500
+    python -m benchmarks.load_test --scenarios recommendation --duration 30 --concurrency 16
+
+Levanta la app FastAPI sin lifespan (sin scheduler ni change streams) con
+app.state.db apuntando a una BD mongomock sembrada con benchmarks.synthetic, y
+la ejercita con httpx.ASGITransport en el mismo proceso. Escenarios:
+
+- recommendation: GET /recommendations/user/{id} con usuarios aleatorios
+- batch: POST /recommendations/batch con --batch-size usuarios
+- webhook: POST /webhook/user-registered; el envío al servicio de notificaciones
+  se sustituye por un stub con --notify-latency-ms de latencia simulada
+
+Reporta p50/p95/p99 y throughput por escenario y concurrencia. Mide el costo de
+un worker (app + scoring + driver); mongomock es Python puro, así que las
+consultas son más lentas que contra un mongod real y los números sirven para
+comparar commits, no como capacidad absoluta.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+
+import httpx
+import numpy as np
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.cluster_recommendations import build_cluster_top_lists
+from app.services.feature_pipeline import FeaturePipeline
+from app.services.neighbor_index import UserNeighborIndex, neighbor_index_path, neighbor_index_store
+from app.services.notifications_client import notifications_client
+from benchmarks.run_benchmarks import RESULTS_DIR, git_commit
+from benchmarks.synthetic import generate_dataset, group_orchards_by_user
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("recommendation", "batch", "webhook")
+N_CLUSTERS = 8
+INSERT_CHUNK = 5_000
+
+RequestFactory = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+async def seed_database(n_users: int, seed: int, with_neighbor_index: bool):
+    """Crea la BD en memoria con usuarios, huertos y listas top-N por cluster."""
+    users, orchards = generate_dataset(n_users, seed=seed)
+    rng = random.Random(seed)
+    for user in users:
+        user['cluster_id'] = rng.randrange(N_CLUSTERS)
+
+    db = AsyncMongoMockClient()[settings.MONGO_DB_NAME]
+    for start in range(0, len(users), INSERT_CHUNK):
+        await db.users.insert_many(users[start:start + INSERT_CHUNK])
+    for start in range(0, len(orchards), INSERT_CHUNK):
+        await db.orchards.insert_many(orchards[start:start + INSERT_CHUNK])
+
+    await build_cluster_top_lists(db, N_CLUSTERS, None, settings.CLUSTER_TOP_N)
+
+    if with_neighbor_index:
+        orchards_by_user = group_orchards_by_user(orchards)
+        pipeline = FeaturePipeline()
+        features = [
+            pipeline.extract_user_features(user, orchards_by_user.get(user['_id'], []))
+            for user in users
+        ]
+        X_numeric, X_categorical = pipeline.fit_transform(features)
+        # gamma por defecto de K-Prototypes: 0.5 * std media de las numéricas
+        gamma = 0.5 * float(X_numeric.std(axis=0).mean())
+        index = UserNeighborIndex().build(X_numeric, X_categorical, [u['_id'] for u in users], gamma)
+        index.save(neighbor_index_path())
+        neighbor_index_store.set(index)
+
+    logger.info(f"Seeded {len(users)} users / {len(orchards)} orchards ({N_CLUSTERS} clusters)")
+    return db, [user['_id'] for user in users]
+
+
+def stub_notifications(latency_ms: float):
+    """Sustituye el envío de notificaciones por una espera simulada."""
+    async def send_to_user(user_id: str, title: str, body: str, data: Dict[str, Any] = None):
+        await asyncio.sleep(latency_ms / 1000)
+        return {"success": True}
+
+    async def send_batch(notifications: List[Dict[str, Any]]):
+        await asyncio.sleep(latency_ms / 1000)
+        return {"success": True}
+
+    notifications_client.send_to_user = send_to_user
+    notifications_client.send_batch = send_batch
+
+
+def request_factory(scenario: str, user_ids: List[str], batch_size: int, limit: int) -> RequestFactory:
+    rng = random.Random(0)
+
+    if scenario == "recommendation":
+        return lambda client: client.get(
+            f"/recommendations/user/{rng.choice(user_ids)}", params={"limit": limit}
+        )
+    if scenario == "batch":
+        return lambda client: client.post(
+            "/recommendations/batch",
+            json={"userIds": rng.sample(user_ids, batch_size), "limit": limit}
+        )
+    if scenario == "webhook":
+        return lambda client: client.post(
+            "/webhook/user-registered", json={"userId": rng.choice(user_ids)}
+        )
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    make_request: RequestFactory,
+    concurrency: int,
+    total_requests: Optional[int],
+    duration: Optional[float]
+) -> Dict[str, Any]:
+    """Lanza `concurrency` workers hasta completar total_requests o duration segundos."""
+    latencies: List[float] = []
+    errors = 0
+    issued = 0
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def should_continue() -> bool:
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        return issued < total_requests
+
+    async def worker():
+        nonlocal issued, errors
+        while should_continue():
+            issued += 1
+            start = time.perf_counter()
+            try:
+                response = await make_request(client)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else (0.0, 0.0, 0.0)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    db, user_ids = await seed_database(args.users, args.seed, not args.no_neighbor_index)
+    app.state.db = db
+    stub_notifications(args.notify_latency_ms)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "users": args.users,
+            "seed": args.seed,
+            "neighbor_index": not args.no_neighbor_index,
+            "batch_size": args.batch_size,
+            "notify_latency_ms": args.notify_latency_ms,
+        },
+        "results": [],
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        for scenario in args.scenarios:
+            make_request = request_factory(scenario, user_ids, args.batch_size, args.limit)
+            # Calentamiento: carga perezosa del índice y caches
+            for _ in range(min(args.warmup, args.users)):
+                await make_request(client)
+
+            for concurrency in args.concurrency:
+                result = await run_load(client, make_request, concurrency, args.requests, args.duration)
+                result["scenario"] = scenario
+                report["results"].append(result)
+                print(
+                    f"{scenario:<16}c={concurrency:<4} {result['requests']:>6} req "
+                    f"{result['throughput_rps']:>9.1f} req/s  "
+                    f"p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms"
+                    f"  errors={result['errors']}"
+                )
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="Requests por escenario y concurrencia")
+    parser.add_argument("--duration", type=float, default=None, help="Segundos por corrida (ignora --requests)")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--notify-latency-ms", type=float, default=20.0)
+    parser.add_argument("--no-neighbor-index", action="store_true")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logging.getLogger("app").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run(args))
+
+    output = args.output or RESULTS_DIR / f"load_{datetime.now():%Y%m%d-%H%M%S}_{report['meta']['commit'] or 'nocommit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    logger.info(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
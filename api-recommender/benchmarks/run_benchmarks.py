@@ -0,0 +1,369 @@
+"""Suite de benchmarks de entrenamiento y recomendación con datos sintéticos.
+
+Uso:
+    python -m benchmarks.run_benchmarks --scales 1000 10000 100000
+    python -m benchmarks.run_benchmarks --only fit_transform predict --repeat 5
+    python -m benchmarks.compare benchmarks/results/<a>.json benchmarks/results/<b>.json
+
+Los benchmarks con K-Prototypes completo (find_optimal_k, train) son lentos; por
+defecto se omiten por encima de --max-kproto-users y quedan registrados como
+"skipped". predict usa un modelo ajustado sobre una muestra cuando train se omite.
+
+Los resultados se escriben como JSON en benchmarks/results/ para comparar commits.
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional
+
+import numpy as np
+import sklearn
+from kmodes.kprototypes import KPrototypes
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sklearn.metrics import silhouette_score
+
+from app.api.responses import RecommendationsJSONResponse
+from app.api.schemas import BatchRecommendationsResponse
+
+from app.services.cluster_metrics import mixed_silhouette
+from app.services.cluster_predictor import ClusterPredictor
+from app.services.clustering_service import ClusteringService
+from app.services.compact_features import combine, compact_categorical, compact_numeric
+from app.services.cluster_recommendations import rank_candidates, rank_for_user
+from app.services.feature_pipeline import FeaturePipeline
+from benchmarks.synthetic import generate_dataset, group_orchards_by_user
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+BENCHMARKS = (
+    "extract_user_features",
+    "fit_transform",
+    "fit_transform_reuse",
+    "fit_transform_compact",
+    "find_optimal_k",
+    "train",
+    "train_compact",
+    "predict",
+    "predict_numpy",
+    "predict_numpy_compact",
+    "silhouette_sklearn",
+    "silhouette_mixed",
+    "recommendation_scoring",
+    "response_pydantic",
+    "response_orjson",
+)
+KPROTO_BENCHMARKS = {"find_optimal_k", "train", "train_compact"}
+
+PREDICT_SAMPLE = 10_000
+PREDICT_K = 8
+SCORING_USERS = 1_000
+RESPONSE_USERS = 100  # máximo de /recommendations/batch
+RESPONSE_LIMIT = 50
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_bytes(fn: Callable[[], Any]) -> int:
+    """Pico de memoria asignada (tracemalloc, incluye arrays NumPy) durante una llamada."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def label_agreement(labels: np.ndarray, expected: np.ndarray, relabel: bool = False) -> Dict[str, Any]:
+    """Etiquetas distintas a las esperadas; con relabel, tras mapear cada cluster a su par más frecuente."""
+    labels, expected = np.asarray(labels, dtype=np.int64), np.asarray(expected, dtype=np.int64)
+    if relabel and len(labels):
+        pairs = np.zeros((labels.max() + 1, expected.max() + 1), dtype=np.int64)
+        np.add.at(pairs, (labels, expected), 1)
+        labels = pairs.argmax(axis=1)[labels]
+    mismatches = int(np.count_nonzero(labels != expected))
+    return {"label_mismatches": mismatches, "label_agreement": 1 - mismatches / max(len(expected), 1)}
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Ejecuta fn `repeat` veces y retorna tiempos en segundos."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {
+        "seconds_min": min(runs),
+        "seconds_median": statistics.median(runs),
+        "runs": runs,
+    }
+
+
+class ScaleContext:
+    """Datos y artefactos compartidos entre benchmarks de una misma escala."""
+
+    def __init__(self, n_users: int, seed: int):
+        start = time.perf_counter()
+        self.users, self.orchards = generate_dataset(n_users, seed=seed)
+        self.orchards_by_user = group_orchards_by_user(self.orchards)
+        logger.info(
+            f"Generated {len(self.users)} users / {len(self.orchards)} orchards "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        self._features: Optional[List[Dict[str, Any]]] = None
+        self._matrices = None
+        self.pipeline: Optional[FeaturePipeline] = None
+        self.clustering: Optional[ClusteringService] = None
+
+    def extract(self) -> List[Dict[str, Any]]:
+        pipeline = FeaturePipeline()
+        return [
+            pipeline.extract_user_features(user, self.orchards_by_user.get(user['_id'], []))
+            for user in self.users
+        ]
+
+    @property
+    def features(self) -> List[Dict[str, Any]]:
+        if self._features is None:
+            self._features = self.extract()
+        return self._features
+
+    @property
+    def matrices(self):
+        if self._matrices is None:
+            self.pipeline = FeaturePipeline(compact=False)
+            self._matrices = self.pipeline.fit_transform(self.features)
+        return self._matrices
+
+    @property
+    def compact_matrices(self):
+        """Las mismas matrices en float32 / int8 (lo que produce el pipeline con compact=True)."""
+        X_numeric, X_categorical = self.matrices
+        n_codes = max(len(vocab) for vocab in self.pipeline.category_vocabularies.values())
+        return compact_numeric(X_numeric), compact_categorical(X_categorical, n_codes)
+
+    def predictor(self) -> ClusterPredictor:
+        """ClusterPredictor exportado del mismo modelo que usa predict."""
+        return ClusterPredictor.from_training(self.pipeline, self.predict_model().model)
+
+    def predict_model(self) -> ClusteringService:
+        """Modelo para predict: el de train si corrió, si no uno ajustado sobre una muestra."""
+        if self.clustering is not None:
+            return self.clustering
+
+        X_numeric, X_categorical = self.matrices
+        sample = np.random.default_rng(0).choice(
+            len(X_numeric), size=min(PREDICT_SAMPLE, len(X_numeric)), replace=False
+        )
+        X_combined = np.concatenate([X_numeric[sample], X_categorical[sample]], axis=1)
+        clustering = ClusteringService()
+        clustering.model = KPrototypes(n_clusters=PREDICT_K, init='Huang', n_init=1, random_state=42)
+        clustering.model.fit(X_combined, categorical=list(range(X_numeric.shape[1], X_combined.shape[1])))
+        clustering.n_clusters = PREDICT_K
+        self.clustering = clustering
+        return clustering
+
+
+def run_benchmark(name: str, ctx: ScaleContext, repeat: int) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+
+    if name == "extract_user_features":
+        timing = measure(ctx.extract, repeat)
+
+    elif name == "fit_transform":
+        timing = measure(lambda: FeaturePipeline().fit_transform(ctx.features), repeat)
+
+    elif name == "fit_transform_reuse":
+        # Reentrenamiento con las regiones de ubicación del anterior (sin KMeans)
+        ctx.matrices
+        previous = ctx.pipeline.location_regions
+        timing = measure(
+            lambda: FeaturePipeline(previous_location_regions=previous).fit_transform(ctx.features), repeat
+        )
+
+    elif name == "fit_transform_compact":
+        timing = measure(lambda: FeaturePipeline(compact=True).fit_transform(ctx.features), repeat)
+        X_numeric, X_categorical = ctx.matrices
+        X_numeric_compact, X_categorical_compact = ctx.compact_matrices
+        params.update({
+            "bytes_standard": X_numeric.nbytes + X_categorical.nbytes,
+            "bytes_compact": X_numeric_compact.nbytes + X_categorical_compact.nbytes,
+            "combined_bytes_standard": combine(X_numeric, X_categorical).nbytes,
+            "combined_bytes_compact": combine(X_numeric_compact, X_categorical_compact).nbytes,
+            "dtypes_compact": [str(X_numeric_compact.dtype), str(X_categorical_compact.dtype)],
+        })
+
+    elif name == "find_optimal_k":
+        X_numeric, X_categorical = ctx.matrices
+        timing = measure(lambda: ClusteringService().find_optimal_k(X_numeric, X_categorical), 1)
+
+    elif name == "train":
+        X_numeric, X_categorical = ctx.matrices
+        user_ids = [user['_id'] for user in ctx.users]
+        clustering = ClusteringService()
+        timing = measure(lambda: clustering.train(X_numeric, X_categorical, user_ids), 1)
+        params["n_clusters"] = clustering.n_clusters
+        ctx.clustering = clustering
+
+    elif name == "train_compact":
+        # Mismo entrenamiento con float32 / int8; etiquetas contra train en float64
+        X_numeric, X_categorical = ctx.compact_matrices
+        user_ids = [user['_id'] for user in ctx.users]
+        clustering = ClusteringService()
+        timing = measure(lambda: clustering.train(X_numeric, X_categorical, user_ids), 1)
+        params["n_clusters"] = clustering.n_clusters
+        if ctx.clustering is not None and ctx.clustering.n_clusters == clustering.n_clusters:
+            params.update(label_agreement(
+                clustering.model.labels_, ctx.clustering.model.labels_, relabel=True
+            ))
+
+    elif name == "predict":
+        X_numeric, X_categorical = ctx.matrices
+        clustering = ctx.predict_model()
+        params["n_clusters"] = clustering.n_clusters
+        timing = measure(lambda: clustering.predict(X_numeric, X_categorical), repeat)
+
+    elif name == "predict_numpy":
+        X_numeric, X_categorical = ctx.matrices
+        predictor = ctx.predictor()
+        params["n_clusters"] = predictor.n_clusters
+        timing = measure(lambda: predictor.predict(X_numeric, X_categorical), repeat)
+        params["peak_bytes"] = peak_bytes(lambda: predictor.predict(X_numeric, X_categorical))
+
+    elif name == "predict_numpy_compact":
+        X_numeric, X_categorical = ctx.compact_matrices
+        predictor = ctx.predictor()
+        params["n_clusters"] = predictor.n_clusters
+        timing = measure(lambda: predictor.predict(X_numeric, X_categorical), repeat)
+        params["peak_bytes"] = peak_bytes(lambda: predictor.predict(X_numeric, X_categorical))
+        params.update(label_agreement(
+            predictor.predict(X_numeric, X_categorical), predictor.predict(*ctx.matrices)
+        ))
+
+    elif name in ("silhouette_sklearn", "silhouette_mixed"):
+        # Etiquetas del modelo de predict; sklearn (sólo numéricas, distancias par a par por
+        # chunks) contra la silhouette por agregados con la disimilaridad del modelo
+        X_numeric, X_categorical = ctx.matrices
+        clustering = ctx.predict_model()
+        labels = clustering.predict(X_numeric, X_categorical)
+        params["n_clusters"] = clustering.n_clusters
+        if name == "silhouette_sklearn":
+            timing = measure(lambda: silhouette_score(X_numeric, labels), repeat)
+        else:
+            gamma = float(clustering.model.gamma)
+            timing = measure(lambda: mixed_silhouette(X_numeric, X_categorical, labels, gamma), repeat)
+
+    elif name == "recommendation_scoring":
+        # Un cluster promedio: todos los huertos / k, re-rankeado para SCORING_USERS usuarios
+        n_candidates = max(1, len(ctx.orchards) // PREDICT_K)
+        candidates = ctx.orchards[:n_candidates]
+        users = ctx.users[:SCORING_USERS]
+        params.update({"candidates": n_candidates, "users": len(users)})
+
+        def score():
+            entries = rank_candidates(candidates, None, 0, top_n=100)
+            for user in users:
+                rank_for_user(entries, user, ctx.orchards_by_user.get(user['_id'], []), limit=10)
+
+        timing = measure(score, repeat)
+
+    elif name in ("response_pydantic", "response_orjson"):
+        # Respuesta de /recommendations/batch con RESPONSE_USERS usuarios y limit=RESPONSE_LIMIT:
+        # validación + dump JSON de response_model y json.dumps (lo que hace FastAPI)
+        # contra orjson directo sobre los dicts internos
+        entries = rank_candidates(ctx.orchards[:RESPONSE_LIMIT * 4], None, 0, top_n=RESPONSE_LIMIT * 2)
+        payload = {
+            "results": [
+                {
+                    "userId": user['_id'],
+                    "clusterIdAssigned": 0,
+                    "recommendations": rank_for_user(entries, user, [], RESPONSE_LIMIT),
+                    "generatedAt": datetime.now(),
+                }
+                for user in ctx.users[:RESPONSE_USERS]
+            ],
+            "notFound": [],
+        }
+        params.update({"users": len(payload["results"]), "limit": RESPONSE_LIMIT})
+
+        if name == "response_pydantic":
+            adapter = TypeAdapter(BatchRecommendationsResponse)
+            timing = measure(
+                lambda: JSONResponse(adapter.dump_python(adapter.validate_python(payload), mode="json")),
+                repeat
+            )
+        else:
+            timing = measure(lambda: RecommendationsJSONResponse(payload), repeat)
+
+    else:
+        raise ValueError(f"Unknown benchmark {name}")
+
+    return {**timing, "params": params}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-kproto-users", type=int, default=1_000)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": [],
+    }
+
+    for n_users in args.scales:
+        ctx = ScaleContext(n_users, args.seed)
+        for name in BENCHMARKS:
+            if name not in args.only:
+                continue
+
+            record = {"benchmark": name, "scale": n_users}
+            if name in KPROTO_BENCHMARKS and n_users > args.max_kproto_users:
+                record["skipped"] = f"scale above --max-kproto-users={args.max_kproto_users}"
+                logger.info(f"{name} @ {n_users}: skipped")
+            else:
+                record.update(run_benchmark(name, ctx, args.repeat))
+                logger.info(f"{name} @ {n_users}: {record['seconds_min']:.4f}s (min of {len(record['runs'])})")
+            report["results"].append(record)
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}_{commit or 'nocommit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    logger.info(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Generador sintético de usuarios y huertos para benchmarks (sin MongoDB).
+
+Replica las distribuciones de data-filling/src/generate_100k.ts:
+- experience_level: 30% 1, 50% 2, 15% 3, 5% 4
+- 70% con profile_image, 60% con historial de uso
+- huertos por usuario: 30% 0, 40% 1, 20% 2, 10% 3
+- parámetros del AG: ancho 1-5 m, alto 1-4 m, agua 50-80 L/m², objetivo uniforme,
+  distribución de categorías que suma 100 y ubicación en la región de Chiapas
+
+Los huertos incluyen los campos que produce el AG y que usa FeaturePipeline
+(layout, estimations, metadata.inputParameters, metrics.fitness, etc.).
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple
+
+OBJECTIVES = ['alimenticio', 'medicinal', 'sostenible', 'ornamental']
+CATEGORIES = ['vegetable', 'medicinal', 'ornamental', 'aromatic']
+
+
+def _experience_level(rng: random.Random) -> int:
+    roll = rng.random()
+    if roll < 0.3:
+        return 1
+    if roll < 0.8:
+        return 2
+    if roll < 0.95:
+        return 3
+    return 4
+
+
+def _count_orchards(rng: random.Random) -> int:
+    roll = rng.random()
+    if roll < 0.3:
+        return 0
+    if roll < 0.7:
+        return 1
+    if roll < 0.9:
+        return 2
+    return 3
+
+
+def _category_distribution(rng: random.Random) -> Dict[str, int]:
+    rand = [rng.random() * 100 for _ in range(3)]
+    total = sum(rand)
+    target = 70 + rng.random() * 20
+    vegetable, medicinal, ornamental = (int(r / total * target) for r in rand)
+    return {
+        'vegetable': vegetable,
+        'medicinal': medicinal,
+        'ornamental': ornamental,
+        'aromatic': 100 - vegetable - medicinal - ornamental,
+    }
+
+
+def generate_user(rng: random.Random, index: int, now: datetime) -> Dict[str, Any]:
+    """Genera un documento de usuario como lo guarda api-users."""
+    history = []
+    if rng.random() < 0.6:
+        history = [
+            (now - timedelta(days=rng.random() * 30)).isoformat()
+            for _ in range(rng.randint(1, 15))
+        ]
+
+    return {
+        '_id': f"user-{index:07d}",
+        'name': f"Usuario {index}",
+        'email': f"user{index}@example.com",
+        'experience_level': _experience_level(rng),
+        'profile_image': f"https://example.com/avatar/{index}.jpg" if rng.random() < 0.7 else None,
+        'tokenFCM': f"fcm-{index}" if rng.random() < 0.6 else None,
+        'historyTimeUse_ids': history,
+        'count_orchards': _count_orchards(rng),
+        'createdAt': now - timedelta(days=rng.random() * 730),
+    }
+
+
+def generate_orchard(
+    rng: random.Random,
+    user: Dict[str, Any],
+    index: int,
+    now: datetime
+) -> Dict[str, Any]:
+    """Genera un huerto con la forma de una solución del AG guardada por api-orchard."""
+    width = 1 + rng.random() * 4
+    height = 1 + rng.random() * 3
+    area = width * height
+    water_limit = area * (50 + rng.random() * 30)
+    objective = rng.choice(OBJECTIVES)
+    distribution = _category_distribution(rng)
+    count_plants = max(1, int(area * (2 + rng.random() * 3)))
+    weights = [distribution[c] for c in CATEGORIES]
+
+    created_at = now - timedelta(days=rng.random() * 365)
+    time_of_life = (now - created_at).days
+
+    return {
+        '_id': f"orchard-{index:07d}",
+        'userId': user['_id'],
+        'name': f"Huerto {index}",
+        'description': (
+            f"Huerto generado con AG - {count_plants} plantas en {width:.1f}x{height:.1f}m"
+        ),
+        'width': width,
+        'height': height,
+        'state': rng.random() < 0.9,
+        'objective': objective,
+        'countPlants': count_plants,
+        'timeOfLife': time_of_life,
+        'streakOfDays': rng.randint(0, max(0, time_of_life)),
+        'layout': {
+            'dimensions': {'width': width, 'height': height, 'totalArea': area},
+            'plants': [
+                {'type': [rng.choices(CATEGORIES, weights=weights)[0]]}
+                for _ in range(count_plants)
+            ],
+            'categoryBreakdown': distribution,
+        },
+        'estimations': {
+            'weeklyWaterLiters': water_limit * (0.6 + rng.random() * 0.4),
+            'maintenanceMinutesPerWeek': count_plants * (8 + rng.random() * 12),
+        },
+        'metadata': {
+            'inputParameters': {
+                'userExperience': min(user['experience_level'], 3),
+                'objective': objective,
+                'categoryDistribution': distribution,
+                'location': {'lat': 14 + rng.random() * 6, 'lon': -95 + rng.random() * 4},
+            }
+        },
+        'metrics': {'fitness': 0.5 + rng.random() * 0.45},
+        'createdAt': created_at,
+    }
+
+
+def generate_dataset(n_users: int, seed: int = 42) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Genera n_users usuarios y sus huertos (reproducible con seed)."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    users = []
+    orchards = []
+
+    for index in range(n_users):
+        user = generate_user(rng, index, now)
+        users.append(user)
+        for _ in range(user['count_orchards']):
+            orchards.append(generate_orchard(rng, user, len(orchards), now))
+
+    return users, orchards
+
+
+def group_orchards_by_user(orchards: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Agrupa huertos por userId (como el ingest del entrenamiento)."""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for orchard in orchards:
+        grouped.setdefault(orchard['userId'], []).append(orchard)
+    return grouped
@@ -0,0 +1,8 @@
+"""Configuración compartida de pytest."""
+import os
+import tempfile
+
+# Settings requiere estas variables; los tests no usan servicios reales
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("MODEL_STORAGE_PATH", tempfile.mkdtemp(prefix="recommender-models-"))
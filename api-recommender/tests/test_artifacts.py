@@ -0,0 +1,119 @@
+"""Tests del formato de artefactos (manifest JSON + .npy)."""
+import threading
+
+import joblib
+import numpy as np
+import pytest
+
+from app.core import artifacts
+from app.core.artifacts import (
+    ArtifactError,
+    ArtifactStore,
+    legacy_path,
+    load_artifact,
+    read_manifest,
+    save_artifact,
+)
+
+
+def test_roundtrip_memory_maps_arrays(tmp_path):
+    path = tmp_path / "artifact"
+    centroids = np.arange(12, dtype=np.float64).reshape(3, 4)
+    vocabulary = np.array(["alimenticio", "medicinal"])
+
+    save_artifact(path, {"centroids": centroids, "vocabulary": vocabulary}, metadata={"gamma": np.float64(0.5)})
+    arrays, metadata = load_artifact(path)
+
+    assert isinstance(arrays["centroids"], np.memmap)
+    np.testing.assert_array_equal(arrays["centroids"], centroids)
+    assert arrays["vocabulary"].tolist() == ["alimenticio", "medicinal"]
+    assert metadata == {"gamma": 0.5}
+    assert read_manifest(path)["arrays"]["centroids"]["shape"] == [3, 4]
+
+
+def test_corrupted_array_fails_checksum(tmp_path):
+    path = tmp_path / "artifact"
+    save_artifact(path, {"centroids": np.ones((4, 4))})
+    data = bytearray((path / "centroids.npy").read_bytes())
+    data[-1] ^= 0xFF
+    (path / "centroids.npy").write_bytes(bytes(data))
+
+    with pytest.raises(ArtifactError):
+        load_artifact(path)
+    load_artifact(path, verify=False)
+
+
+def test_checksums_verified_once_per_manifest(tmp_path, monkeypatch):
+    """Recargar el mismo manifest sólo mapea; un artefacto reemplazado se verifica de nuevo."""
+    hashed = []
+    original = artifacts._sha256
+    monkeypatch.setattr(artifacts, "_sha256", lambda file: hashed.append(file.name) or original(file))
+    path = tmp_path / "artifact"
+    save_artifact(path, {"a": np.zeros(2), "b": np.ones(2)})
+    hashed.clear()
+
+    load_artifact(path)
+    load_artifact(path)
+    assert sorted(hashed) == ["a.npy", "b.npy"]
+
+    save_artifact(path, {"a": np.ones(3)})
+    hashed.clear()
+    load_artifact(path)
+    load_artifact(path, verify=True)
+    assert hashed == ["a.npy", "a.npy"]
+
+
+def test_save_replaces_existing_artifact(tmp_path):
+    path = tmp_path / "artifact"
+    save_artifact(path, {"a": np.zeros(2), "b": np.zeros(2)})
+    save_artifact(path, {"a": np.ones(3)})
+
+    arrays, _ = load_artifact(path)
+
+    assert set(arrays) == {"a"}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["artifact"]
+
+
+def test_store_reads_legacy_joblib_then_new_artifact(tmp_path):
+    """El store lee el .joblib anterior hasta que existe el artefacto nuevo."""
+    path = tmp_path / "model"
+
+    def loader(resolved):
+        if resolved.suffix == ".joblib":
+            return joblib.load(resolved)["value"]
+        return load_artifact(resolved)[1]["value"]
+
+    store = ArtifactStore("test model", lambda: path, loader)
+    assert store.get() is None
+
+    joblib.dump({"value": "legacy"}, legacy_path(path))
+    assert store.get() == "legacy"
+
+    save_artifact(path, {}, metadata={"value": "artifact"})
+    store.get()
+    store.wait_for_reload(timeout=5)
+    assert store.get() == "artifact"
+
+
+def test_store_reload_does_not_block_readers(tmp_path):
+    """Mientras carga la versión nueva, get() sigue retornando la anterior."""
+    path = tmp_path / "model"
+    release = threading.Event()
+
+    def loader(resolved):
+        value = load_artifact(resolved)[1]["value"]
+        if value == "new":
+            release.wait(timeout=5)
+        return value
+
+    store = ArtifactStore("test model", lambda: path, loader)
+    save_artifact(path, {}, metadata={"value": "old"})
+    assert store.get() == "old"
+
+    save_artifact(path, {}, metadata={"value": "new"})
+    assert store.get() == "old"
+    assert store.get() == "old"
+
+    release.set()
+    store.wait_for_reload(timeout=5)
+    assert store.get() == "new"
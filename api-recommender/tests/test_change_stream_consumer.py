@@ -0,0 +1,163 @@
+"""Tests unitarios para ChangeStreamConsumer.
+
+mongomock no implementa change streams: los eventos se inyectan con submit()/
+apply_batch() con la misma forma que los entrega un replica set.
+"""
+import asyncio
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.services import change_stream_consumer
+from app.services.change_stream_consumer import ChangeStreamConsumer
+
+
+def orchard(orchard_id, user_id, fitness=0.5, state=True):
+    return {
+        "_id": orchard_id,
+        "userId": user_id,
+        "name": f"Huerto {orchard_id}",
+        "description": "",
+        "countPlants": 4,
+        "streakOfDays": 5,
+        "state": state,
+        "objective": "alimenticio",
+        "metrics": {"fitness": fitness},
+        "createdAt": datetime.now(),
+    }
+
+
+def change(op, doc_id, full_document=None, token=None):
+    event = {"_id": {"_data": token or f"tok-{doc_id}-{op}"}, "operationType": op, "documentKey": {"_id": doc_id}}
+    if full_document is not None:
+        event["fullDocument"] = full_document
+    return event
+
+
+def entry(orchard_id, user_id, score):
+    return {"orchardId": orchard_id, "userId": user_id, "name": orchard_id, "shortDescription": "",
+            "estimatedWeeklyWater": 1.0, "maintenanceMinutes": 30, "fitness": 0.5,
+            "objective": "alimenticio", "baseScore": score}
+
+
+@pytest_asyncio.fixture
+async def db():
+    database = AsyncMongoMockClient()["test_db"]
+    await database.users.insert_many([
+        {"_id": "u1", "cluster_id": 0},
+        {"_id": "u2", "cluster_id": 1},
+    ])
+    await database.cluster_recommendations.insert_many([
+        {"_id": 0, "orchards": [entry("o1", "u1", 0.4)]},
+        {"_id": 1, "orchards": [entry("o2", "u2", 0.3)]},
+    ])
+    return database
+
+
+async def cluster_ids(db, cluster_id):
+    doc = await db.cluster_recommendations.find_one({"_id": cluster_id})
+    return [e["orchardId"] for e in doc["orchards"]]
+
+
+@pytest.mark.asyncio
+async def test_insert_and_delete_orchards(db):
+    """Inserciones entran a la lista del cluster del dueño y borrados salen."""
+    consumer = ChangeStreamConsumer(db, batch_window_ms=10, max_batch=10)
+
+    await consumer.apply_batch([
+        ("orchards", change("insert", "o3", orchard("o3", "u1", fitness=1.0))),
+        ("orchards", change("delete", "o2")),
+    ])
+
+    assert await cluster_ids(db, 0) == ["o3", "o1"]
+    assert await cluster_ids(db, 1) == []
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_per_document(db):
+    """Varios eventos del mismo huerto se aplican una vez con el último estado."""
+    consumer = ChangeStreamConsumer(db, batch_window_ms=10, max_batch=10)
+
+    result = await consumer.apply_batch([
+        ("orchards", change("insert", "o3", orchard("o3", "u1"), token="t1")),
+        ("orchards", change("update", "o3", orchard("o3", "u1"), token="t2")),
+        ("orchards", change("update", "o3", orchard("o3", "u1", state=False), token="t3")),
+    ])
+
+    assert result["events"] == 3
+    assert result["coalesced"] == 1
+    assert await cluster_ids(db, 0) == ["o1"]
+
+    state = await db.change_stream_state.find_one({"_id": "orchards"})
+    assert state["resume_token"] == {"_data": "t3"}
+
+
+@pytest.mark.asyncio
+async def test_orchard_moves_between_clusters(db):
+    """Si el dueño del huerto está en otro cluster, se mueve de lista."""
+    consumer = ChangeStreamConsumer(db, batch_window_ms=10, max_batch=10)
+
+    await consumer.apply_batch([("orchards", change("update", "o1", orchard("o1", "u2")))])
+
+    assert await cluster_ids(db, 0) == []
+    assert set(await cluster_ids(db, 1)) == {"o1", "o2"}
+
+
+@pytest.mark.asyncio
+async def test_user_delete_removes_their_orchards(db):
+    consumer = ChangeStreamConsumer(db, batch_window_ms=10, max_batch=10)
+
+    await consumer.apply_batch([("users", change("delete", "u1"))])
+
+    assert await cluster_ids(db, 0) == []
+
+
+@pytest.mark.asyncio
+async def test_only_users_without_cluster_are_assigned_online(db, monkeypatch):
+    """Con ONLINE_CENTROID_UPDATES se asignan los usuarios del batch que no tienen cluster."""
+    assigned = []
+
+    class RecordingUpdater:
+        async def assign_users(self, db, user_ids):
+            assigned.extend(user_ids)
+            return len(user_ids)
+
+    monkeypatch.setattr(settings, "ONLINE_CENTROID_UPDATES", True)
+    monkeypatch.setattr(change_stream_consumer, "online_centroids", RecordingUpdater())
+    consumer = ChangeStreamConsumer(db, batch_window_ms=10, max_batch=10)
+
+    result = await consumer.apply_batch([
+        ("users", change("insert", "u3", {"_id": "u3", "experience_level": 1})),
+        ("users", change("update", "u1", {"_id": "u1", "cluster_id": 0})),
+        ("users", change("delete", "u2")),
+    ])
+
+    assert assigned == ["u3"]
+    assert result["users_assigned"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_window_groups_submitted_events(db):
+    """Eventos encolados dentro de la ventana forman un solo batch."""
+    consumer = ChangeStreamConsumer(db, batch_window_ms=50, max_batch=3)
+    for i in range(5):
+        consumer.submit("orchards", change("insert", f"x{i}", orchard(f"x{i}", "u1")))
+
+    first = await consumer._next_batch()
+    second = await asyncio.wait_for(consumer._next_batch(), timeout=1)
+
+    assert len(first) == 3
+    assert len(second) == 2
+
+
+@pytest.mark.asyncio
+async def test_lease_is_exclusive(db):
+    """Sólo un consumidor a la vez obtiene el lease."""
+    first = ChangeStreamConsumer(db, lease_seconds=30)
+    second = ChangeStreamConsumer(db, lease_seconds=30)
+
+    assert await first._acquire_lease()
+    assert not await second._acquire_lease()
+    assert await first._acquire_lease()
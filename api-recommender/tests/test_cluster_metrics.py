@@ -0,0 +1,66 @@
+"""Tests de las métricas de clustering con disimilaridad mixta."""
+import numpy as np
+import pytest
+from sklearn.metrics import silhouette_score
+
+from app.services.cluster_metrics import (
+    ClusterDistanceSums, centroid_costs, mixed_davies_bouldin, mixed_silhouette
+)
+
+
+@pytest.fixture
+def mixed_data():
+    rng = np.random.default_rng(7)
+    X_numeric = rng.normal(size=(150, 4))
+    X_categorical = rng.integers(0, 4, size=(150, 2))
+    labels = rng.integers(0, 4, size=150)
+    labels[0] = 4  # cluster unitario
+    return X_numeric, X_categorical, labels
+
+
+def test_block_matches_pairwise_sums(mixed_data):
+    """Las sumas por cluster desde agregados igualan sumar la matriz par a par."""
+    X_numeric, X_categorical, labels = mixed_data
+    X_categorical = X_categorical.copy()
+    X_categorical[60, 1] = -1  # código no visto
+    full = centroid_costs(X_numeric, X_categorical, X_numeric, X_categorical, 0.7)
+    expected = np.stack([full[20:45, labels == c].sum(axis=1) for c in range(5)], axis=1)
+
+    sums = ClusterDistanceSums(X_numeric, X_categorical, labels, 5, 0.7)
+
+    np.testing.assert_allclose(sums.block(20, 45), expected, atol=1e-9)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 3])
+def test_silhouette_matches_precomputed(mixed_data, n_jobs):
+    """Por bloques (varios bloques, con threads) igual a scikit-learn sobre la matriz completa."""
+    X_numeric, X_categorical, labels = mixed_data
+    full = centroid_costs(X_numeric, X_categorical, X_numeric, X_categorical, 0.7)
+    expected = silhouette_score(full, labels, metric='precomputed')
+
+    score = mixed_silhouette(X_numeric, X_categorical, labels, 0.7, n_jobs=n_jobs, block_rows=16)
+
+    assert score == pytest.approx(expected, abs=1e-9)
+    assert mixed_silhouette(X_numeric, X_categorical, np.zeros(150), 0.7) == 0.0
+
+
+def test_davies_bouldin_brute_force(mixed_data):
+    X_numeric, X_categorical, labels = mixed_data
+    labels = labels % 3
+    centroids_numeric = np.array([X_numeric[labels == c].mean(axis=0) for c in range(3)])
+    centroids_categorical = np.array([[c, c] for c in range(3)])
+
+    scatter = [
+        centroid_costs(X_numeric[labels == c], X_categorical[labels == c],
+                       centroids_numeric[[c]], centroids_categorical[[c]], 0.7).mean()
+        for c in range(3)
+    ]
+    separation = centroid_costs(centroids_numeric, centroids_categorical,
+                                centroids_numeric, centroids_categorical, 0.7)
+    expected = np.mean([
+        max((scatter[i] + scatter[j]) / separation[i, j] for j in range(3) if j != i)
+        for i in range(3)
+    ])
+
+    score = mixed_davies_bouldin(X_numeric, X_categorical, labels, centroids_numeric, centroids_categorical, 0.7)
+    assert score == pytest.approx(expected)
@@ -0,0 +1,98 @@
+"""Tests del predictor NumPy contra KPrototypes.predict."""
+import numpy as np
+import pytest
+from kmodes.kprototypes import KPrototypes
+
+from app.services.cluster_predictor import ClusterPredictor
+from app.services.feature_pipeline import FeaturePipeline
+from app.services.user_features import DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+from benchmarks.synthetic import generate_dataset, group_orchards_by_user
+
+
+@pytest.fixture(scope="module")
+def trained():
+    """Pipeline y K-Prototypes ajustados sobre usuarios sintéticos."""
+    users, orchards = generate_dataset(400, seed=3)
+    orchards_by_user = group_orchards_by_user(orchards)
+    pipeline = FeaturePipeline()
+    features = [pipeline.extract_user_features(u, orchards_by_user.get(u['_id'], [])) for u in users]
+    X_numeric, X_categorical = pipeline.fit_transform(features)
+
+    n_numeric = X_numeric.shape[1]
+    categorical = list(range(n_numeric, n_numeric + X_categorical.shape[1]))
+    model = KPrototypes(n_clusters=5, init='Huang', n_init=1, random_state=0)
+    model.fit(np.concatenate([X_numeric, X_categorical], axis=1), categorical=categorical)
+    return pipeline, model, features, X_numeric, X_categorical, categorical
+
+
+def test_predict_matches_kprototypes(trained):
+    """Etiquetas idénticas a KPrototypes.predict, también con códigos no vistos."""
+    pipeline, model, _, X_numeric, X_categorical, categorical = trained
+    predictor = ClusterPredictor.from_training(pipeline, model)
+
+    rng = np.random.default_rng(0)
+    X_num = np.vstack([X_numeric, rng.normal(scale=2.0, size=(200, X_numeric.shape[1]))])
+    X_cat = np.vstack([X_categorical, rng.integers(-1, 12, size=(200, X_categorical.shape[1]))])
+
+    expected = model.predict(np.concatenate([X_num, X_cat], axis=1), categorical=categorical)
+    np.testing.assert_array_equal(predictor.predict(X_num, X_cat), expected)
+
+
+def test_encode_matches_pipeline_transform(trained):
+    """encode() reproduce FeaturePipeline.transform sin pandas ni sklearn."""
+    pipeline, model, features, _, _, _ = trained
+    predictor = ClusterPredictor.from_training(pipeline, model)
+    sample = features[:50] + [{**features[0], 'objective': 'desconocido'}]
+
+    X_numeric, X_categorical = predictor.encode(sample)
+    expected_numeric, expected_categorical = pipeline.transform(sample)
+
+    np.testing.assert_allclose(X_numeric, expected_numeric)
+    np.testing.assert_array_equal(X_categorical, expected_categorical)
+    assert X_categorical[-1, 0] == -1
+
+
+def test_missing_location_uses_default_region(trained):
+    """latitude/longitude None caen en la región de la ubicación default, como en las features."""
+    pipeline, model, features, _, _, _ = trained
+    predictor = ClusterPredictor.from_training(pipeline, model)
+    # La región default no es la 0: un NaN (argmin de distancias NaN) caería en la 0
+    predictor.location_centers = np.array([[0.0, 0.0], [DEFAULT_LATITUDE, DEFAULT_LONGITUDE]])
+
+    regions = predictor._region([
+        {**features[0], 'latitude': None, 'longitude': None},
+        {key: value for key, value in features[0].items() if key not in ('latitude', 'longitude')},
+    ])
+    assert regions.tolist() == [1, 1]
+
+
+def test_save_load_roundtrip(trained, tmp_path):
+    pipeline, model, features, _, _, _ = trained
+    predictor = ClusterPredictor.from_training(pipeline, model)
+    path = tmp_path / "cluster_predictor"
+    predictor.save(path)
+
+    loaded = ClusterPredictor.load(path)
+
+    assert loaded.n_clusters == 5
+    np.testing.assert_array_equal(loaded.predict_features(features), predictor.predict_features(features))
+
+
+def test_project_centroids_into_refitted_pipeline(trained):
+    """Proyectar al mismo espacio es la identidad; con otro pipeline se traduce por valor."""
+    pipeline, model, features, _, _, _ = trained
+    predictor = ClusterPredictor.from_training(pipeline, model)
+
+    numeric, categorical = predictor.project_centroids(pipeline)
+    np.testing.assert_allclose(numeric, predictor.centroids_numeric)
+    np.testing.assert_array_equal(categorical, predictor.centroids_categorical)
+
+    refitted = FeaturePipeline()
+    refitted.fit_transform(features[:200])
+    numeric, categorical = predictor.project_centroids(refitted)
+    raw = numeric * refitted.scaler.scale_ + refitted.scaler.mean_
+    np.testing.assert_allclose(raw, pipeline.inverse_transform_numeric(predictor.centroids_numeric), atol=1e-9)
+    objective = refitted.feature_names_categorical.index('objective')
+    for row, code in enumerate(categorical[:, objective]):
+        expected = pipeline.category_vocabularies['objective'][predictor.centroids_categorical[row, objective]]
+        assert code == -1 or refitted.category_vocabularies['objective'][code] == expected
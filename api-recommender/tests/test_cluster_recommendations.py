@@ -0,0 +1,137 @@
+"""Tests unitarios para las listas top-N por cluster."""
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services import cluster_recommendations, recommendation_service
+
+
+def make_orchard(orchard_id, user_id, maintenance=60, objective="alimenticio", fitness=0.5, streak=10):
+    return {
+        "_id": orchard_id,
+        "userId": user_id,
+        "name": f"Huerto {orchard_id}",
+        "description": "Huerto de prueba",
+        "width": 2.0,
+        "height": 1.5,
+        "countPlants": 6,
+        "streakOfDays": streak,
+        "state": True,
+        "objective": objective,
+        "metrics": {"fitness": fitness},
+        "estimations": {"weeklyWaterLiters": 100, "maintenanceMinutesPerWeek": maintenance},
+        "createdAt": datetime.now(),
+    }
+
+
+@pytest_asyncio.fixture
+async def db():
+    """BD en memoria con dos clusters."""
+    database = AsyncMongoMockClient()["test_db"]
+    await database.users.insert_many([
+        {"_id": "u1", "cluster_id": 0, "experience_level": 1},
+        {"_id": "u2", "cluster_id": 0, "experience_level": 2},
+        {"_id": "u3", "cluster_id": 0, "experience_level": 2},
+        {"_id": "u4", "cluster_id": 1, "experience_level": 3},
+    ])
+    await database.orchards.insert_many([
+        make_orchard("o1", "u1", fitness=0.9),
+        make_orchard("o2", "u2", fitness=0.8, objective="medicinal"),
+        make_orchard("o3", "u3", fitness=0.1),
+        make_orchard("o4", "u4", fitness=1.0),
+    ])
+    return database
+
+
+def test_rank_candidates_keeps_top_n():
+    """Sólo se conservan los top_n con mayor score base."""
+    orchards = [make_orchard(f"o{i}", f"u{i}", fitness=i / 10) for i in range(10)]
+
+    entries = cluster_recommendations.rank_candidates(orchards, None, 0, top_n=3)
+
+    assert [e["orchardId"] for e in entries] == ["o9", "o8", "o7"]
+
+
+def test_cluster_affinity_uses_profile_features():
+    """Con perfil, los huertos cercanos a las medias del cluster tienen mayor afinidad."""
+    names = ["avg_orchard_area", "avg_maintenance_minutes", "avg_count_plants", "avg_streak"]
+    profile = {
+        "feature_names_numeric": names,
+        "feature_means": [[3.0, 60.0, 6.0, 10.0]],
+        "feature_stds": [[1.0, 10.0, 2.0, 5.0]],
+    }
+    close = cluster_recommendations.orchard_summary(make_orchard("o1", "u1", maintenance=60))
+    far = cluster_recommendations.orchard_summary(make_orchard("o2", "u2", maintenance=400, streak=90))
+
+    assert cluster_recommendations.cluster_affinity(close, profile, 0) > 0.9
+    assert cluster_recommendations.cluster_affinity(far, profile, 0) < 0.6
+
+
+def test_rank_for_user_filters_own_and_boosts_objective():
+    """Se excluyen huertos propios y se favorece el objetivo del usuario."""
+    entries = [
+        {"orchardId": "a", "userId": "me", "name": "a", "shortDescription": "", "estimatedWeeklyWater": 1.0,
+         "maintenanceMinutes": 30, "fitness": 0.5, "objective": "alimenticio", "baseScore": 0.9},
+        {"orchardId": "b", "userId": "x", "name": "b", "shortDescription": "", "estimatedWeeklyWater": 1.0,
+         "maintenanceMinutes": 30, "fitness": 0.5, "objective": "alimenticio", "baseScore": 0.6},
+        {"orchardId": "c", "userId": "y", "name": "c", "shortDescription": "", "estimatedWeeklyWater": 1.0,
+         "maintenanceMinutes": 30, "fitness": 0.5, "objective": "medicinal", "baseScore": 0.7},
+    ]
+    user = {"_id": "me", "experience_level": 2}
+    user_orchards = [{"_id": "a", "objective": "medicinal"}]
+
+    ranked = cluster_recommendations.rank_for_user(entries, user, user_orchards, limit=10)
+
+    assert [r["orchardId"] for r in ranked] == ["c", "b"]
+    assert "baseScore" not in ranked[0]
+
+
+@pytest.mark.asyncio
+async def test_recommendations_served_from_cluster_list(db):
+    """Tras construir las listas, las recomendaciones salen del documento del cluster."""
+    stored = await cluster_recommendations.build_cluster_top_lists(db, n_clusters=2, cluster_profiles=None, top_n=10)
+    assert stored == {0: 3, 1: 1}
+
+    # Un huerto nuevo no aparece hasta recalcular: prueba que no se escanea el cluster
+    await db.orchards.insert_one(make_orchard("o5", "u3", fitness=1.0))
+
+    result = await recommendation_service.get_recommendations_for_user(db, "u1", limit=5)
+
+    ids = [r["orchardId"] for r in result["recommendations"]]
+    assert result["clusterIdAssigned"] == 0
+    assert "o1" not in ids
+    assert "o5" not in ids
+    assert set(ids) == {"o2", "o3"}
+
+
+@pytest.mark.asyncio
+async def test_recommendations_fallback_without_cluster_list(db):
+    """Sin lista precalculada se rankea el cluster completo."""
+    result = await recommendation_service.get_recommendations_for_user(db, "u1", limit=5)
+
+    assert {r["orchardId"] for r in result["recommendations"]} == {"o2", "o3"}
+
+
+@pytest.mark.asyncio
+async def test_batch_recommendations_reports_missing_users(db):
+    """El batch deduplica ids y reporta los usuarios inexistentes sin fallar."""
+    await cluster_recommendations.build_cluster_top_lists(db, n_clusters=2, cluster_profiles=None, top_n=10)
+
+    result = await recommendation_service.get_recommendations_for_users(db, ["u1", "nope", "u4", "u1"], limit=5)
+
+    assert [r["userId"] for r in result["results"]] == ["u1", "u4"]
+    assert result["notFound"] == ["nope"]
+
+
+def test_merge_neighbor_entries_boosts_and_dedupes():
+    """Los candidatos de vecinos reciben boost y no se duplican."""
+    cluster_entries = [{"orchardId": "a", "baseScore": 0.5}, {"orchardId": "b", "baseScore": 0.4}]
+    neighbor_entries = [{"orchardId": "b", "baseScore": 0.4}, {"orchardId": "c", "baseScore": 0.1}]
+
+    merged = {e["orchardId"]: e["baseScore"] for e in
+              cluster_recommendations.merge_neighbor_entries(cluster_entries, neighbor_entries)}
+
+    assert merged["a"] == 0.5
+    assert merged["b"] == pytest.approx(0.4 * (1 + cluster_recommendations.NEIGHBOR_BOOST))
+    assert set(merged) == {"a", "b", "c"}
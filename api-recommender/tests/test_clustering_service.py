@@ -0,0 +1,167 @@
+"""Tests unitarios para ClusteringService."""
+import pytest
+import numpy as np
+
+from app.services.clustering_service import ClusteringService, WarmStart, match_cluster_ids
+
+
+@pytest.fixture
+def mixed_data():
+    """Datos mixtos con tres grupos bien separados."""
+    rng = np.random.default_rng(0)
+    centers = np.array([[-3.0, -3.0, 0.0], [0.0, 3.0, 3.0], [3.0, -1.0, -3.0]])
+    X_numeric = np.vstack([c + rng.normal(scale=0.3, size=(20, 3)) for c in centers])
+    X_categorical = np.repeat(np.array([[0, 1], [1, 0], [2, 2]]), 20, axis=0)
+    user_ids = [f"user-{i}" for i in range(len(X_numeric))]
+    return X_numeric, X_categorical, user_ids
+
+
+def test_compute_cluster_profiles():
+    """Medias y desviaciones por cluster; clusters vacíos quedan en 0."""
+    X = np.array([[1.0, 2.0], [3.0, 4.0], [10.0, 10.0]])
+    labels = np.array([0, 0, 1])
+
+    means, stds = ClusteringService.compute_cluster_profiles(X, labels, n_clusters=3)
+
+    np.testing.assert_allclose(means[0], [2.0, 3.0])
+    np.testing.assert_allclose(stds[0], [1.0, 1.0])
+    np.testing.assert_allclose(means[1], [10.0, 10.0])
+    np.testing.assert_allclose(means[2], [0.0, 0.0])
+
+
+def test_train_stores_split_centroids(mixed_data):
+    """Los centroides se separan en parte numérica y categórica."""
+    X_numeric, X_categorical, user_ids = mixed_data
+    clustering = ClusteringService()
+
+    result = clustering.train(X_numeric, X_categorical, user_ids)
+    metadata = result['cluster_metadata']
+    k = result['metrics']['n_clusters']
+
+    assert np.asarray(metadata['centroids_numeric']).shape == (k, X_numeric.shape[1])
+    assert np.asarray(metadata['centroids_categorical']).shape == (k, X_categorical.shape[1])
+    assert np.asarray(metadata['feature_means']).shape == (k, X_numeric.shape[1])
+    assert len(result['cluster_assignments']) == len(user_ids)
+
+
+def test_train_records_phase_timings(mixed_data):
+    """train() registra spans por fase y por cada k evaluado."""
+    X_numeric, X_categorical, user_ids = mixed_data
+    clustering = ClusteringService()
+
+    result = clustering.train(X_numeric, X_categorical, user_ids)
+    timings = result['timings']
+
+    assert set(timings['phases']) == {"k_search", "fit", "silhouette", "save", "assignments"}
+    evaluated_k = {span['k'] for span in timings['k_candidates'] if span['name'] == "k_fit"}
+    assert min(evaluated_k) == 3
+    assert clustering.metrics['fit_seconds'] == timings['phases']['fit']
+
+
+def test_train_writes_profile_when_enabled(mixed_data, monkeypatch):
+    """Con TRAINING_PROFILER=cprofile el perfil queda junto al modelo."""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "TRAINING_PROFILER", "cprofile")
+    X_numeric, X_categorical, user_ids = mixed_data
+    clustering = ClusteringService()
+
+    result = clustering.train(X_numeric, X_categorical, user_ids)
+
+    profile_file = result['timings']['profile_file']
+    assert profile_file.endswith(".prof")
+    assert (clustering.model_path / profile_file.split("/")[-1]).exists()
+
+
+def test_profile_is_stored_in_version_being_built(mixed_data, monkeypatch, tmp_path):
+    """Con registro el perfil queda en el staging de la versión, no en la raíz compartida."""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "TRAINING_PROFILER", "cprofile")
+    X_numeric, X_categorical, user_ids = mixed_data
+
+    for name in ("first", "second"):
+        (tmp_path / name).mkdir()
+        result = ClusteringService(artifact_dir=tmp_path / name).train(X_numeric, X_categorical, user_ids)
+        assert result['timings']['profile_file'] == str(tmp_path / name / "training_profile.prof")
+
+    assert (tmp_path / "first" / "training_profile.prof").exists()
+
+
+def test_save_load_artifact_predicts_same_labels(mixed_data):
+    """El artefacto recargado (sin objeto KPrototypes) predice igual que el modelo."""
+    X_numeric, X_categorical, user_ids = mixed_data
+    clustering = ClusteringService()
+    clustering.train(X_numeric, X_categorical, user_ids)
+
+    loaded = ClusteringService()
+    loaded.load_model()
+
+    assert loaded.model is None
+    assert loaded.cluster_metadata['cluster_sizes'] == clustering.cluster_metadata['cluster_sizes']
+    np.testing.assert_array_equal(
+        loaded.predict(X_numeric, X_categorical),
+        clustering.predict(X_numeric, X_categorical)
+    )
+
+
+def test_predict_uses_numpy_assignment_with_model_loaded(mixed_data):
+    """Con el objeto KPrototypes en memoria predict no lo usa: mismo argmin que el predictor."""
+    X_numeric, X_categorical, user_ids = mixed_data
+    clustering = ClusteringService()
+    result = clustering.train(X_numeric, X_categorical, user_ids)
+
+    def kprototypes_predict(*args, **kwargs):
+        raise AssertionError("KPrototypes.predict no debe usarse")
+
+    clustering.model.predict = kprototypes_predict
+    labels = clustering.predict(X_numeric, X_categorical)
+    assert labels.tolist() == [result['cluster_assignments'][user_id] for user_id in user_ids]
+
+
+def test_match_cluster_ids_keeps_previous_ids():
+    """Centroides permutados recuperan su id; al crecer o bajar k los ids siguen siendo 0..k-1."""
+    previous_numeric = np.array([[0.0, 0.0], [5.0, 5.0], [-5.0, 5.0]])
+    previous_categorical = np.array([[0], [1], [2]])
+
+    ids = match_cluster_ids(previous_numeric[[2, 0, 1]], previous_categorical[[2, 0, 1]],
+                            previous_numeric, previous_categorical, gamma=0.5)
+    np.testing.assert_array_equal(ids, [2, 0, 1])
+
+    grown = np.vstack([previous_numeric[[1, 0]], [[9.0, -9.0]], previous_numeric[[2]]])
+    ids = match_cluster_ids(grown, np.array([[1], [0], [3], [2]]),
+                            previous_numeric, previous_categorical, gamma=0.5)
+    np.testing.assert_array_equal(ids, [1, 0, 3, 2])
+
+    # Sin el cluster 1, el que era 2 toma el id libre
+    ids = match_cluster_ids(previous_numeric[[2, 0]], previous_categorical[[2, 0]],
+                            previous_numeric, previous_categorical, gamma=0.5)
+    np.testing.assert_array_equal(ids, [1, 0])
+
+
+def test_warm_start_skips_sweep_and_keeps_ids(mixed_data):
+    """Con el k anterior aún óptimo se ajusta sólo ese k y los ids siguen a los centroides previos."""
+    X_numeric, X_categorical, user_ids = mixed_data
+    cold = ClusteringService()
+    cold_result = cold.train(X_numeric, X_categorical, user_ids)
+
+    # Modelo anterior con los ids en otro orden
+    order = np.array([2, 0, 1])
+    warm_start = WarmStart(
+        np.asarray(cold.cluster_metadata['centroids_numeric'])[order],
+        np.asarray(cold.cluster_metadata['centroids_categorical'])[order],
+        silhouette=cold.metrics['silhouette_score']
+    )
+
+    warm = ClusteringService()
+    result = warm.train(X_numeric, X_categorical, user_ids, warm_start=warm_start)
+
+    assert result['metrics']['warm_start'] is True
+    fits = [span for span in result['timings']['k_candidates'] if span['name'] == "k_fit"]
+    assert [(span['k'], span['warm_start']) for span in fits] == [(3, True)]
+    remap = np.argsort(order)
+    for user_id, cluster_id in cold_result['cluster_assignments'].items():
+        assert result['cluster_assignments'][user_id] == remap[cluster_id]
+    # El modelo quedó renumerado: predict usa los mismos ids
+    np.testing.assert_array_equal(
+        warm.predict(X_numeric, X_categorical),
+        [result['cluster_assignments'][user_id] for user_id in user_ids]
+    )
@@ -0,0 +1,79 @@
+"""Tests del índice cold-start para usuarios sin cluster."""
+import numpy as np
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services import recommendation_service
+from app.services.cold_start_index import ColdStartIndex, bucket_cluster_shares, build_cold_start_index
+
+
+def entry(orchard_id, user_id, score, maintenance=30):
+    return {"orchardId": orchard_id, "userId": user_id, "name": orchard_id, "shortDescription": "",
+            "estimatedWeeklyWater": 1.0, "maintenanceMinutes": maintenance, "fitness": 0.5,
+            "objective": "alimenticio", "baseScore": score}
+
+
+@pytest_asyncio.fixture
+async def db():
+    database = AsyncMongoMockClient()["test_db"]
+    await database.cluster_recommendations.insert_many([
+        {"_id": 0, "orchards": [entry("a1", "u1", 0.9), entry("a2", "u1", 0.8)]},
+        {"_id": 1, "orchards": [entry("b1", "u2", 0.7), entry("b2", "u2", 0.6)]},
+    ])
+    await database.users.insert_many([
+        {"_id": "new", "experience_level": 1},
+        {"_id": "u1", "experience_level": 3, "cluster_id": 0},
+    ])
+    # Región 0 = usuarios cerca de (0, 0); región 1 = cerca de (10, 10)
+    await build_cold_start_index(
+        database,
+        regions=[0, 0, 0, 1, 1, 1],
+        experience_levels=[1, 1, 3, 1, 3, 3],
+        labels=[1, 1, 0, 0, 0, 0],
+        n_clusters=2,
+        location_centers=np.array([[0.0, 0.0], [10.0, 10.0]]),
+        top_n=3,
+        trained_at="2026-01-01T00:00:00"
+    )
+    return database
+
+
+def test_bucket_shares_include_fallbacks():
+    shares = bucket_cluster_shares([0, 0, 1], [1.0, 2.0, 1.0], [0, 1, 1], n_clusters=2)
+
+    np.testing.assert_allclose(shares["0:1"], [1.0, 0.0])
+    np.testing.assert_allclose(shares["0:*"], [0.5, 0.5])
+    np.testing.assert_allclose(shares["*:1"], [0.5, 0.5])
+    np.testing.assert_allclose(shares["*:*"], [1 / 3, 2 / 3])
+    assert "1:2" not in shares
+
+
+@pytest.mark.asyncio
+async def test_lookup_uses_most_specific_bucket(db):
+    """Otro worker carga el índice de la BD y resuelve por bucket o respaldo."""
+    index = ColdStartIndex(ttl_seconds=60)
+
+    entries = await index.get_entries(db, 1, latitude=0.5, longitude=0.2)
+    assert [e["orchardId"] for e in entries] == ["b1", "b2"]
+
+    # Región 1 sin usuarios de experiencia 2 -> bucket (1, *)
+    entries = index.lookup(2, latitude=9.0, longitude=11.0)
+    assert [e["orchardId"] for e in entries] == ["a1", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_new_user_served_from_index(db):
+    """Sin cluster_id se responde desde el índice, no desde el cluster 0."""
+    result = await recommendation_service.get_cold_start_recommendations(
+        db, "new", experience_level=1, latitude=0.0, longitude=0.0, limit=3
+    )
+    assert result["clusterIdAssigned"] is None
+    assert [r["orchardId"] for r in result["recommendations"]] == ["b1", "b2"]
+
+    via_user = await recommendation_service.get_recommendations_for_user(db, "new", limit=3)
+    assert via_user["clusterIdAssigned"] is None
+    assert via_user["recommendations"]
+
+    # Usuarios con cluster siguen por el camino del cluster
+    assert await recommendation_service.get_cold_start_recommendations(db, "u1") is None
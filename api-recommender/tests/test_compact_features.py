@@ -0,0 +1,94 @@
+"""Tests de las matrices compactas (float32 / int8) en entrenamiento y predictor."""
+import numpy as np
+import pytest
+from kmodes.kprototypes import KPrototypes
+
+from app.core.config import settings
+from app.services import clustering_service
+from app.services.cluster_predictor import ClusterPredictor
+from app.services.clustering_service import ClusteringService
+from app.services.compact_features import categorical_dtype
+from app.services.feature_pipeline import FeaturePipeline
+from benchmarks.synthetic import generate_dataset, group_orchards_by_user
+
+
+@pytest.fixture(scope="module")
+def features():
+    users, orchards = generate_dataset(2000, seed=11)
+    orchards_by_user = group_orchards_by_user(orchards)
+    pipeline = FeaturePipeline(compact=False)
+    return [pipeline.extract_user_features(u, orchards_by_user.get(u['_id'], [])) for u in users]
+
+
+def test_categorical_dtype_covers_unseen_code():
+    assert categorical_dtype(10) == np.int8
+    assert categorical_dtype(127) == np.int8
+    assert categorical_dtype(128) == np.int16
+    assert categorical_dtype(40_000) == np.int32
+
+
+def test_compact_pipeline_matches_float64(features):
+    standard = FeaturePipeline(compact=False)
+    compact = FeaturePipeline(compact=True)
+    X_numeric, X_categorical = standard.fit_transform(features)
+    C_numeric, C_categorical = compact.fit_transform(features)
+
+    assert (C_numeric.dtype, C_categorical.dtype) == (np.float32, np.int8)
+    assert C_numeric.flags['F_CONTIGUOUS'] and C_categorical.flags['F_CONTIGUOUS']
+    np.testing.assert_array_equal(C_numeric, X_numeric.astype(np.float32))
+    np.testing.assert_array_equal(C_categorical, X_categorical)
+
+    sample = features[:100] + [{**features[0], 'objective': 'desconocido'}]
+    T_numeric, T_categorical = compact.transform(sample)
+    assert T_numeric.dtype == np.float32 and T_categorical[-1, 0] == -1
+
+
+def test_compact_predictor_labels_match(features, monkeypatch):
+    """encode() compacto reproduce el pipeline y asigna las mismas etiquetas que en float64."""
+    pipeline = FeaturePipeline(compact=False)
+    X_numeric, X_categorical = pipeline.fit_transform(features)
+    n_numeric = X_numeric.shape[1]
+    model = KPrototypes(n_clusters=6, init='Huang', n_init=1, random_state=0)
+    model.fit(
+        np.concatenate([X_numeric[:500], X_categorical[:500]], axis=1),
+        categorical=list(range(n_numeric, n_numeric + X_categorical.shape[1]))
+    )
+    predictor = ClusterPredictor.from_training(pipeline, model)
+    expected = predictor.predict_features(features)
+
+    monkeypatch.setattr(settings, "COMPACT_FEATURES", True)
+    C_numeric, C_categorical = predictor.encode(features)
+    pipeline.compact = True
+    P_numeric, P_categorical = pipeline.transform(features)
+
+    assert C_numeric.dtype == np.float32 and C_categorical.dtype == np.int8
+    np.testing.assert_array_equal(C_numeric, P_numeric)
+    np.testing.assert_array_equal(C_categorical, P_categorical)
+    np.testing.assert_array_equal(predictor.predict(C_numeric, C_categorical), expected)
+
+
+def test_train_combines_features_once(monkeypatch):
+    """El barrido de k y el ajuste final comparten una sola matriz combinada."""
+    rng = np.random.default_rng(0)
+    centers = np.array([[-3.0, -3.0, 0.0], [0.0, 3.0, 3.0], [3.0, -1.0, -3.0]])
+    X_numeric = np.vstack([c + rng.normal(scale=0.3, size=(20, 3)) for c in centers])
+    X_categorical = np.repeat(np.array([[0, 1], [1, 0], [2, 2]]), 20, axis=0)
+    user_ids = [f"user-{i}" for i in range(len(X_numeric))]
+
+    calls = []
+    original = clustering_service.combine
+
+    def counting_combine(*args):
+        calls.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(clustering_service, "combine", counting_combine)
+    standard = ClusteringService().train(X_numeric, X_categorical, user_ids)
+    assert len(calls) == 1
+
+    compact = ClusteringService().train(
+        np.asfortranarray(X_numeric, dtype=np.float32), np.asfortranarray(X_categorical, dtype=np.int8), user_ids
+    )
+    # Sin warm start los ids son arbitrarios: misma partición de usuarios, salvo renumeración
+    pairs = {(standard['cluster_assignments'][u], compact['cluster_assignments'][u]) for u in user_ids}
+    assert len(pairs) == len({a for a, _ in pairs}) == len({b for _, b in pairs})
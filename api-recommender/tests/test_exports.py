@@ -0,0 +1,100 @@
+"""Tests de los exports NDJSON en streaming."""
+import json
+
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services import export_service
+from app.services.training_cache import TrainingHistoryCache
+
+
+def entry(orchard_id, user_id, score):
+    return {"orchardId": orchard_id, "userId": user_id, "name": orchard_id, "shortDescription": "",
+            "estimatedWeeklyWater": 1.0, "maintenanceMinutes": 30, "fitness": 0.5,
+            "objective": "alimenticio", "baseScore": score}
+
+
+@pytest_asyncio.fixture
+async def db(monkeypatch):
+    database = AsyncMongoMockClient()["test_db"]
+    await database.users.insert_many([
+        {"_id": f"u{i:02d}", "cluster_id": i % 2, "experience_level": 2} for i in range(25)
+    ])
+    await database.orchards.insert_many([
+        {"_id": "o1", "userId": "u01", "state": True}, {"_id": "o2", "userId": "u02", "state": True}
+    ])
+    await database.cluster_recommendations.insert_many([
+        {"_id": 0, "orchards": [entry("o2", "u02", 0.9)]},
+        {"_id": 1, "orchards": [entry("o1", "u01", 0.8)]},
+    ])
+    await database.training_history.insert_one({"trained_at": "2026-05-01T00:00:00"})
+    monkeypatch.setattr(export_service, "training_history_cache", TrainingHistoryCache(ttl_seconds=0))
+    monkeypatch.setattr(export_service.settings, "EXPORT_BATCH_SIZE", 10)
+    return database
+
+
+async def read_lines(stream):
+    return [json.loads(line) async for chunk in stream for line in chunk.decode().splitlines()]
+
+
+async def export_all(db, stream_fn, page_size=None, **kwargs):
+    """Export completo reanudando desde la última línea cursor de cada página."""
+    records, cursor, pages = [], None, 0
+    while True:
+        trained_at, after = await export_service.resolve_export(db, cursor)
+        lines = await read_lines(stream_fn(db, trained_at, after, limit=page_size, **kwargs))
+        pages += 1
+        records.extend(line for line in lines if "cursor" not in line)
+        cursor = [line["cursor"] for line in lines if "cursor" in line][-1]
+        if cursor is None:
+            return records, pages
+
+
+@pytest.mark.asyncio
+async def test_assignments_resume_across_pages(db):
+    """Las páginas reanudadas dan el mismo export que una sola respuesta."""
+    full, pages = await export_all(db, export_service.stream_assignments)
+    paged, paged_pages = await export_all(db, export_service.stream_assignments, page_size=7)
+
+    assert pages == 1 and paged_pages == 4
+    assert paged == full
+    assert [r["userId"] for r in full] == [f"u{i:02d}" for i in range(25)]
+
+    only_one, _ = await export_all(db, export_service.stream_assignments, cluster_id=1)
+    assert {r["clusterId"] for r in only_one} == {1} and len(only_one) == 12
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_after_every_batch(db):
+    trained_at, _ = await export_service.resolve_export(db, None)
+    lines = await read_lines(export_service.stream_assignments(db, trained_at))
+
+    cursors = [i for i, line in enumerate(lines) if "cursor" in line]
+    # 25 usuarios en batches de 10: 10 + 10 + 5 registros, cada uno seguido de su cursor
+    assert cursors == [10, 21, 27, 28]
+    assert lines[-1] == {"cursor": None}
+
+
+@pytest.mark.asyncio
+async def test_recommendations_export_excludes_own_orchards(db):
+    records, _ = await export_all(db, export_service.stream_recommendations, page_size=10, top_n=5)
+
+    by_user = {r["userId"]: r for r in records}
+    assert len(by_user) == 25
+    assert by_user["u02"]["recommendations"] == []
+    assert [r["orchardId"] for r in by_user["u04"]["recommendations"]] == ["o2"]
+    assert [r["orchardId"] for r in by_user["u03"]["recommendations"]] == ["o1"]
+
+
+@pytest.mark.asyncio
+async def test_cursor_from_previous_training_is_rejected(db):
+    trained_at, _ = await export_service.resolve_export(db, None)
+    token = export_service.encode_cursor(trained_at, "u05")
+
+    await db.training_history.insert_one({"trained_at": "2026-06-01T00:00:00"})
+
+    with pytest.raises(export_service.StaleCursorError):
+        await export_service.resolve_export(db, token)
+    with pytest.raises(ValueError):
+        await export_service.resolve_export(db, "not-a-cursor")
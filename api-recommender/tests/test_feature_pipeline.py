@@ -155,3 +155,21 @@ def test_transform_after_fit():
 
     assert X_numeric_new.shape[0] == 1
     assert X_categorical_new.shape[0] == 1
+
+
+def test_transform_reuses_fitted_category_codes():
+    """transform codifica con el vocabulario del ajuste, no con el del batch."""
+    pipeline = FeaturePipeline()
+    base = {'experience_level': 2, 'latitude': 16.75, 'longitude': -93.11}
+    pipeline.fit_transform([
+        {**base, 'objective': objective}
+        for objective in ['alimenticio', 'medicinal', 'sostenible'] * 3
+    ])
+
+    _, X_categorical = pipeline.transform([
+        {**base, 'objective': 'sostenible'},
+        {**base, 'objective': 'ornamental'},
+    ])
+
+    assert pipeline.category_vocabularies['objective'] == ['alimenticio', 'medicinal', 'sostenible']
+    assert X_categorical[:, 0].tolist() == [2, -1]
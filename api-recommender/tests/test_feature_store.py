@@ -0,0 +1,86 @@
+"""Tests del feature store persistente (colección user_features)."""
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services.change_stream_consumer import ChangeStreamConsumer
+from app.services.feature_store import feature_store
+from app.services.training_service import load_users_features_from_source
+from benchmarks.synthetic import generate_dataset
+
+
+@pytest_asyncio.fixture
+async def db():
+    database = AsyncMongoMockClient()["test_db"]
+    users, orchards = generate_dataset(40, seed=3)
+    await database.users.insert_many(users)
+    await database.orchards.insert_many(orchards)
+    return database
+
+
+def change(op, doc_id, full_document=None, updated_fields=None):
+    event = {"_id": {"_data": f"tok-{doc_id}-{op}"}, "operationType": op, "documentKey": {"_id": doc_id}}
+    if full_document is not None:
+        event["fullDocument"] = full_document
+    if updated_fields is not None:
+        event["updateDescription"] = {"updatedFields": updated_fields, "removedFields": []}
+    return event
+
+
+async def owned_orchard(db):
+    return await db.orchards.find_one({"userId": {"$ne": None}})
+
+
+@pytest.mark.asyncio
+async def test_store_matches_extraction_from_source(db):
+    """Las filas reproducen extract_user_features; un segundo sync no reescribe nada."""
+    source_ids, source_features = await load_users_features_from_source(db)
+    stats = await feature_store.sync(db)
+    store_ids, store_features = await feature_store.load_all(db)
+
+    assert stats == {"users": 40, "refreshed": 40, "removed": 0}
+    by_id = dict(zip(store_ids, store_features))
+    assert sorted(store_ids) == sorted(source_ids)
+    for user_id, expected in zip(source_ids, source_features):
+        assert by_id[user_id] == pytest.approx(expected)
+
+    assert (await feature_store.sync(db))["refreshed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_sync_refreshes_stale_and_orphan_rows(db):
+    await feature_store.sync(db)
+    orchard = await owned_orchard(db)
+    await db.orchards.update_one({"_id": orchard["_id"]}, {"$set": {"countPlants": 99, "updateAt": datetime.now()}})
+    removed = await db.users.find_one({"_id": {"$ne": orchard["userId"]}})
+    await db.users.delete_one({"_id": removed["_id"]})
+
+    stats = await feature_store.sync(db)
+
+    assert stats == {"users": 39, "refreshed": 1, "removed": 1}
+    source_ids, source_features = await load_users_features_from_source(db)
+    expected = dict(zip(source_ids, source_features))[orchard["userId"]]
+    assert await feature_store.get_features(db, orchard["userId"]) == pytest.approx(expected)
+    assert await feature_store.get_features(db, removed["_id"]) is None
+
+
+@pytest.mark.asyncio
+async def test_change_events_refresh_affected_rows(db):
+    """Eventos de huertos refrescan al dueño; updates sólo de cluster_id se ignoran."""
+    await feature_store.sync(db)
+    consumer = ChangeStreamConsumer(db, batch_window_ms=10, max_batch=10)
+    orchard = await owned_orchard(db)
+    owner = orchard["userId"]
+    before = await feature_store.get_features(db, owner)
+
+    await db.orchards.delete_one({"_id": orchard["_id"]})
+    result = await consumer.apply_batch([
+        ("orchards", change("delete", orchard["_id"])),
+        ("users", change("update", "user-0000002", updated_fields={"cluster_id": 3})),
+    ])
+
+    assert result["features_refreshed"] == 1
+    after = await feature_store.get_features(db, owner)
+    assert after["count_orchards"] == before["count_orchards"] - 1
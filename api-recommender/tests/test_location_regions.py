@@ -0,0 +1,69 @@
+"""Tests de la discretización de ubicación reutilizable."""
+import numpy as np
+import pytest
+
+from app.services.feature_pipeline import FeaturePipeline
+from app.services.location_regions import LocationRegions
+
+
+def make_features(locations):
+    return [
+        {'experience_level': 2, 'objective': 'alimenticio', 'latitude': lat, 'longitude': lon}
+        for lat, lon in locations
+    ]
+
+
+@pytest.fixture
+def locations():
+    rng = np.random.default_rng(0)
+    centers = np.array([[14.5, -92.5], [16.75, -93.11], [19.0, -94.0]])
+    return np.vstack([c + rng.normal(scale=0.2, size=(40, 2)) for c in centers])
+
+
+def test_fit_assigns_nearest_center(locations):
+    """assign() es el centro más cercano y reproduce las etiquetas de KMeans."""
+    from sklearn.cluster import KMeans
+
+    regions = LocationRegions.fit(locations, 3)
+    kmeans = KMeans(n_clusters=3, random_state=42, n_init=10).fit(locations)
+
+    np.testing.assert_array_equal(regions.assign(locations), kmeans.labels_)
+    assert regions.drift(locations) == pytest.approx(0.0)
+
+
+def test_pipeline_reuses_regions_until_drift(locations, monkeypatch):
+    """Se reutilizan sin drift; con drift o con otro número de regiones se reajustan."""
+    first = FeaturePipeline()
+    first.fit_transform(make_features(locations))
+    previous = first.location_regions
+
+    def fit_should_not_run(*args, **kwargs):
+        raise AssertionError("KMeans refit")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(LocationRegions, "fit", fit_should_not_run)
+        reused = FeaturePipeline(previous_location_regions=previous)
+        _, X_categorical = reused.fit_transform(make_features(locations[::-1]))
+    assert reused.location_regions is previous
+    assert reused.location_regions_reused
+    region = reused.feature_names_categorical.index('cluster_region')
+    np.testing.assert_array_equal(X_categorical[::-1, region], previous.assign(locations))
+
+    moved = FeaturePipeline(previous_location_regions=previous)
+    moved.fit_transform(make_features(locations + [1.0, 1.0]))
+    assert not moved.location_regions_reused
+
+    fewer = FeaturePipeline(previous_location_regions=previous)
+    fewer.fit_transform(make_features(locations[:50]))
+    assert not fewer.location_regions_reused
+    assert fewer.location_regions.n_regions == 5
+
+
+def test_save_load_roundtrip(locations, tmp_path):
+    regions = LocationRegions.fit(locations, 3)
+    regions.save(tmp_path / "location_regions")
+
+    loaded = LocationRegions.load(tmp_path / "location_regions")
+
+    np.testing.assert_array_equal(loaded.centers, regions.centers)
+    assert loaded.reference_cost == regions.reference_cost
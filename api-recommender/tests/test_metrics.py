@@ -0,0 +1,46 @@
+"""Tests para las métricas Prometheus."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.core.metrics import PHASE_LATENCY, observe_phase, render_metrics
+
+ROOT = Path(__file__).resolve().parents[1]
+
+WORKER_SCRIPT = """
+from app.core.metrics import record_cache
+record_cache("training_history", hit=True)
+"""
+
+RENDER_SCRIPT = """
+from app.core.metrics import render_metrics
+print(render_metrics()[0].decode())
+"""
+
+
+def run_with_multiproc_dir(script, multiproc_dir):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(multiproc_dir)}
+    return subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+
+
+def test_observe_phase_records_duration():
+    before = PHASE_LATENCY.labels(phase="test_phase")._sum.get()
+
+    with observe_phase("test_phase"):
+        pass
+
+    assert PHASE_LATENCY.labels(phase="test_phase")._sum.get() >= before
+    assert b"recommender_phase_duration_seconds" in render_metrics()[0]
+
+
+def test_metrics_aggregate_across_processes(tmp_path):
+    """En modo multiproceso /metrics suma los contadores de todos los workers."""
+    run_with_multiproc_dir(WORKER_SCRIPT, tmp_path)
+    run_with_multiproc_dir(WORKER_SCRIPT, tmp_path)
+
+    output = run_with_multiproc_dir(RENDER_SCRIPT, tmp_path)
+
+    assert 'recommender_cache_requests_total{cache="training_history",result="hit"} 2.0' in output
@@ -0,0 +1,175 @@
+"""Tests del micro-batching de llamadas concurrentes y del webhook de registro."""
+import asyncio
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.microbatch import MicroBatcher
+from app.services import recommendation_service
+from app.services.cold_start_index import build_cold_start_index
+
+
+def entry(orchard_id, user_id, score):
+    return {"orchardId": orchard_id, "userId": user_id, "name": orchard_id, "shortDescription": "",
+            "estimatedWeeklyWater": 1.0, "maintenanceMinutes": 30, "fitness": 0.5,
+            "objective": "alimenticio", "baseScore": score}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_form_batches():
+    batches = []
+
+    async def handler(key, items):
+        batches.append((key, list(items)))
+        await asyncio.sleep(0)
+        return [ValueError(item) if item == "bad" else item.upper() for item in items]
+
+    batcher = MicroBatcher("test_batches", handler, window_ms=20, max_batch=3)
+    results = await asyncio.gather(
+        *(batcher.submit("db", item) for item in ["a", "b", "bad", "c"]),
+        batcher.submit("other", "d"),
+        return_exceptions=True
+    )
+
+    # max_batch cierra el primer batch; el resto espera la ventana, separado por clave
+    assert results[:2] == ["A", "B"] and isinstance(results[2], ValueError)
+    assert results[3:] == ["C", "D"]
+    assert sorted(batches) == [("db", ["a", "b", "bad"]), ("db", ["c"]), ("other", ["d"])]
+    assert batcher.pending() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_batch():
+    release = asyncio.Event()
+
+    async def handler(key, items):
+        await release.wait()
+        return items
+
+    batcher = MicroBatcher("test_cancel", handler, window_ms=1, max_batch=10)
+    cancelled = asyncio.ensure_future(batcher.submit("db", 1))
+    kept = asyncio.ensure_future(batcher.submit("db", 2))
+    await asyncio.sleep(0.01)
+
+    cancelled.cancel()
+    release.set()
+    assert await kept == 2
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_pending_calls():
+    started = asyncio.Event()
+
+    async def handler(key, items):
+        started.set()
+        await asyncio.Event().wait()
+
+    batcher = MicroBatcher("test_close", handler, window_ms=1000, max_batch=2)
+    # Un batch en curso (max_batch) y otro abierto esperando la ventana
+    running = [asyncio.ensure_future(batcher.submit("db", item)) for item in (1, 2)]
+    waiting = asyncio.ensure_future(batcher.submit("other", 3))
+    await asyncio.wait_for(started.wait(), 1)
+
+    await batcher.close()
+    results = await asyncio.wait_for(asyncio.gather(*running, waiting, return_exceptions=True), 1)
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert batcher.pending() == 0
+
+
+@pytest_asyncio.fixture
+async def db():
+    database = AsyncMongoMockClient()["test_db"]
+    await database.cluster_recommendations.insert_many([
+        {"_id": 0, "orchards": [entry("a1", "u1", 0.9), entry("a2", "u1", 0.8)]},
+        {"_id": 1, "orchards": [entry("b1", "u2", 0.7), entry("b2", "u2", 0.6)]},
+    ])
+    await database.users.insert_many([
+        {"_id": "stored", "experience_level": 3},
+        {"_id": "trained", "experience_level": 3, "cluster_id": 1},
+    ])
+    await build_cold_start_index(
+        database,
+        regions=[0, 0, 0, 1, 1, 1],
+        experience_levels=[1, 1, 3, 1, 3, 3],
+        labels=[1, 1, 0, 0, 0, 0],
+        n_clusters=2,
+        location_centers=np.array([[0.0, 0.0], [10.0, 10.0]]),
+        top_n=3,
+        trained_at="2026-01-01T00:00:00"
+    )
+    return database
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Requests al servicio de notificaciones: cada uno, lista de (user_ids, ids de huertos)."""
+    sent = []
+
+    def summary(user_ids, data):
+        return list(user_ids), [r["orchardId"] for r in data["recommendations"]]
+
+    async def send_to_user(user_id, title, body, data=None):
+        sent.append([summary([user_id], data)])
+
+    async def send_batch(notifications):
+        sent.append([summary(n["userIds"], n["data"]) for n in notifications])
+
+    client = recommendation_service.notifications_client
+    monkeypatch.setattr(client, "send_to_user", send_to_user)
+    monkeypatch.setattr(client, "send_batch", send_batch)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_registration_burst_is_handled_as_one_batch(db, sent, monkeypatch):
+    handled = []
+    original = recommendation_service.handle_users_registered
+
+    async def counting_handler(database, registrations):
+        handled.append(len(registrations))
+        return await original(database, registrations)
+
+    batcher = MicroBatcher("test_webhook", counting_handler, window_ms=20, max_batch=64)
+    monkeypatch.setattr(recommendation_service, "user_registered_batcher", batcher)
+
+    burst = [("n1", 1, 0.0, 0.0), ("n2", 1, 0.5, 0.2), ("n3", 3, 9.0, 11.0), ("stored", None, None, None),
+             ("trained", None, None, None), ("missing", None, None, None)]
+    collection_type = type(db.users)
+    original_find = collection_type.find
+    finds = []
+
+    def counting_find(collection, *args, **kwargs):
+        if collection.name == "users":
+            finds.append(args)
+        return original_find(collection, *args, **kwargs)
+
+    monkeypatch.setattr(collection_type, "find", counting_find)
+    results = await asyncio.gather(
+        *(recommendation_service.submit_user_registered(db, *registration) for registration in burst),
+        return_exceptions=True
+    )
+    monkeypatch.setattr(collection_type, "find", original_find)
+
+    # Una sola lectura de usuarios para todo el batch (incluido el que ya tiene cluster)
+    assert handled == [6] and len(finds) == 1
+    by_user = {r["userId"]: r for r in results if isinstance(r, dict)}
+    assert isinstance(results[-1], ValueError)
+    assert by_user["trained"]["clusterIdAssigned"] == 1
+
+    # Mismas recomendaciones que el camino por request
+    for user_id, level, latitude, longitude in burst[:4]:
+        single = await recommendation_service.get_cold_start_recommendations(
+            db, user_id, level, latitude, longitude, limit=3
+        )
+        assert by_user[user_id]["recommendations"] == single["recommendations"]
+    trained = await recommendation_service.get_recommendations_for_user(db, "trained", limit=3)
+    assert by_user["trained"]["recommendations"] == trained["recommendations"]
+
+    # Un solo envío con un mensaje por grupo (trained recibe la lista de su cluster, la misma)
+    assert len(sent) == 1
+    assert sorted(sent[0]) == [
+        (["n1", "n2", "trained"], ["b1", "b2"]),
+        (["n3", "stored"], ["a1", "a2"]),
+    ]
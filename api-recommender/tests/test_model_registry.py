@@ -0,0 +1,75 @@
+"""Tests del registro de versiones de modelo."""
+import numpy as np
+import pytest
+
+from app.core.artifacts import ArtifactStore, load_artifact, save_artifact
+from app.services.model_registry import ModelRegistry
+
+
+def publish_version(registry, value, promote=True):
+    version = registry.begin_version()
+    save_artifact(version.path("model"), {"value": np.array([value])})
+    return registry.publish(version, promote=promote)
+
+
+def test_publish_promotes_and_rollback(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    assert registry.active_version() is None
+    assert registry.artifact_path("model").name.startswith("model_")
+
+    first = publish_version(registry, 1)
+    second = publish_version(registry, 2)
+
+    assert registry.active_version() == second
+    assert registry.artifact_path("model") == tmp_path / "versions" / second / "model"
+
+    assert registry.rollback() == first
+    assert registry.active_version() == first
+    with pytest.raises(ValueError):
+        registry.rollback()
+
+
+def test_discarded_version_is_never_visible(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    publish_version(registry, 1)
+    version = registry.begin_version()
+    save_artifact(version.path("model"), {"value": np.array([2])})
+
+    registry.discard(version)
+
+    assert len(registry.list_versions()) == 1
+    assert [p.name for p in (tmp_path / "versions").iterdir()] == registry.list_versions()
+
+
+def test_retention_keeps_active_version(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    first = publish_version(registry, 1)
+    for value in range(2, 5):
+        publish_version(registry, value, promote=False)
+
+    removed = registry.prune(keep=2)
+
+    assert first not in removed
+    assert registry.list_versions()[0] == first
+    assert len(registry.list_versions()) == 3
+
+
+def test_store_follows_promotion(tmp_path):
+    """Un worker con un ArtifactStore ve la versión promovida sin reiniciar."""
+    registry = ModelRegistry(tmp_path)
+    store = ArtifactStore(
+        "test model", lambda: registry.artifact_path("model"),
+        lambda path: int(load_artifact(path)[0]["value"][0])
+    )
+    publish_version(registry, 1)
+    assert store.get() == 1
+
+    publish_version(registry, 2)
+    store.get()
+    store.wait_for_reload(timeout=5)
+    assert store.get() == 2
+
+    registry.rollback()
+    store.get()
+    store.wait_for_reload(timeout=5)
+    assert store.get() == 1
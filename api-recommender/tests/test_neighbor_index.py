@@ -0,0 +1,67 @@
+"""Tests unitarios para UserNeighborIndex."""
+import pytest
+import numpy as np
+
+from app.services.neighbor_index import UserNeighborIndex
+
+
+@pytest.fixture
+def user_vectors():
+    """Vectores mixtos sintéticos."""
+    rng = np.random.default_rng(3)
+    X_numeric = rng.normal(size=(400, 5))
+    X_categorical = np.stack([rng.integers(0, 4, 400), rng.integers(0, 6, 400)], axis=1)
+    user_ids = [f"user-{i}" for i in range(400)]
+    return X_numeric, X_categorical, user_ids
+
+
+def kprototypes_cost(X_numeric, X_categorical, q_numeric, q_categorical, gamma):
+    return ((X_numeric - q_numeric) ** 2).sum(axis=1) + gamma * (X_categorical != q_categorical).sum(axis=1)
+
+
+def test_embedding_distance_matches_kprototypes_cost(user_vectors):
+    """La distancia² del embedding es el costo mixto de K-Prototypes."""
+    X_numeric, X_categorical, user_ids = user_vectors
+    index = UserNeighborIndex(n_lists=8).build(X_numeric, X_categorical, user_ids, gamma=0.7)
+
+    embedded = index.embed(X_numeric, X_categorical)
+    dist = ((embedded - embedded[0]) ** 2).sum(axis=1)
+
+    expected = kprototypes_cost(X_numeric, X_categorical, X_numeric[0], X_categorical[0], 0.7)
+    np.testing.assert_allclose(dist, expected)
+
+
+def test_full_probe_is_exact(user_vectors):
+    """Revisando todas las listas el resultado coincide con fuerza bruta."""
+    X_numeric, X_categorical, user_ids = user_vectors
+    index = UserNeighborIndex(n_lists=10).build(X_numeric, X_categorical, user_ids, gamma=0.5)
+
+    result = index.query(X_numeric[:5], X_categorical[:5], k=10, n_probe=10)
+
+    for i, neighbors in enumerate(result):
+        cost = kprototypes_cost(X_numeric, X_categorical, X_numeric[i], X_categorical[i], 0.5)
+        expected = {user_ids[j] for j in np.argsort(cost)[:10]}
+        assert {uid for uid, _ in neighbors} == expected
+        np.testing.assert_allclose([d for _, d in neighbors], np.sort(cost)[:10], atol=1e-9)
+
+
+def test_neighbors_of_user_excludes_self(user_vectors):
+    X_numeric, X_categorical, user_ids = user_vectors
+    index = UserNeighborIndex(n_lists=10, n_probe=10).build(X_numeric, X_categorical, user_ids, gamma=0.5)
+
+    neighbors = index.neighbors_of_user("user-7", k=5)
+
+    assert len(neighbors) == 5
+    assert "user-7" not in neighbors
+    assert index.neighbors_of_user("unknown", k=5) == []
+
+
+def test_save_and_load(user_vectors, tmp_path):
+    X_numeric, X_categorical, user_ids = user_vectors
+    index = UserNeighborIndex(n_lists=10).build(X_numeric, X_categorical, user_ids, gamma=0.5)
+    path = tmp_path / "neighbor_index"
+
+    index.save(path)
+    loaded = UserNeighborIndex.load(path)
+
+    assert loaded.neighbors_of_user("user-3", k=8) == index.neighbors_of_user("user-3", k=8)
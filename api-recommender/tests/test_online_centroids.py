@@ -0,0 +1,152 @@
+"""Tests de la actualización online de centroides entre entrenamientos."""
+import numpy as np
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.artifacts import is_artifact, save_artifact
+from app.core.config import settings
+from app.services.cluster_predictor import ClusterPredictor
+from app.services.feature_pipeline import FeaturePipeline
+from app.services.model_registry import ModelRegistry
+from app.services.online_centroids import (
+    STATE_ARTIFACT, OnlineCentroidUpdater, OnlineCentroids, learning_rate
+)
+from benchmarks.synthetic import generate_dataset, group_orchards_by_user
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    users, orchards = generate_dataset(200, seed=3)
+    orchards_by_user = group_orchards_by_user(orchards)
+    pipeline = FeaturePipeline(compact=False)
+    X_numeric, X_categorical = pipeline.fit_transform([
+        pipeline.extract_user_features(u, orchards_by_user.get(u['_id'], [])) for u in users
+    ])
+    predictor = ClusterPredictor.from_centroids(pipeline, X_numeric[:4], X_categorical[:4], 0.5)
+    return users, orchards, predictor
+
+
+@pytest.fixture
+def registry(dataset, tmp_path):
+    registry = ModelRegistry(tmp_path)
+    version = registry.begin_version()
+    dataset[2].save(version.path("cluster_predictor"))
+    save_artifact(version.path("kprototypes"), {"centroids": np.zeros((4, 2))}, metadata={
+        "cluster_metadata": {"cluster_sizes": {"0": 50, "1": 30, "2": 10, "3": 0}}
+    })
+    registry.publish(version)
+    return registry
+
+
+@pytest_asyncio.fixture
+async def db(dataset):
+    users, orchards, _ = dataset
+    database = AsyncMongoMockClient()["test_db"]
+    await database.users.insert_many([dict(u) for u in users])
+    await database.orchards.insert_many([dict(o) for o in orchards])
+    return database
+
+
+def test_learning_rate_decays_to_floor():
+    assert learning_rate(10, 10, prior_weight=90, min_learning_rate=0.001) == pytest.approx(0.1)
+    assert learning_rate(10, 910, prior_weight=90, min_learning_rate=0.001) == pytest.approx(0.01)
+    # Con muchos usuarios asignados manda el piso: b pasos de min_learning_rate
+    assert learning_rate(10, 1e9, prior_weight=90, min_learning_rate=0.001) == pytest.approx(1 - 0.999 ** 10)
+
+
+def test_update_moves_centroid_and_mode(dataset):
+    predictor = dataset[2]
+    state = OnlineCentroids(predictor, trained_version="v1-test")
+    objective = predictor.feature_names_categorical.index('objective')
+    current = state.centroids_categorical[0, objective]
+    other = (current + 1) % len(predictor.vocabularies[objective])
+
+    X_numeric = np.tile(predictor.centroids_numeric[0] + 1.0, (30, 1))
+    X_categorical = np.tile(predictor.centroids_categorical[0], (30, 1))
+    X_categorical[:, objective] = other
+    labels = np.zeros(30, dtype=np.int64)
+
+    state.update(X_numeric, X_categorical, labels, prior_weight=10, min_learning_rate=0.0)
+
+    # 30 usuarios contra un prior de 10: el centroide recorre 3/4 del camino
+    np.testing.assert_allclose(state.centroids_numeric[0], predictor.centroids_numeric[0] + 0.75)
+    assert state.centroids_categorical[0, objective] == other
+    np.testing.assert_array_equal(state.centroids_numeric[1:], predictor.centroids_numeric[1:])
+    assert state.counts.tolist() == [30, 0, 0, 0]
+    np.testing.assert_array_equal(state.predictor.centroids_numeric, state.centroids_numeric)
+
+
+@pytest.mark.asyncio
+async def test_assign_users_and_checkpoint(dataset, registry, db, monkeypatch):
+    monkeypatch.setattr(settings, "ONLINE_CENTROID_CHECKPOINT_USERS", 100)
+    users, _, predictor = dataset
+    trained = registry.active_version()
+    updater = OnlineCentroidUpdater(registry)
+
+    assert await updater.assign_users(db, [u['_id'] for u in users[:60]]) == 60
+    # Los conteos parten del tamaño de cada cluster en el entrenamiento
+    assert updater.state.counts.sum() == 90 + 60
+    assert registry.active_version() == trained and updater.pending == 60
+
+    # Ya asignados: el cluster_id no se pisa
+    await db.users.update_one({"_id": users[70]['_id']}, {"$set": {"cluster_id": 99}})
+    assert await updater.assign_users(db, [u['_id'] for u in users[60:120]]) == 60
+
+    checkpoint = registry.active_version()
+    assert checkpoint != trained and updater.version == checkpoint and updater.pending == 0
+    assert registry.parent_version(checkpoint) == trained and registry.trained_versions() == [trained]
+    assert (await db.users.find_one({"_id": users[70]['_id']}))['cluster_id'] == 99
+    assert await db.users.count_documents({"cluster_id": {"$in": [0, 1, 2, 3]}}) == 119
+
+    # El checkpoint enlaza los demás artefactos y guarda predictor y estado actualizados
+    checkpoint_dir = registry.version_dir(checkpoint)
+    trained_dir = registry.version_dir(trained)
+    assert (checkpoint_dir / "kprototypes" / "centroids.npy").stat().st_ino == \
+        (trained_dir / "kprototypes" / "centroids.npy").stat().st_ino
+    assert is_artifact(checkpoint_dir / STATE_ARTIFACT)
+    saved = ClusterPredictor.load(checkpoint_dir / "cluster_predictor")
+    np.testing.assert_array_equal(saved.centroids_numeric, updater.state.centroids_numeric)
+    assert not np.array_equal(saved.centroids_numeric, predictor.centroids_numeric)
+
+    resumed = OnlineCentroids.load(checkpoint_dir)
+    assert resumed.trained_version == trained and resumed.n_assigned == 120
+    np.testing.assert_array_equal(resumed.counts, updater.state.counts)
+
+
+@pytest.mark.asyncio
+async def test_promoted_version_resets_state(dataset, registry, db):
+    users, _, predictor = dataset
+    trained = registry.active_version()
+    updater = OnlineCentroidUpdater(registry)
+    await updater.assign_users(db, [u['_id'] for u in users[:20]])
+
+    # Un entrenamiento publica una versión nueva mientras hay updates sin checkpoint
+    version = registry.begin_version()
+    predictor.save(version.path("cluster_predictor"))
+    retrained = registry.publish(version)
+
+    await updater.assign_users(db, [u['_id'] for u in users[20:25]])
+    assert updater.version == retrained and updater.state.n_assigned == 5
+    assert updater.state.trained_version == retrained
+    assert await updater.checkpoint() not in (None, trained, retrained)
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_do_not_evict_trained_versions(dataset, registry, db, monkeypatch):
+    monkeypatch.setattr(settings, "ONLINE_CENTROID_CHECKPOINT_USERS", 10)
+    monkeypatch.setattr(settings, "MODEL_REGISTRY_KEEP_VERSIONS", 2)
+    users, _, predictor = dataset
+    first = registry.active_version()
+    version = registry.begin_version()
+    predictor.save(version.path("cluster_predictor"))
+    trained = registry.publish(version)
+
+    updater = OnlineCentroidUpdater(registry)
+    for start in range(0, 60, 10):
+        await updater.assign_users(db, [u['_id'] for u in users[start:start + 10]])
+
+    # Seis checkpoints: sólo queda el activo y los entrenamientos siguen disponibles
+    checkpoint = registry.active_version()
+    assert registry.list_versions() == [first, trained, checkpoint]
+    assert registry.rollback() == first
@@ -0,0 +1,99 @@
+"""Tests del entrenamiento particionado por columna categórica."""
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import partitioned_training
+from app.services.cluster_predictor import ClusterPredictor, assign_clusters
+from app.services.feature_pipeline import FeaturePipeline
+from benchmarks.synthetic import generate_dataset, group_orchards_by_user
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    users, orchards = generate_dataset(120, seed=5)
+    orchards_by_user = group_orchards_by_user(orchards)
+    pipeline = FeaturePipeline()
+    features = [pipeline.extract_user_features(u, orchards_by_user.get(u['_id'], [])) for u in users]
+    X_numeric, X_categorical = pipeline.fit_transform(features)
+    return pipeline, features, X_numeric, X_categorical, [u['_id'] for u in users]
+
+
+@pytest.fixture
+def partition_settings(monkeypatch):
+    monkeypatch.setattr(settings, "TRAINING_PARTITION_KEY", "objective")
+    monkeypatch.setattr(settings, "TRAINING_PARTITION_MIN_USERS", 20)
+    monkeypatch.setattr(settings, "TRAINING_PARTITION_WORKERS", 1)
+
+
+def test_plan_partitions_pools_small_values():
+    codes = np.array([0] * 50 + [1] * 30 + [2] * 5 + [3] * 8)
+    vocabulary = ['a', 'b', 'c', 'd']
+
+    partitions = partitioned_training.plan_partitions(codes, vocabulary, min_users=10)
+    assert [p.values for p in partitions] == [['a'], ['b'], ['c', 'd']]
+    assert [len(p.rows) for p in partitions] == [50, 30, 13]
+
+    # Si el grupo común no llega al mínimo se suma a la partición más chica
+    partitions = partitioned_training.plan_partitions(codes, vocabulary, min_users=25)
+    assert [p.values for p in partitions] == [['a'], ['b', 'c', 'd']]
+    assert partitions[1].name == "b+c+d"
+
+    # Sin ningún valor grande queda una sola partición con todo
+    assert len(partitioned_training.plan_partitions(codes, vocabulary, min_users=100)) == 1
+
+
+@pytest.mark.asyncio
+async def test_partition_ids_are_namespaced_by_range(fitted, partition_settings, tmp_path):
+    pipeline, features, X_numeric, X_categorical, user_ids = fitted
+
+    merged = await partitioned_training.train_partitioned(
+        pipeline, X_numeric, X_categorical, user_ids, tmp_path
+    )
+
+    column = pipeline.feature_names_categorical.index('objective')
+    assert sum(p['n_samples'] for p in merged['partitions']) == len(user_ids)
+    assert merged['metrics']['n_clusters'] == sum(p['n_clusters'] for p in merged['partitions'])
+    assert sorted(merged['cluster_metadata']['cluster_sizes']) == list(range(merged['metrics']['n_clusters']))
+
+    for partition in merged['partitions']:
+        codes = [pipeline.category_vocabularies['objective'].index(v) for v in partition['values']]
+        rows = np.isin(X_categorical[:, column], codes)
+        labels = merged['labels'][rows]
+        assert labels.min() >= partition['offset']
+        assert labels.max() < partition['offset'] + partition['n_clusters']
+        assert (tmp_path / "partitions" / f"p{partition['index']}" / "kprototypes").exists()
+
+    # El predictor asigna cada usuario con el modelo de su partición
+    predictor = partitioned_training.partitioned_predictor(pipeline, merged)
+    predictor.save(tmp_path / "cluster_predictor")
+    loaded = ClusterPredictor.load(tmp_path / "cluster_predictor")
+    predicted = loaded.predict_features(features)
+
+    for partition in merged['partitions']:
+        codes = [pipeline.category_vocabularies['objective'].index(v) for v in partition['values']]
+        rows = np.isin(X_categorical[:, column], codes)
+        clusters = slice(partition['offset'], partition['offset'] + partition['n_clusters'])
+        expected = assign_clusters(
+            X_numeric[rows], X_categorical[rows],
+            predictor.centroids_numeric[clusters], predictor.centroids_categorical[clusters],
+            partition['gamma']
+        ) + partition['offset']
+        np.testing.assert_array_equal(predicted[rows], expected)
+
+
+@pytest.mark.asyncio
+async def test_worker_processes_match_inline_training(fitted, partition_settings, tmp_path, monkeypatch):
+    """Los workers spawn producen el mismo modelo que el entrenamiento en el proceso."""
+    pipeline, _, X_numeric, X_categorical, user_ids = fitted
+
+    inline = await partitioned_training.train_partitioned(
+        pipeline, X_numeric, X_categorical, user_ids, tmp_path / "inline"
+    )
+    monkeypatch.setattr(settings, "TRAINING_PARTITION_WORKERS", 2)
+    pooled = await partitioned_training.train_partitioned(
+        pipeline, X_numeric, X_categorical, user_ids, tmp_path / "pooled"
+    )
+
+    np.testing.assert_array_equal(pooled['labels'], inline['labels'])
+    assert [p['n_clusters'] for p in pooled['partitions']] == [p['n_clusters'] for p in inline['partitions']]
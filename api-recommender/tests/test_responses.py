@@ -0,0 +1,95 @@
+"""El camino rápido (orjson sin validar) produce los mismos bytes que response_model."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import schemas
+from app.api.responses import RecommendationsJSONResponse
+from app.services.cluster_recommendations import rank_for_user
+
+
+def make_response(user_id, rng, n, cluster_id=3):
+    entries = [
+        {
+            "orchardId": f"o{i}",
+            "userId": "otro",
+            "name": f"Huerto ñandú {i} 🌱",
+            "shortDescription": "Jardín \"urbano\" con\nsalto de línea",
+            "estimatedWeeklyWater": float(rng.uniform(0, 5000)),
+            "maintenanceMinutes": int(rng.integers(10, 500)),
+            "fitness": float(rng.random()),
+            "objective": "alimenticio",
+            "baseScore": float(rng.random()),
+        }
+        for i in range(n)
+    ]
+    return {
+        "userId": user_id,
+        "clusterIdAssigned": cluster_id,
+        "recommendations": rank_for_user(entries, {"_id": user_id, "experience_level": 2}, [], n),
+        "generatedAt": datetime(2026, 3, 4, 5, 6, 7, 890123),
+    }
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    payloads = {}
+
+    @app.get("/model/{key}", response_model=schemas.RecommendationsResponse)
+    async def model_path(key: str):
+        return payloads[key]
+
+    @app.get("/fast/{key}", response_model=schemas.RecommendationsResponse)
+    async def fast_path(key: str):
+        return RecommendationsJSONResponse(payloads[key])
+
+    @app.get("/batch-model/{key}", response_model=schemas.BatchRecommendationsResponse)
+    async def batch_model_path(key: str):
+        return payloads[key]
+
+    @app.get("/batch-fast/{key}", response_model=schemas.BatchRecommendationsResponse)
+    async def batch_fast_path(key: str):
+        return RecommendationsJSONResponse(payloads[key])
+
+    test_client = TestClient(app)
+    test_client.payloads = payloads
+    return test_client
+
+
+def test_single_response_bytes_match(client):
+    rng = np.random.default_rng(0)
+    client.payloads["a"] = make_response("u1", rng, 50)
+    client.payloads["cold"] = make_response("u2", rng, 5, cluster_id=None)
+    client.payloads["empty"] = make_response("u3", rng, 0)
+
+    for key in client.payloads:
+        expected = client.get(f"/model/{key}")
+        fast = client.get(f"/fast/{key}")
+        assert fast.status_code == expected.status_code == 200
+        assert fast.content == expected.content
+        assert fast.headers["content-type"] == expected.headers["content-type"]
+
+
+def test_exponent_floats_fall_back_to_identical_bytes(client):
+    """Floats donde orjson y repr() difieren (1e-05, 1e+16) siguen dando los mismos bytes."""
+    payload = make_response("u1", np.random.default_rng(1), 4)
+    payload["recommendations"][0]["score"] = 1e-05
+    payload["recommendations"][1]["fitness"] = 2.5e-07
+    payload["recommendations"][2]["estimatedWeeklyWater"] = 1e16
+    client.payloads["exp"] = payload
+
+    assert client.get("/fast/exp").content == client.get("/model/exp").content
+
+
+def test_batch_response_bytes_match(client):
+    rng = np.random.default_rng(2)
+    client.payloads["batch"] = {
+        "results": [make_response(f"u{i}", rng, 10) for i in range(20)],
+        "notFound": ["missing-1", "missing-2"],
+    }
+
+    assert client.get("/batch-fast/batch").content == client.get("/batch-model/batch").content
@@ -0,0 +1,139 @@
+"""Tests de la coalescencia de llamadas concurrentes (singleflight)."""
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.metrics import SINGLEFLIGHT_CALLS
+from app.core.singleflight import SingleFlight
+from app.services import recommendation_service
+
+
+def calls(group, role):
+    return SINGLEFLIGHT_CALLS.labels(group=group, role=role)._value.get()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test_share")
+    executions = 0
+
+    async def load():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    results = await asyncio.gather(*(flight.do("k", load) for _ in range(5)))
+
+    assert executions == 1
+    assert all(result is results[0] for result in results)
+    assert (calls("test_share", "leader"), calls("test_share", "shared")) == (1, 4)
+    assert flight.in_flight() == 0
+
+    # Terminada la llamada, la clave se libera (no es una caché)
+    await flight.do("k", load)
+    assert executions == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller():
+    flight = SingleFlight("test_errors")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_caller_keeps_the_shared_call():
+    """Cancelar un request no afecta a los demás; si todos se cancelan, se cancela la tarea."""
+    flight = SingleFlight("test_cancel")
+    release = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def load():
+        try:
+            await release.wait()
+            return "ok"
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(flight.do("k", load))
+    second = asyncio.create_task(flight.do("k", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "ok"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    release.clear()
+    lone = asyncio.create_task(flight.do("other", load))
+    await asyncio.sleep(0)
+    lone.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_new_caller_after_cancelling_last_waiter_starts_fresh_call():
+    """Cancelar al único llamador libera la clave: quien llega después no hereda la cancelación."""
+    flight = SingleFlight("test_cancel_rejoin")
+    executions = 0
+
+    async def load():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return executions
+
+    lone = asyncio.create_task(flight.do("k", load))
+    await asyncio.sleep(0)
+    lone.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await lone
+
+    # Sin ceder al loop: el done-callback de la tarea cancelada aún no corrió
+    assert await flight.do("k", load) == 2
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cluster_candidates_loaded_once_for_concurrent_users(monkeypatch):
+    """Usuarios del mismo cluster sin lista precalculada comparten el scan del cluster."""
+    db = AsyncMongoMockClient()["test_db"]
+    await db.users.insert_many([{"_id": f"u{i}", "cluster_id": 0} for i in range(6)])
+    await db.orchards.insert_many([
+        {"_id": f"o{i}", "userId": f"u{i}", "name": f"Huerto {i}", "state": True, "countPlants": 3}
+        for i in range(6)
+    ])
+    monkeypatch.setattr(recommendation_service.settings, "NEIGHBOR_INDEX_ENABLED", False)
+
+    scans = 0
+    original = recommendation_service._rank_cluster_candidates
+
+    async def counting_scan(*args, **kwargs):
+        nonlocal scans
+        scans += 1
+        await asyncio.sleep(0.01)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(recommendation_service, "_rank_cluster_candidates", counting_scan)
+
+    results = await asyncio.gather(*(
+        recommendation_service.get_recommendations_for_user(db, f"u{i}", limit=3) for i in range(6)
+    ))
+
+    assert scans == 1
+    for i, result in enumerate(results):
+        ids = [r["orchardId"] for r in result["recommendations"]]
+        assert len(ids) == 3 and f"o{i}" not in ids
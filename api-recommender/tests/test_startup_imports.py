@@ -0,0 +1,20 @@
+"""El camino de serving no debe cargar el stack de entrenamiento al arrancar."""
+import subprocess
+import sys
+
+from benchmarks.bench_import_time import HEAVY_MODULES
+
+
+def test_app_main_does_not_import_training_stack():
+    """Importar app.main no carga pandas, scikit-learn ni kmodes (se importan al entrenar)."""
+    probe = (
+        "import sys\n"
+        "import app.main\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", probe],
+        capture_output=True, text=True, check=True
+    )
+
+    assert completed.stdout.strip() == ""
@@ -0,0 +1,32 @@
+"""Tests del generador sintético de benchmarks."""
+from benchmarks.synthetic import generate_dataset, group_orchards_by_user
+from app.services.feature_pipeline import FeaturePipeline
+
+
+def test_generate_dataset_is_reproducible():
+    users_a, orchards_a = generate_dataset(50, seed=7)
+    users_b, orchards_b = generate_dataset(50, seed=7)
+
+    assert [u['experience_level'] for u in users_a] == [u['experience_level'] for u in users_b]
+    assert [o['width'] for o in orchards_a] == [o['width'] for o in orchards_b]
+
+
+def test_generated_orchards_match_user_counts():
+    users, orchards = generate_dataset(200, seed=1)
+    grouped = group_orchards_by_user(orchards)
+
+    for user in users:
+        assert len(grouped.get(user['_id'], [])) == user['count_orchards']
+    assert {u['experience_level'] for u in users} <= {1, 2, 3, 4}
+
+
+def test_generated_data_feeds_feature_pipeline():
+    users, orchards = generate_dataset(100, seed=2)
+    grouped = group_orchards_by_user(orchards)
+    pipeline = FeaturePipeline()
+
+    features = [pipeline.extract_user_features(u, grouped.get(u['_id'], [])) for u in users]
+    X_numeric, X_categorical = pipeline.fit_transform(features)
+
+    assert X_numeric.shape == (100, 16)
+    assert X_categorical.shape == (100, 2)
@@ -0,0 +1,88 @@
+"""Tests unitarios para TrainingHistoryCache."""
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services.training_cache import TrainingHistoryCache
+
+
+@pytest.fixture
+def db():
+    """Base de datos Mongo en memoria."""
+    return AsyncMongoMockClient()["test_db"]
+
+
+class CountingCollection:
+    """Envuelve una colección contando llamadas a find_one."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = 0
+
+    async def find_one(self, *args, **kwargs):
+        self.calls += 1
+        return await self.collection.find_one(*args, **kwargs)
+
+
+class CountingDB:
+    def __init__(self, db):
+        self.training_history = CountingCollection(db.training_history)
+
+
+@pytest.mark.asyncio
+async def test_get_latest_empty(db):
+    """Sin entrenamientos retorna None."""
+    cache = TrainingHistoryCache(ttl_seconds=60)
+    assert await cache.get_latest(db) is None
+
+
+@pytest.mark.asyncio
+async def test_get_latest_served_from_memory(db):
+    """Dentro del TTL no se vuelve a consultar la BD."""
+    await db.training_history.insert_one({"trained_at": "2024-01-01T00:00:00", "n_clusters": 3})
+    await db.training_history.insert_one({"trained_at": "2024-02-01T00:00:00", "n_clusters": 5})
+
+    counting_db = CountingDB(db)
+    cache = TrainingHistoryCache(ttl_seconds=60)
+
+    first = await cache.get_latest(counting_db)
+    calls_after_first = counting_db.training_history.calls
+    second = await cache.get_latest(counting_db)
+
+    assert first["n_clusters"] == 5
+    assert second is first
+    assert counting_db.training_history.calls == calls_after_first
+
+
+@pytest.mark.asyncio
+async def test_revalidation_only_reloads_on_new_version(db):
+    """Con TTL expirado sólo se recarga el documento si cambió la versión."""
+    await db.training_history.insert_one({"trained_at": "2024-01-01T00:00:00", "n_clusters": 3})
+
+    counting_db = CountingDB(db)
+    cache = TrainingHistoryCache(ttl_seconds=0)
+
+    await cache.get_latest(counting_db)
+    counting_db.training_history.calls = 0
+
+    # Misma versión: sólo la consulta de versión
+    await cache.get_latest(counting_db)
+    assert counting_db.training_history.calls == 1
+
+    # Nueva versión: consulta de versión + documento completo
+    await db.training_history.insert_one({"trained_at": "2024-03-01T00:00:00", "n_clusters": 7})
+    counting_db.training_history.calls = 0
+    latest = await cache.get_latest(counting_db)
+    assert latest["n_clusters"] == 7
+    assert counting_db.training_history.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_set_latest_skips_database(db):
+    """set_latest deja la caché fresca sin consultar la BD."""
+    counting_db = CountingDB(db)
+    cache = TrainingHistoryCache(ttl_seconds=60)
+    cache.set_latest({"_id": "abc", "n_clusters": 4})
+
+    latest = await cache.get_latest(counting_db)
+    assert latest["n_clusters"] == 4
+    assert counting_db.training_history.calls == 0
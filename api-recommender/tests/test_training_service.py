@@ -0,0 +1,143 @@
+"""Tests unitarios para training_service."""
+import httpx
+import pytest
+import numpy as np
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+
+from app.api import routes
+from app.api.deps import get_current_user
+from app.core.config import settings
+from app.services import training_service
+from benchmarks.synthetic import generate_dataset
+from app.services.feature_pipeline import FeaturePipeline
+from app.services.training_cache import training_history_cache
+
+
+@pytest.fixture
+def fitted_pipeline():
+    """Pipeline ajustado con features sintéticas."""
+    rng = np.random.default_rng(1)
+    pipeline = FeaturePipeline()
+    users_features = [
+        {
+            'experience_level': int(rng.integers(1, 4)),
+            'count_orchards': int(rng.integers(0, 4)),
+            'avg_orchard_area': float(rng.uniform(1, 10)),
+            'objective': str(rng.choice(['alimenticio', 'medicinal'])),
+            'latitude': 16.75,
+            'longitude': -93.11
+        }
+        for _ in range(20)
+    ]
+    X_numeric, _ = pipeline.fit_transform(users_features)
+    return pipeline, X_numeric
+
+
+def test_build_cluster_profiles_inverse_scales(fitted_pipeline):
+    """Los centroides se guardan en unidades originales y escaladas."""
+    pipeline, X_numeric = fitted_pipeline
+    n_features = X_numeric.shape[1]
+    metadata = {
+        'centroids_numeric': X_numeric[:2].tolist(),
+        'centroids_categorical': [[0, 0], [1, 0]],
+        'feature_means': X_numeric[:2].tolist(),
+        'feature_stds': np.ones((2, n_features)).tolist(),
+    }
+
+    profiles = training_service.build_cluster_profiles(pipeline, metadata)
+
+    expected = pipeline.scaler.inverse_transform(X_numeric[:2])
+    np.testing.assert_allclose(profiles['centroids_numeric'], expected, atol=1e-5)
+    np.testing.assert_allclose(profiles['centroids_numeric_scaled'], X_numeric[:2], atol=1e-5)
+    np.testing.assert_allclose(profiles['feature_stds'][0], pipeline.scaler.scale_, atol=1e-5)
+    assert profiles['feature_names_numeric'] == pipeline.feature_names_numeric
+
+
+def test_parse_cluster_include():
+    """include= acepta secciones conocidas, 'all' y rechaza desconocidas."""
+    assert training_service.parse_cluster_include(None) == set()
+    assert training_service.parse_cluster_include("centroids, profiles") == {"centroids", "profiles"}
+    assert training_service.parse_cluster_include("all") == training_service.CLUSTER_INFO_SECTIONS
+
+    with pytest.raises(ValueError):
+        training_service.parse_cluster_include("centroids,foo")
+
+
+@pytest.mark.asyncio
+async def test_get_clusters_info_include():
+    """Sin include sólo se retornan tamaños; con include se agregan secciones."""
+    db = AsyncMongoMockClient()["test_db"]
+    training_history_cache.set_latest({
+        "_id": "v1",
+        "n_clusters": 2,
+        "cluster_sizes": {"0": 5, "1": 7},
+        "cluster_profiles": {
+            "feature_names_numeric": ["a", "b"],
+            "feature_names_categorical": ["objective"],
+            "centroids_numeric": [[1.0, 2.0], [3.0, 4.0]],
+            "centroids_numeric_scaled": [[-1.0, -1.0], [1.0, 1.0]],
+            "centroids_categorical": [[0], [1]],
+            "feature_means": [[1.0, 2.0], [3.0, 4.0]],
+            "feature_stds": [[0.1, 0.2], [0.3, 0.4]],
+        }
+    })
+
+    light = await training_service.get_clusters_info(db)
+    assert light["total_users"] == 12
+    assert set(light["clusters"][0]) == {"cluster_id", "size"}
+
+    full = await training_service.get_clusters_info(db, include={"centroids", "scaled"})
+    assert full["clusters"][1]["centroid_numeric"] == [3.0, 4.0]
+    assert full["clusters"][1]["centroid_numeric_scaled"] == [1.0, 1.0]
+    assert "feature_means" not in full["clusters"][1]
+    assert full["feature_names_numeric"] == ["a", "b"]
+
+    training_history_cache.invalidate()
+
+
+@pytest.mark.asyncio
+async def test_rollback_restores_clusters_and_recommendations(tmp_path, monkeypatch):
+    """Rollback reasigna usuarios y reconstruye listas e índice con la versión anterior."""
+    monkeypatch.setattr(settings, "MODEL_STORAGE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "TRAINING_WARM_START", False)
+    db = AsyncMongoMockClient()["test_db"]
+    users, orchards = generate_dataset(150, seed=5)
+    await db.users.insert_many(users)
+    await db.orchards.insert_many(orchards)
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.state.db = db
+    app.dependency_overrides[get_current_user] = lambda: {"role": "admin"}
+    user_id = str(users[0]["_id"])
+
+    async def snapshot(client):
+        clusters = (await client.get("/clusters")).json()
+        recommendations = (await client.get(f"/recommendations/user/{user_id}")).json()
+        assignments = {u["_id"]: u["cluster_id"] async for u in db.users.find({}, {"cluster_id": 1})}
+        return clusters, recommendations, assignments
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        monkeypatch.setattr(settings, "MIN_CLUSTERS", 3)
+        monkeypatch.setattr(settings, "MAX_CLUSTERS", 3)
+        await training_service.train_clustering_model(db)
+        first = await snapshot(client)
+
+        monkeypatch.setattr(settings, "MIN_CLUSTERS", 5)
+        monkeypatch.setattr(settings, "MAX_CLUSTERS", 5)
+        await training_service.train_clustering_model(db)
+        second = await snapshot(client)
+        assert second[0]["n_clusters"] == 5 and max(second[2].values()) == 4
+
+        response = await client.post("/models/rollback")
+        assert response.status_code == 200
+        rolled_back = await snapshot(client)
+
+    assert rolled_back[0] == first[0] and rolled_back[0]["n_clusters"] == 3
+    assert rolled_back[2] == first[2]
+    # Mismos huertos y cluster (el score incluye frescura, calculada al reconstruir las listas)
+    assert rolled_back[1]["clusterIdAssigned"] == first[1]["clusterIdAssigned"]
+    assert [r["orchardId"] for r in rolled_back[1]["recommendations"]] == \
+        [r["orchardId"] for r in first[1]["recommendations"]]
+    assert await db.cluster_recommendations.count_documents({"_id": {"$gte": 3}}) == 0